@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from collections import deque
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery
+from app.core.config import get_settings
+from app.core.db import SessionLocal
+from app.models import RenderJob, TenantShare
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Lower is more urgent; stored on RenderJob.priority.
+PRIORITIES: dict[str, int] = {'high': 0, 'normal': 1, 'low': 2}
+PRIORITY_NAMES = {rank: name for name, rank in PRIORITIES.items()}
+PENDING = 'pending'
+_FINISHED = ('completed', 'failed')
+# Completed jobs per preset used to estimate how long a job holds its slot.
+_ESTIMATE_SAMPLE = 50
+_MIN_WEIGHT = 0.01
+
+
+@dataclass(frozen=True)
+class PendingJob:
+    job_id: str
+    tenant_id: str
+    priority: int
+    # Estimated seconds the job will hold a render slot.
+    cost: float
+
+
+@dataclass
+class Credit:
+    deficit: float = 0.0
+    # Quanta received so far; the tenant with the fewest is next in the round.
+    rounds: int = 0
+
+
+# Rounds of a tenant without a backlog; it rejoins at the round the waiting tenants are in.
+_IDLE = -1
+
+
+@dataclass
+class TenantQueue:
+    tenant_id: str
+    weight: float
+    pending: int
+    active: int
+    quota: int
+    pending_by_priority: dict[str, int] = field(default_factory=dict)
+    # Time until the tenant's whole backlog is admitted; None when admission is disabled.
+    estimated_wait_seconds: float | None = None
+
+
+class DeficitRoundRobin:
+    """
+    Weighted deficit round robin over tenants, with strict priority between classes.
+
+    Classes are served strictly in order: a class only gets the slots left once every job of the more
+    urgent classes has been admitted, and fair share applies within a class. A tenant's turn credits it with
+    `quantum × weight` and admits its oldest jobs while the credit covers their estimated cost; the
+    quantum is the largest cost waiting, so a weight-1 tenant admits at least one job per turn. Turns
+    go to the tenant that has received the fewest quanta, and a turn cut short by the slot limit is
+    finished on the next pass before anyone else is credited. Tenants without a backlog lose their
+    credit and rejoin at the current round, so idle time cannot be banked into a burst.
+    """
+
+    def __init__(self, weights: Mapping[str, float]) -> None:
+        self._weights = weights
+
+    def weight(self, tenant_id: str) -> float:
+        return max(self._weights.get(tenant_id, 1.0), _MIN_WEIGHT)
+
+    def select(self, backlog: Sequence[PendingJob], slots: int, credits: dict[str, Credit]) -> list[PendingJob]:
+        """Pick up to `slots` jobs from `backlog` (oldest first per tenant), updating `credits` in place."""
+        waiting = {job.tenant_id for job in backlog}
+        for tenant_id, credit in credits.items():
+            if tenant_id not in waiting:
+                credit.deficit, credit.rounds = 0.0, _IDLE
+        current_round = min((credits[t].rounds for t in waiting if t in credits and credits[t].rounds != _IDLE), default=0)
+        for tenant_id in waiting:
+            credit = credits.setdefault(tenant_id, Credit(rounds=_IDLE))
+            if credit.rounds == _IDLE:
+                credit.rounds = current_round
+
+        admitted: list[PendingJob] = []
+        for priority in sorted({job.priority for job in backlog}):
+            queues: dict[str, deque[PendingJob]] = {}
+            for job in backlog:
+                if job.priority == priority:
+                    queues.setdefault(job.tenant_id, deque()).append(job)
+            quantum = max(job.cost for queue in queues.values() for job in queue)
+            while queues and len(admitted) < slots:
+                in_turn = [t for t, queue in queues.items() if credits[t].deficit >= queue[0].cost]
+                if in_turn:
+                    tenant_id = min(in_turn, key=lambda t: (credits[t].rounds, t))
+                else:
+                    tenant_id = min(queues, key=lambda t: (credits[t].rounds, t))
+                    credits[tenant_id].deficit += quantum * self.weight(tenant_id)
+                    credits[tenant_id].rounds += 1
+                    continue
+                queue = queues[tenant_id]
+                job = queue.popleft()
+                credits[tenant_id].deficit -= job.cost
+                admitted.append(job)
+                if not queue:
+                    del queues[tenant_id]
+            if len(admitted) >= slots:
+                break
+        return admitted
+
+
+class AdmissionController:
+    """
+    Fair-share admission of render jobs in front of the Celery render queue.
+
+    New jobs are stored as `pending`; an admission pass moves jobs to `queued` and sends their task
+    while fewer than `max_active_jobs` jobs hold a worker, choosing them with `DeficitRoundRobin`.
+    Passes run after every submission and whenever a job completes or fails. Each pass first fails
+    running jobs whose record has not changed for `stale_job_seconds` (a worker died without
+    reporting), so they free their slot and can be retried. Tenant credit lives in
+    `tenant_shares` and the pass locks those rows, so API and worker processes can all run passes.
+    With `max_active_jobs=0` every job is admitted immediately and the render queue is plain FIFO.
+    """
+
+    def __init__(
+        self,
+        max_active_jobs: int,
+        weights: Mapping[str, float],
+        quota: int,
+        quotas: Mapping[str, int],
+        stale_job_seconds: float = 6 * 3600,
+    ) -> None:
+        self._max_active_jobs = max_active_jobs
+        self._stale_job_seconds = stale_job_seconds
+        self._policy = DeficitRoundRobin(weights)
+        self._quota = quota
+        self._quotas = quotas
+        self._lock = threading.Lock()
+
+    def quota(self, tenant_id: str) -> int:
+        return self._quotas.get(tenant_id, self._quota)
+
+    def register_tenant(self, db: Session, tenant_id: str) -> None:
+        """Create the tenant's credit row up front so admission passes can lock it."""
+        if db.get(TenantShare, tenant_id) is not None:
+            return
+        db.add(TenantShare(tenant_id=tenant_id))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+
+    def admit(self) -> list[str]:
+        """Run one admission pass; returns the ids of the jobs that were sent to the render queue."""
+        with self._lock:
+            db = SessionLocal()
+            try:
+                jobs = self._admit(db)
+                launched = [job.celery_task_id for job, cost in jobs if self._launch(db, job, cost)]
+            finally:
+                db.close()
+        if launched:
+            logger.info('Admitted %s render jobs: %s', len(launched), launched)
+        return launched
+
+    def _reap_stale(self, db: Session) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=self._stale_job_seconds)
+        stale = [
+            job_id
+            for (job_id,) in db.query(RenderJob.celery_task_id).filter(
+                RenderJob.status.notin_((PENDING, *_FINISHED)), RenderJob.updated_at < cutoff
+            )
+        ]
+        if not stale:
+            return
+        db.execute(
+            update(RenderJob)
+            .where(
+                RenderJob.celery_task_id.in_(stale),
+                RenderJob.status.notin_((PENDING, *_FINISHED)),
+                RenderJob.updated_at < cutoff,
+            )
+            .values(status='failed')
+        )
+        db.commit()
+        logger.warning('Failed %s jobs idle for over %ss, releasing their slots: %s', len(stale), self._stale_job_seconds, stale)
+
+    def _admit(self, db: Session) -> list[tuple[RenderJob, float]]:
+        """Move the chosen pending jobs to `queued`; returns them with the cost charged to their tenant."""
+        if self._max_active_jobs:
+            self._reap_stale(db)
+        shares = {share.tenant_id: share for share in db.query(TenantShare).with_for_update()}
+        pending = (
+            db.query(RenderJob)
+            .filter(RenderJob.status == PENDING)
+            .order_by(RenderJob.priority, RenderJob.created_at, RenderJob.id)
+            .all()
+        )
+        if not pending:
+            db.rollback()
+            return []
+        if self._max_active_jobs:
+            active = (
+                db.query(func.count(RenderJob.id))
+                .filter(RenderJob.status.notin_((PENDING, *_FINISHED)))
+                .scalar()
+            )
+            slots = self._max_active_jobs - active
+        else:
+            slots = len(pending)
+        if slots <= 0:
+            db.rollback()
+            return []
+
+        job_seconds = self.job_seconds(db)
+        backlog = [
+            PendingJob(job.celery_task_id, job.tenant_id, job.priority, job_seconds(job.preset)) for job in pending
+        ]
+        credits = {tenant_id: Credit(share.deficit, share.rounds) for tenant_id, share in shares.items()}
+        chosen = {job.job_id: job.cost for job in self._policy.select(backlog, slots, credits)}
+        for tenant_id, credit in credits.items():
+            share = shares.get(tenant_id)
+            if share is None:
+                share = TenantShare(tenant_id=tenant_id)
+                db.add(share)
+            share.deficit = credit.deficit
+            share.rounds = credit.rounds
+
+        now = datetime.utcnow()
+        admitted = []
+        for job in pending:
+            if job.celery_task_id not in chosen:
+                continue
+            result = db.execute(
+                update(RenderJob)
+                .where(RenderJob.celery_task_id == job.celery_task_id, RenderJob.status == PENDING)
+                .values(status='queued', admitted_at=now)
+            )
+            if result.rowcount:
+                admitted.append((job, chosen[job.celery_task_id]))
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent pass created the same tenant row; it admits in our place.
+            db.rollback()
+            return []
+        return admitted
+
+    @staticmethod
+    def _launch(db: Session, job: RenderJob, cost: float) -> bool:
+        try:
+            if job.parent_job_id:
+                celery.send_task('upgrade_render_task', args=(job.celery_task_id,), task_id=job.celery_task_id)
+            elif job.screenplay_complete:
+                # A retried job whose screenplay finished: re-render only its unfinished scenes.
+                celery.send_task('retry_render_task', args=(job.celery_task_id,))
+            else:
+                celery.send_task(
+                    'render_video_task',
+                    args=(job.prompt, job.face_reference_image),
+                    kwargs={'bypass_screenplay_cache': job.bypass_screenplay_cache},
+                    task_id=job.celery_task_id,
+                )
+            return True
+        except Exception:
+            logger.exception('Failed to enqueue admitted job=%s; returning it to the backlog', job.celery_task_id)
+            db.execute(
+                update(RenderJob)
+                .where(RenderJob.celery_task_id == job.celery_task_id)
+                .values(status=PENDING, admitted_at=None)
+            )
+            # Refund the credit the job was charged, so the tenant does not lose its turn to a broker error.
+            db.execute(
+                update(TenantShare)
+                .where(TenantShare.tenant_id == job.tenant_id)
+                .values(deficit=TenantShare.deficit + cost)
+            )
+            db.commit()
+            return False
+
+    @staticmethod
+    def job_seconds(db: Session):
+        """Mean admitted-to-finished wall time of recent completed jobs, per preset."""
+        measured: dict[str, float] = {}
+        presets = [preset for (preset,) in db.query(RenderJob.preset).distinct()]
+        for preset in presets:
+            rows = (
+                db.query(RenderJob.admitted_at, RenderJob.updated_at)
+                .filter(RenderJob.preset == preset, RenderJob.status == 'completed', RenderJob.admitted_at.isnot(None))
+                .order_by(RenderJob.updated_at.desc())
+                .limit(_ESTIMATE_SAMPLE)
+                .all()
+            )
+            durations = [(finished - admitted).total_seconds() for admitted, finished in rows]
+            if durations:
+                measured[preset] = max(sum(durations) / len(durations), 1.0)
+        return lambda preset: measured.get(preset, settings.admission_default_job_seconds)
+
+    def queues(self, db: Session, tenant_id: str | None = None) -> list[TenantQueue]:
+        """Backlog, running jobs and estimated wait for every tenant with unfinished jobs."""
+        query = db.query(RenderJob.tenant_id, RenderJob.status, RenderJob.priority, RenderJob.preset).filter(
+            RenderJob.status.notin_(_FINISHED)
+        )
+        if tenant_id is not None:
+            query = query.filter(RenderJob.tenant_id == tenant_id)
+        job_seconds = self.job_seconds(db)
+        queues: dict[str, TenantQueue] = {}
+        backlog_seconds: dict[str, float] = {}
+        for tenant, status, priority, preset in query:
+            queue = queues.setdefault(
+                tenant,
+                TenantQueue(tenant, weight=self._policy.weight(tenant), pending=0, active=0, quota=self.quota(tenant)),
+            )
+            if status == PENDING:
+                queue.pending += 1
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                queue.pending_by_priority[name] = queue.pending_by_priority.get(name, 0) + 1
+                backlog_seconds[tenant] = backlog_seconds.get(tenant, 0.0) + job_seconds(preset)
+            else:
+                queue.active += 1
+
+        if self._max_active_jobs:
+            # Each waiting tenant drains at its weighted share of the render slots.
+            competing = self._competing_weight(db)
+            for queue in queues.values():
+                share = queue.weight / competing if queue.pending and competing else 1.0
+                queue.estimated_wait_seconds = round(
+                    backlog_seconds.get(queue.tenant_id, 0.0) / (self._max_active_jobs * share), 1
+                )
+        return sorted(queues.values(), key=lambda queue: queue.tenant_id)
+
+    def _competing_weight(self, db: Session) -> float:
+        tenants = [tenant for (tenant,) in db.query(RenderJob.tenant_id).filter(RenderJob.status == PENDING).distinct()]
+        return sum(self._policy.weight(tenant) for tenant in tenants)
+
+    def retry_after(self, db: Session, tenant_id: str) -> int | None:
+        """Seconds a tenant at its backlog quota should wait before submitting again; None if it may submit."""
+        pending = (
+            db.query(func.count(RenderJob.id))
+            .filter(RenderJob.tenant_id == tenant_id, RenderJob.status == PENDING)
+            .scalar()
+        )
+        if pending < self.quota(tenant_id):
+            return None
+        queue = self.queues(db, tenant_id)[0]
+        if queue.estimated_wait_seconds is None:
+            return 1
+        # One admission frees a backlog slot; jobs are admitted at roughly an even pace.
+        return max(1, math.ceil(queue.estimated_wait_seconds / queue.pending))
+
+
+admission_controller = AdmissionController(
+    max_active_jobs=settings.admission_max_active_jobs,
+    weights=settings.tenant_weights,
+    quota=settings.tenant_backlog_quota,
+    quotas=settings.tenant_backlog_quotas,
+    stale_job_seconds=settings.admission_stale_job_seconds,
+)
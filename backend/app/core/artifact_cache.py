@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+from app.core.config import get_settings
+from app.core.s3_uploader import s3_client
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_HASH_CHUNK = 1024 * 1024
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    bytes_saved: int = 0
+    # Requests served by an identical request already in flight, and the GPU time that spared.
+    coalesced: int = 0
+    gpu_seconds_saved: float = 0.0
+
+
+_current_stats: contextvars.ContextVar[CacheStats | None] = contextvars.ContextVar('artifact_cache_stats', default=None)
+
+
+def _tmp_path(dest: Path) -> Path:
+    # Unique per writer: a shared temp name lets one worker's copy write through another's hardlink.
+    return dest.with_name(f'.{dest.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp')
+
+
+def _materialize(src: Path, dest: Path, overwrite: bool = True) -> bool:
+    """
+    Hardlink (or copy) `src` to `dest` through a temp file private to this writer.
+
+    With `overwrite=False` an entry that appeared at `dest` meanwhile is kept and False is returned.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_path(dest)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        fd, name = tempfile.mkstemp(dir=dest.parent, prefix=f'.{dest.name}.', suffix='.tmp')
+        os.close(fd)
+        tmp = Path(name)
+        try:
+            shutil.copyfile(src, tmp)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+    if not overwrite and dest.exists():
+        tmp.unlink(missing_ok=True)
+        return False
+    os.replace(tmp, dest)
+    return True
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        while chunk := handle.read(_HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Content-addressed store for generated keyframes, clips and dialogue audio.
+
+    Keys hash the model id, every generation kwarg, the seed and the content of input artifacts, so a
+    hit is only possible when the generator would have been called with byte-identical inputs. The
+    local tier is bounded by size and evicts least-recently-used entries (file mtime doubles as the
+    access time); an optional S3 tier is consulted on local misses and receives every new entry.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int,
+        enabled: bool = True,
+        s3_bucket: str | None = None,
+        s3_prefix: str = 'artifact-cache',
+        max_input_hashes: int = 4096,
+    ) -> None:
+        self._root = root
+        self._max_bytes = max_bytes
+        self._enabled = enabled
+        self._s3_bucket = s3_bucket
+        self._s3_prefix = s3_prefix.strip('/')
+        self._lock = threading.Lock()
+        self._size_bytes: int | None = None
+        self._max_input_hashes = max_input_hashes
+        self._hash_lock = threading.Lock()
+        self._input_hashes: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def hash_input(self, value: str | Path | None) -> str | None:
+        """Hash a file input by content (memoised on path/size/mtime); other values hash as text."""
+        if value is None:
+            return None
+        path = Path(value)
+        if not path.is_file():
+            return hashlib.sha256(str(value).encode()).hexdigest()
+        stat = path.stat()
+        memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        with self._hash_lock:
+            digest = self._input_hashes.get(memo_key)
+            if digest is not None:
+                self._input_hashes.move_to_end(memo_key)
+                return digest
+        digest = hash_file(path)
+        with self._hash_lock:
+            self._input_hashes[memo_key] = digest
+            self._input_hashes.move_to_end(memo_key)
+            while len(self._input_hashes) > self._max_input_hashes:
+                self._input_hashes.popitem(last=False)
+        return digest
+
+    def key_for(self, kind: str, model_id: str, params: dict[str, Any], inputs: dict[str, str | Path | None]) -> str:
+        payload = {
+            'kind': kind,
+            'model_id': model_id,
+            'params': params,
+            'inputs': {name: self.hash_input(value) for name, value in sorted(inputs.items())},
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _local_path(self, key: str, suffix: str) -> Path:
+        return self._root / key[:2] / f'{key}{suffix}'
+
+    def _s3_key(self, key: str, suffix: str) -> str:
+        return f'{self._s3_prefix}/{key[:2]}/{key}{suffix}'
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """Place the cached artifact for `key` at `dest`; returns False on a miss."""
+        if not self._enabled:
+            return False
+        local = self._local_path(key, dest.suffix)
+        if not local.exists() and self._s3_bucket:
+            self._fetch_from_s3(key, local)
+        if not local.exists():
+            self._record(hit=False)
+            return False
+
+        os.utime(local)
+        _materialize(local, dest)
+        size = local.stat().st_size
+        self._record(hit=True, size=size)
+        logger.info('Artifact cache hit key=%s bytes=%s -> %s', key[:12], size, dest)
+        return True
+
+    def store(self, key: str, src: Path) -> None:
+        if not self._enabled:
+            return
+        local = self._local_path(key, src.suffix)
+        if not local.exists() and _materialize(src, local, overwrite=False):
+            self._add_size(local.stat().st_size)
+        if self._s3_bucket:
+            try:
+                s3_client().upload_file(str(local), self._s3_bucket, self._s3_key(key, src.suffix))
+            except Exception:
+                logger.exception('Failed to upload artifact %s to S3 cache tier', key[:12])
+
+    def _fetch_from_s3(self, key: str, local: Path) -> None:
+        local.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_path(local)
+        try:
+            s3_client().download_file(self._s3_bucket, self._s3_key(key, local.suffix), str(tmp))
+        except ClientError:
+            tmp.unlink(missing_ok=True)
+            return
+        if local.exists():
+            # Another worker fetched the same entry first; serve theirs.
+            tmp.unlink(missing_ok=True)
+            return
+        os.replace(tmp, local)
+        self._add_size(local.stat().st_size)
+
+    def _add_size(self, size: int) -> None:
+        with self._lock:
+            if self._size_bytes is None:
+                self._size_bytes = self._scan_size()
+            else:
+                self._size_bytes += size
+            if self._size_bytes > self._max_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        return sum(path.stat().st_size for path in self._entries())
+
+    def _entries(self) -> Iterator[Path]:
+        # Skip in-progress temp files (dot-prefixed) so eviction never pulls one out from under a writer.
+        return (path for path in self._root.glob('*/[!.]*') if path.is_file())
+
+    def _evict(self) -> None:
+        # Other worker processes share the directory, so re-scan rather than trust the running total.
+        entries = sorted(
+            (path.stat().st_mtime, path.stat().st_size, path) for path in self._entries()
+        )
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self._max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        self._size_bytes = total
+        logger.info('Artifact cache evicted %s entries; local tier now %s bytes', evicted, total)
+
+    @staticmethod
+    def _record(hit: bool, size: int = 0) -> None:
+        stats = _current_stats.get()
+        if stats is None:
+            return
+        if hit:
+            stats.hits += 1
+            stats.bytes_saved += size
+        else:
+            stats.misses += 1
+
+    @contextmanager
+    def track(self) -> Iterator[CacheStats]:
+        """Collect hit/miss counters for cache lookups (and coalesced requests) made inside the block."""
+        stats = CacheStats()
+        token = _current_stats.set(stats)
+        try:
+            yield stats
+        finally:
+            _current_stats.reset(token)
+
+
+@dataclass
+class _Flight:
+    # Output path and future of every request waiting on the leader.
+    followers: list[tuple[Path, Future]] = field(default_factory=list)
+
+
+class InflightRequests:
+    """
+    Coalesces identical generation requests that are in flight in this worker process at the same time.
+
+    Requests are keyed by their artifact cache key, so two requests coalesce only when the generator
+    would have been called with the same model, kwargs, seed and input content. The first request for
+    a key leads: it checks the artifact cache, renders on a miss and then `finish`es the key, which
+    hardlinks (or copies) its output to every request that `join`ed meanwhile. Followers never reach
+    the GPU; each is credited with the leader's GPU seconds for that artifact. When the leader fails,
+    its followers are released to render on their own. Works with the artifact cache disabled.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self._enabled = enabled
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+        self._stats = {'led': 0, 'coalesced': 0, 'gpu_seconds_saved': 0.0}
+
+    def join(self, key: str, dest: Path) -> Future | None:
+        """
+        Lead or follow the request for `key`.
+
+        Returns None when the caller leads and must `finish` the key, including on failure. Otherwise
+        returns a future for `wait`, resolved once the leader's artifact is at `dest`.
+        """
+        if not self._enabled:
+            return None
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                self._flights[key] = _Flight()
+                self._stats['led'] += 1
+                return None
+            future: Future = Future()
+            flight.followers.append((dest, future))
+        logger.info('Coalescing request key=%s with the one in flight', key[:12])
+        return future
+
+    def finish(self, key: str, path: Path | None, gpu_seconds: float = 0.0) -> None:
+        """Hand the leader's artifact at `path` to its followers; None releases them to render themselves."""
+        with self._lock:
+            flight = self._flights.pop(key, None)
+        if flight is None:
+            return
+        for dest, future in flight.followers:
+            if path is None:
+                future.set_result(None)
+                continue
+            try:
+                _materialize(path, dest)
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(gpu_seconds)
+
+    def wait(self, future: Future) -> bool:
+        """Block until the leader finishes; False if the follower has to render the artifact itself."""
+        try:
+            gpu_seconds = future.result()
+        except Exception:
+            logger.exception('Failed to take over the artifact of a coalesced request')
+            return False
+        if gpu_seconds is None:
+            return False
+        with self._lock:
+            self._stats['coalesced'] += 1
+            self._stats['gpu_seconds_saved'] += gpu_seconds
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.coalesced += 1
+            stats.gpu_seconds_saved += gpu_seconds
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'gpu_seconds_saved': round(self._stats['gpu_seconds_saved'], 3),
+                'in_flight': len(self._flights),
+            }
+
+
+artifact_cache = ArtifactCache(
+    root=Path(settings.artifact_cache_dir),
+    max_bytes=int(settings.artifact_cache_max_gb * 1024**3),
+    enabled=settings.artifact_cache_enabled,
+    s3_bucket=settings.s3_bucket if settings.artifact_cache_s3_enabled else None,
+    s3_prefix=settings.artifact_cache_s3_prefix,
+    max_input_hashes=settings.artifact_cache_max_input_hashes,
+)
+inflight_requests = InflightRequests(enabled=settings.inflight_coalescing_enabled)
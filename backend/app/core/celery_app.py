@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from celery import Celery
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Deliberately free of model/service imports: the API process enqueues tasks by name through this app
+# without paying for torch/diffusers/transformers. Task implementations live in `celery_worker`.
+celery = Celery(
+    'opencine',
+    broker=settings.celery_broker_url or settings.redis_url,
+    backend=settings.celery_result_backend or settings.redis_url,
+)
+celery.conf.task_routes = {
+    'render_video_task': {'queue': 'render'},
+    'retry_render_task': {'queue': 'render'},
+    'upgrade_render_task': {'queue': 'render'},
+    'dispatch_clips_task': {'queue': 'render'},
+    'stitch_render_task': {'queue': 'render'},
+    'render_keyframe_task': {'queue': 'gpu'},
+    'render_keyframes_task': {'queue': 'gpu'},
+    'render_clip_task': {'queue': 'gpu'},
+    'synthesize_audio_task': {'queue': 'audio'},
+    'synthesize_audio_batch_task': {'queue': 'audio'},
+}
+# Acknowledge a task only once it has finished, so one lost with its worker (crash, OOM kill, spot
+# preemption) goes back to the queue. The broker redelivers an unacknowledged task after the visibility
+# timeout; the tasks are idempotent and skip artifacts that are already recorded.
+celery.conf.task_acks_late = True
+celery.conf.task_reject_on_worker_lost = True
+celery.conf.broker_transport_options = {'visibility_timeout': settings.celery_visibility_timeout_seconds}
+# GPU tasks run for minutes; never let one worker hoard a second scene it cannot start yet.
+celery.conf.worker_prefetch_multiplier = 1
+if settings.worker_prewarm_models:
+    # Prefork children load their models before reporting ready; give them time to do so.
+    celery.conf.worker_proc_alive_timeout = settings.worker_prewarm_timeout_seconds
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from app.core.config import get_settings
@@ -12,9 +16,38 @@ class Base(DeclarativeBase):
     pass
 
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+def _pool_options(url: URL) -> dict[str, int | float | bool]:
+    if url.get_backend_name() == 'sqlite':
+        return {'pool_pre_ping': True}
+    return {
+        'pool_pre_ping': True,
+        'pool_size': settings.db_pool_size,
+        'max_overflow': settings.db_max_overflow,
+        'pool_timeout': settings.db_pool_timeout_seconds,
+        'pool_recycle': settings.db_pool_recycle_seconds,
+    }
+
+
+def _async_url(url: URL) -> URL:
+    """The same database through an asyncio driver: psycopg 3 serves both, SQLite needs aiosqlite."""
+    backend = url.get_backend_name()
+    if backend == 'postgresql':
+        return url.set(drivername='postgresql+psycopg')
+    if backend == 'sqlite':
+        return url.set(drivername='sqlite+aiosqlite')
+    return url
+
+
+_url = make_url(settings.database_url)
+engine = create_engine(_url, **_pool_options(_url))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# API handlers use the async engine so a slow query does not hold up the event loop; workers and
+# code shared with them (admission, metrics) stay on the sync engine, reached from handlers
+# through `AsyncSession.run_sync`.
+async_engine = create_async_engine(_async_url(_url), **_pool_options(_url))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db():
     db = SessionLocal()
@@ -22,3 +55,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
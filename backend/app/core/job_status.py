@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+
+from sqlalchemy import and_, bindparam, case, exists, func, select, update
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.artifact_cache import CacheStats, artifact_cache
+from app.core.db import SessionLocal
+from app.models import RenderJob, RenderScene
+
+# Artifacts a scene needs before it counts as completed.
+_SCENE_OUTPUTS = ('clip_path', 'audio_path')
+ARTIFACT_FIELDS = ('keyframe_path', 'audio_path', 'clip_path')
+CHECKSUM_FIELDS = {'keyframe_path': 'keyframe_sha256', 'audio_path': 'audio_sha256', 'clip_path': 'clip_sha256'}
+
+
+def artifact_ready(scene: RenderScene, field: str) -> bool:
+    """
+    Whether the scene's recorded artifact can be reused: the file exists and, when a checksum was
+    recorded with it, still has that content (hashes are memoised on path, size and mtime).
+    """
+    path = getattr(scene, field)
+    if not path or not Path(path).is_file():
+        return False
+    expected = getattr(scene, CHECKSUM_FIELDS[field])
+    return expected is None or artifact_cache.hash_input(path) == expected
+
+
+def missing_inputs(scene: RenderScene) -> list[str]:
+    """
+    The phase-one artifacts (keyframe, audio) a scene still has to render. A scene whose clip is intact
+    needs no keyframe, so resuming a job never re-renders work that survived the crash.
+    """
+    missing = []
+    if not artifact_ready(scene, 'clip_path') and not artifact_ready(scene, 'keyframe_path'):
+        missing.append('keyframe_path')
+    if not artifact_ready(scene, 'audio_path'):
+        missing.append('audio_path')
+    return missing
+
+
+def _usage_values(cache_stats: CacheStats | None, gpu_seconds: float) -> dict[str, ColumnElement]:
+    values: dict[str, ColumnElement] = {}
+    if cache_stats is not None and (cache_stats.hits or cache_stats.misses):
+        values.update(
+            cache_hits=RenderJob.cache_hits + cache_stats.hits,
+            cache_misses=RenderJob.cache_misses + cache_stats.misses,
+            cache_bytes_saved=RenderJob.cache_bytes_saved + cache_stats.bytes_saved,
+        )
+    if cache_stats is not None and cache_stats.coalesced:
+        values.update(
+            coalesced_requests=RenderJob.coalesced_requests + cache_stats.coalesced,
+            gpu_seconds_saved=RenderJob.gpu_seconds_saved + cache_stats.gpu_seconds_saved,
+        )
+    if gpu_seconds:
+        values['gpu_seconds'] = RenderJob.gpu_seconds + gpu_seconds
+    return values
+
+
+class JobStatusWriter:
+    """
+    Job and scene progress writes from workers, in as few statements and commits as possible.
+
+    Every write is a targeted `UPDATE ... WHERE` on the job or scene key: no row is read first. The
+    outputs of a keyframe batch are stored in one transaction, and a task's cache and GPU-time
+    counters are folded into the same job update as its completed-scene recount, so finishing a
+    scene costs two statements and one commit however much it has to report.
+    """
+
+    def set_status(
+        self,
+        job_id: str,
+        status: str,
+        output_url: str | None = None,
+        only_from: Iterable[str] | None = None,
+    ) -> bool:
+        """
+        Set the job's status (and output URL); False if the job does not exist or, with `only_from`, is
+        not currently in one of those statuses.
+        """
+        values: dict[str, str] = {'status': status}
+        if output_url:
+            values['output_url'] = output_url
+        conditions = [RenderJob.celery_task_id == job_id]
+        if only_from is not None:
+            conditions.append(RenderJob.status.in_(list(only_from)))
+        db = SessionLocal()
+        try:
+            result = db.execute(update(RenderJob).where(*conditions).values(**values))
+            db.commit()
+        finally:
+            db.close()
+        return result.rowcount > 0
+
+    def mark_scenes(self, job_id: str, scene_ids: Iterable[int], status: str) -> None:
+        """Set the status of several scenes; a failure also spends one of each scene's attempts."""
+        values: dict[str, object] = {'status': status}
+        if status == 'failed':
+            values['attempts'] = RenderScene.attempts + 1
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(RenderScene)
+                .where(RenderScene.job_id == job_id, RenderScene.scene_id.in_(list(scene_ids)))
+                .values(**values)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def add_usage(self, job_id: str, cache_stats: CacheStats | None = None, gpu_seconds: float = 0.0) -> None:
+        values = _usage_values(cache_stats, gpu_seconds)
+        if not values:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(update(RenderJob).where(RenderJob.celery_task_id == job_id).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+    def record_artifacts(
+        self,
+        job_id: str,
+        field: str,
+        paths: Mapping[int, str],
+        cache_stats: CacheStats | None = None,
+        gpu_seconds: float = 0.0,
+        checksums: Mapping[int, str] | None = None,
+    ) -> None:
+        """
+        Store one kind of artifact (and its checksum) for several scenes, then recount the job's
+        completed scenes.
+
+        A scene becomes `completed` once it has both its clip and its audio and otherwise stays
+        `rendering` (a `failed` scene keeps its status until it completes), decided in the UPDATE
+        itself so concurrent tasks for other artifacts of the scene cannot race it.
+        """
+        if field not in ARTIFACT_FIELDS:
+            raise ValueError(f'Unknown scene artifact: {field}')
+        scenes = RenderScene.__table__
+        complete = and_(*(scenes.c[name].isnot(None) for name in _SCENE_OUTPUTS if name != field))
+        status = case((complete, 'completed'), (scenes.c.status == 'failed', 'failed'), else_='rendering')
+        # Recount in one statement so concurrent scene tasks cannot overwrite each other's progress.
+        completed = (
+            select(func.count(RenderScene.id))
+            .where(RenderScene.job_id == job_id, RenderScene.status == 'completed')
+            .scalar_subquery()
+        )
+        db = SessionLocal()
+        try:
+            # One executemany for the whole batch; the table-level statement keeps the ORM from
+            # treating the parameter list as a bulk update by primary key.
+            db.execute(
+                update(scenes)
+                .where(scenes.c.job_id == job_id, scenes.c.scene_id == bindparam('b_scene_id'))
+                .values({field: bindparam('b_path'), CHECKSUM_FIELDS[field]: bindparam('b_sha256'), 'status': status}),
+                [
+                    {'b_scene_id': scene_id, 'b_path': path, 'b_sha256': (checksums or {}).get(scene_id)}
+                    for scene_id, path in paths.items()
+                ],
+            )
+            db.execute(
+                update(RenderJob)
+                .where(RenderJob.celery_task_id == job_id)
+                .values(scenes_completed=completed, **_usage_values(cache_stats, gpu_seconds))
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def claim_clip_phase(self, job_id: str) -> bool:
+        """
+        Move the job from `rendering` to `rendering_clips` if its screenplay is complete and every scene
+        has its keyframe (or clip) and audio. Only one of several concurrent callers gets True.
+        """
+        waiting = exists().where(
+            RenderScene.job_id == job_id,
+            RenderScene.audio_path.is_(None) | (RenderScene.keyframe_path.is_(None) & RenderScene.clip_path.is_(None)),
+        )
+        db = SessionLocal()
+        try:
+            claimed = db.execute(
+                update(RenderJob)
+                .where(
+                    RenderJob.celery_task_id == job_id,
+                    RenderJob.status == 'rendering',
+                    RenderJob.screenplay_complete.is_(True),
+                    ~waiting,
+                )
+                .values(status='rendering_clips')
+            )
+            db.commit()
+        finally:
+            db.close()
+        return claimed.rowcount == 1
+
+
+job_status_writer = JobStatusWriter()
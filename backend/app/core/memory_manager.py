@@ -3,16 +3,28 @@ from __future__ import annotations
 import gc
 import logging
 import threading
+import time
 from collections.abc import Callable
 from typing import Any
 
 import torch
 
+from app.core.config import get_settings
+from app.core.metrics import span
+from app.core.residency import CPU, DISK, GPU, Eviction, ResidencyPolicy
+
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_GIB = 1024**3
 
 
 class ModelManager:
-    """Singleton VRAM manager that keeps only one heavy pipeline active on GPU."""
+    """
+    Singleton VRAM manager that keeps as many heavy pipelines on GPU as the memory budget allows.
+
+    With no budget configured (the default) only one heavy model is resident at a time.
+    """
 
     _instance: 'ModelManager | None' = None
     _instance_lock = threading.Lock()
@@ -32,10 +44,46 @@ class ModelManager:
         self._models: dict[str, Any] = {}
         self._active_model: str | None = None
         self._lock = threading.Lock()
-
-    def register_model(self, model_type: str, factory: Callable[[], Any]) -> None:
+        self._policy = ResidencyPolicy(
+            gpu_budget_bytes=int(settings.gpu_memory_budget_gb * _GIB),
+            host_budget_bytes=int(settings.host_memory_budget_gb * _GIB),
+        )
+        self._swap_count = 0
+        self._swap_seconds = 0.0
+        self._load_counts: dict[str, int] = {}
+
+    def register_model(self, model_type: str, factory: Callable[[], Any], vram_bytes: int | None = None) -> None:
+        """Register a pipeline factory; `vram_bytes` declares its footprint, otherwise it is measured on load."""
         logger.info('Registering model factory: %s', model_type)
         self._model_factories[model_type] = factory
+        if vram_bytes is None and model_type in settings.model_vram_gb:
+            vram_bytes = int(settings.model_vram_gb[model_type] * _GIB)
+        self._policy.declare_size(model_type, vram_bytes)
+
+    @property
+    def active_model(self) -> str | None:
+        return self._active_model
+
+    def is_resident(self, model_type: str) -> bool:
+        return self._policy.tier_of(model_type) == GPU
+
+    def resident_set(self) -> dict[str, list[str]]:
+        return self._policy.resident_set()
+
+    def eviction_log(self) -> list[dict[str, Any]]:
+        return self._policy.eviction_log()
+
+    def stats(self) -> dict[str, Any]:
+        """Swap counters since process start; a swap is any move of a model onto the GPU."""
+        return {
+            'active_model': self._active_model,
+            'swap_count': self._swap_count,
+            'swap_seconds': round(self._swap_seconds, 3),
+            'loads_by_model': dict(self._load_counts),
+            'resident': self._policy.resident_set(),
+            'gpu_used_bytes': self._policy.gpu_used_bytes(),
+            'gpu_budget_bytes': self._policy.gpu_budget_bytes,
+        }
 
     def _to_cpu(self, model_type: str) -> None:
         model = self._models.get(model_type)
@@ -44,6 +92,21 @@ class ModelManager:
         logger.info('Offloading model %s to CPU', model_type)
         model.to('cpu')
 
+    def _to_disk(self, model_type: str) -> None:
+        # Weights stay in the local model cache on disk; the factory reloads them on next use.
+        if self._models.pop(model_type, None) is not None:
+            logger.info('Dropping model %s from host memory', model_type)
+
+    def _apply(self, evictions: list[Eviction]) -> None:
+        for eviction in evictions:
+            if eviction.target == CPU:
+                self._to_cpu(eviction.model_type)
+            elif eviction.target == DISK:
+                self._to_disk(eviction.model_type)
+        if evictions:
+            self._clear_cuda()
+            logger.info('Resident set now %s', self._policy.resident_set())
+
     @staticmethod
     def _clear_cuda() -> None:
         if torch.cuda.is_available():
@@ -51,32 +114,63 @@ class ModelManager:
             torch.cuda.ipc_collect()
         gc.collect()
 
+    @staticmethod
+    def _cuda_allocated() -> int:
+        return torch.cuda.memory_allocated() if torch.cuda.is_available() else 0
+
     def load_model(self, model_type: str):
         """
-        Ensures only one heavy model is resident on GPU.
+        Ensures the requested model is resident on GPU.
 
-        If the requested model is not active on GPU, currently active model is moved to CPU,
-        CUDA cache is cleared, and requested model is moved to GPU.
+        Least-recently-used models are moved to CPU until the requested one fits the GPU budget,
+        and dropped from host memory when the host budget is exceeded.
         """
         with self._lock:
             if model_type not in self._model_factories:
                 raise KeyError(f'No factory registered for model type: {model_type}')
 
-            if self._active_model == model_type:
+            if self._policy.tier_of(model_type) == GPU:
                 logger.info('Model %s already active on GPU', model_type)
+                self._policy.touch(model_type)
+                self._active_model = model_type
                 return self._models[model_type]
 
-            if self._active_model is not None:
-                self._to_cpu(self._active_model)
-                self._clear_cuda()
-
-            if model_type not in self._models:
-                logger.info('Instantiating model: %s', model_type)
-                self._models[model_type] = self._model_factories[model_type]()
-
-            logger.info('Moving model %s to CUDA', model_type)
-            self._models[model_type].to('cuda')
-            self._active_model = model_type
+            started = time.perf_counter()
+            with span('model_swap', detail=model_type):
+                self._apply(self._policy.admit(model_type))
+
+                try:
+                    if model_type not in self._models:
+                        logger.info('Instantiating model: %s', model_type)
+                        self._models[model_type] = self._model_factories[model_type]()
+
+                    logger.info('Moving model %s to CUDA', model_type)
+                    allocated_before = self._cuda_allocated()
+                    self._models[model_type].to('cuda')
+                except BaseException:
+                    # The policy already counts the model as GPU-resident; undo that and drop the possibly
+                    # half-moved instance so the next call reloads it from scratch.
+                    logger.exception('Failed to load model %s; it will be reloaded on next use', model_type)
+                    self._policy.forget(model_type)
+                    self._models.pop(model_type, None)
+                    self._clear_cuda()
+                    raise
+                self._active_model = model_type
+                if self._policy.size_of(model_type) is None:
+                    self._policy.record_size(model_type, self._cuda_allocated() - allocated_before)
+                    self._apply(self._policy.enforce())
+
+            elapsed = time.perf_counter() - started
+            self._swap_count += 1
+            self._swap_seconds += elapsed
+            self._load_counts[model_type] = self._load_counts.get(model_type, 0) + 1
+            logger.info(
+                'Model %s active after %.2fs (swaps=%s, total swap time=%.2fs)',
+                model_type,
+                elapsed,
+                self._swap_count,
+                self._swap_seconds,
+            )
             return self._models[model_type]
 
 
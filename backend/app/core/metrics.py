@@ -0,0 +1,416 @@
+from __future__ import annotations
+
+import atexit
+import bisect
+import logging
+import queue
+import resource
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import case, delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.db import SessionLocal
+from app.models import RenderJob, RenderSpan, RenderStageRollup
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+# Peak-memory gauges cover spans that ended within this window.
+_PEAK_WINDOW = timedelta(hours=1)
+_MAX_BATCH = 500
+# How often each writer deletes spans past METRICS_SPAN_RETENTION_DAYS.
+_PRUNE_INTERVAL_SECONDS = 3600
+
+
+@dataclass
+class Span:
+    stage: str
+    job_id: str | None = None
+    scene_id: int | None = None
+    detail: str | None = None
+    status: str = 'ok'
+    seconds: float = 0.0
+    peak_gpu_bytes: int | None = None
+    peak_host_bytes: int | None = None
+    bytes_written: int = 0
+    ended_at: datetime = field(default_factory=datetime.utcnow)
+
+    def add_bytes(self, *paths: Path | str | None) -> None:
+        """Count the size of files the stage produced; missing files are ignored."""
+        for path in paths:
+            if not path:
+                continue
+            try:
+                self.bytes_written += Path(path).stat().st_size
+            except OSError:
+                pass
+
+
+class _MemoryProbe:
+    """
+    Peak CUDA and host memory while spans are open.
+
+    Peaks are process-wide and reset when the first of a set of overlapping spans opens, so spans
+    running concurrently in a thread pool each report the peak since the oldest of them started.
+    CUDA is only queried when the process has already imported torch and sees a device, so the API
+    and CPU-only workers pay nothing. Host peaks come from VmHWM, reset through /proc/self/clear_refs
+    on Linux; elsewhere they fall back to the process-lifetime `ru_maxrss`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._open = 0
+        self._host_resettable = Path('/proc/self/clear_refs').exists()
+
+    def enter(self) -> None:
+        with self._lock:
+            self._open += 1
+            if self._open == 1:
+                self._reset()
+
+    def exit(self) -> tuple[int | None, int | None]:
+        peaks = self._gpu_peak(), self._host_peak()
+        with self._lock:
+            self._open -= 1
+        return peaks
+
+    @staticmethod
+    def _cuda():
+        torch = sys.modules.get('torch')
+        if torch is None or not torch.cuda.is_available():
+            return None
+        return torch.cuda
+
+    def _reset(self) -> None:
+        cuda = self._cuda()
+        if cuda is not None:
+            cuda.reset_peak_memory_stats()
+        if self._host_resettable:
+            try:
+                Path('/proc/self/clear_refs').write_text('5')
+            except OSError:
+                self._host_resettable = False
+
+    def _gpu_peak(self) -> int | None:
+        cuda = self._cuda()
+        return cuda.max_memory_allocated() if cuda is not None else None
+
+    @staticmethod
+    def _host_peak() -> int | None:
+        try:
+            for line in Path('/proc/self/status').read_text().splitlines():
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        # ru_maxrss is KiB on Linux and bytes on macOS.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+class SpanRecorder:
+    """
+    Writes finished spans to `render_spans` from a background thread, in batches.
+
+    Instrumented code only appends to an in-memory queue, so a span costs a few microseconds on the
+    hot path and never waits on the database. Each batch also bumps the per-stage totals in
+    `render_stage_rollups` in the same transaction, which is all /metrics reads, and the writer
+    prunes spans older than the retention window once an hour. Write failures are logged and the
+    batch is dropped.
+    """
+
+    def __init__(self, enabled: bool = True, retention: timedelta | None = None) -> None:
+        self._enabled = enabled
+        self._retention = retention
+        self._last_prune: float | None = None
+        self._queue: queue.SimpleQueue[Span | threading.Event] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        if self._enabled:
+            self._queue.put(span)
+            self._ensure_writer()
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Block until every span recorded so far has been written."""
+        if not self._enabled:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        self._ensure_writer()
+        done.wait(timeout)
+
+    def _ensure_writer(self) -> None:
+        # Started lazily so prefork children each get their own writer after fork.
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._write_loop, name='span-writer', daemon=True)
+                self._thread.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            items = [self._queue.get()]
+            while len(items) < _MAX_BATCH:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            spans = [item for item in items if isinstance(item, Span)]
+            if spans:
+                self._write(spans)
+            self._maybe_prune()
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    @staticmethod
+    def _write(spans: list[Span]) -> None:
+        db = SessionLocal()
+        try:
+            db.add_all(
+                RenderSpan(
+                    job_id=span.job_id,
+                    scene_id=span.scene_id,
+                    stage=span.stage,
+                    detail=span.detail,
+                    status=span.status,
+                    seconds=span.seconds,
+                    peak_gpu_bytes=span.peak_gpu_bytes,
+                    peak_host_bytes=span.peak_host_bytes,
+                    bytes_written=span.bytes_written,
+                    created_at=span.ended_at,
+                )
+                for span in spans
+            )
+            _add_to_rollups(db, spans)
+            db.commit()
+        except Exception:
+            logger.exception('Dropping %s spans that could not be written', len(spans))
+        finally:
+            db.close()
+
+    def _maybe_prune(self) -> None:
+        if self._retention is None:
+            return
+        now = time.monotonic()
+        if self._last_prune is not None and now - self._last_prune < _PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = now
+        db = SessionLocal()
+        try:
+            result = db.execute(delete(RenderSpan).where(RenderSpan.created_at < datetime.utcnow() - self._retention))
+            db.commit()
+            if result.rowcount:
+                logger.info('Pruned %s spans older than %s', result.rowcount, self._retention)
+        except Exception:
+            logger.exception('Could not prune old spans')
+        finally:
+            db.close()
+
+
+def _bucket_of(seconds: float) -> int:
+    return bisect.bisect_left(_DURATION_BUCKETS, seconds)
+
+
+def _add_to_rollups(db: Session, spans: list[Span]) -> None:
+    totals: dict[tuple[str, int], list[float]] = {}
+    for span in spans:
+        row = totals.setdefault((span.stage, _bucket_of(span.seconds)), [0, 0, 0.0, 0])
+        row[0] += 1
+        row[1] += span.status != 'ok'
+        row[2] += span.seconds
+        row[3] += span.bytes_written
+
+    for (stage, bucket), (count, errors, seconds, bytes_written) in totals.items():
+        increment = (
+            update(RenderStageRollup)
+            .where(RenderStageRollup.stage == stage, RenderStageRollup.bucket == bucket)
+            .values(
+                count=RenderStageRollup.count + count,
+                errors=RenderStageRollup.errors + errors,
+                seconds=RenderStageRollup.seconds + seconds,
+                bytes_written=RenderStageRollup.bytes_written + bytes_written,
+            )
+        )
+        if db.execute(increment).rowcount:
+            continue
+        try:
+            with db.begin_nested():
+                db.add(
+                    RenderStageRollup(
+                        stage=stage, bucket=bucket, count=count, errors=errors, seconds=seconds, bytes_written=bytes_written
+                    )
+                )
+        except IntegrityError:
+            # Another worker created the row first.
+            db.execute(increment)
+
+
+_probe = _MemoryProbe()
+span_recorder = SpanRecorder(
+    enabled=settings.metrics_enabled,
+    retention=timedelta(days=settings.metrics_span_retention_days) if settings.metrics_span_retention_days else None,
+)
+atexit.register(span_recorder.flush, 2.0)
+
+
+@contextmanager
+def span(stage: str, job_id: str | None = None, scene_id: int | None = None, detail: str | None = None) -> Iterator[Span]:
+    """
+    Time a pipeline stage and record its wall time, peak memory and the bytes it wrote.
+
+    Callers report output sizes through `Span.add_bytes` (or by setting `bytes_written`). A stage that
+    raises is recorded with status `error` and the exception propagates.
+    """
+    current = Span(stage=stage, job_id=job_id, scene_id=scene_id, detail=detail)
+    if not settings.metrics_enabled:
+        yield current
+        return
+    _probe.enter()
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.status = 'error'
+        raise
+    finally:
+        current.seconds = time.perf_counter() - started
+        current.peak_gpu_bytes, current.peak_host_bytes = _probe.exit()
+        current.ended_at = datetime.utcnow()
+        span_recorder.record(current)
+
+
+def stage_summary(db: Session, job_id: str) -> dict[str, dict[str, Any]]:
+    """Per-stage totals of a job's spans: count, errors, seconds, peak memory and bytes written."""
+    rows = (
+        db.query(
+            RenderSpan.stage,
+            func.count(RenderSpan.id),
+            func.sum(case((RenderSpan.status != 'ok', 1), else_=0)),
+            func.sum(RenderSpan.seconds),
+            func.max(RenderSpan.peak_gpu_bytes),
+            func.max(RenderSpan.peak_host_bytes),
+            func.sum(RenderSpan.bytes_written),
+        )
+        .filter(RenderSpan.job_id == job_id)
+        .group_by(RenderSpan.stage)
+    )
+    return {
+        stage: {
+            'count': count,
+            'errors': errors or 0,
+            'seconds': round(seconds or 0.0, 3),
+            'peak_gpu_bytes': peak_gpu,
+            'peak_host_bytes': peak_host,
+            'bytes_written': bytes_written or 0,
+        }
+        for stage, count, errors, seconds, peak_gpu, peak_host, bytes_written in rows
+    }
+
+
+def persist_job_summary(job_id: str) -> None:
+    """Store the job's per-stage summary on its record once its spans have been written."""
+    if not settings.metrics_enabled:
+        return
+    span_recorder.flush()
+    db = SessionLocal()
+    try:
+        summary = stage_summary(db, job_id)
+        db.execute(update(RenderJob).where(RenderJob.celery_task_id == job_id).values(stage_metrics=summary))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels: Any) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def render_prometheus(db: Session) -> str:
+    """
+    Prometheus text exposition of stage spans and job counters.
+
+    Stage totals come from `render_stage_rollups`, a handful of rows per stage; only the peak-memory
+    gauges touch `render_spans`, through the `created_at` index and bounded by `_PEAK_WINDOW`.
+    """
+    lines: list[str] = []
+
+    def metric(name: str, kind: str, help_text: str) -> None:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    stages: dict[str, dict[str, Any]] = {}
+    for row in db.query(RenderStageRollup).order_by(RenderStageRollup.stage, RenderStageRollup.bucket):
+        totals = stages.setdefault(
+            row.stage, {'buckets': [0] * len(_DURATION_BUCKETS), 'count': 0, 'errors': 0, 'seconds': 0.0, 'bytes': 0}
+        )
+        for index in range(row.bucket, len(_DURATION_BUCKETS)):
+            totals['buckets'][index] += row.count
+        totals['count'] += row.count
+        totals['errors'] += row.errors
+        totals['seconds'] += row.seconds
+        totals['bytes'] += row.bytes_written
+
+    metric('opencine_stage_duration_seconds', 'histogram', 'Wall time of pipeline stages.')
+    for stage, totals in stages.items():
+        for bound, observed in zip(_DURATION_BUCKETS, totals['buckets']):
+            lines.append(f'opencine_stage_duration_seconds_bucket{_labels(stage=stage, le=bound)} {observed}')
+        lines.append(f'opencine_stage_duration_seconds_bucket{_labels(stage=stage, le="+Inf")} {totals["count"]}')
+        lines.append(f'opencine_stage_duration_seconds_sum{_labels(stage=stage)} {totals["seconds"]:.3f}')
+        lines.append(f'opencine_stage_duration_seconds_count{_labels(stage=stage)} {totals["count"]}')
+    metric('opencine_stage_errors_total', 'counter', 'Pipeline stages that raised.')
+    for stage, totals in stages.items():
+        lines.append(f'opencine_stage_errors_total{_labels(stage=stage)} {totals["errors"]}')
+    metric('opencine_stage_bytes_written_total', 'counter', 'Bytes of output written by pipeline stages.')
+    for stage, totals in stages.items():
+        lines.append(f'opencine_stage_bytes_written_total{_labels(stage=stage)} {totals["bytes"]}')
+
+    peak_rows = (
+        db.query(RenderSpan.stage, func.max(RenderSpan.peak_gpu_bytes), func.max(RenderSpan.peak_host_bytes))
+        .filter(RenderSpan.created_at >= datetime.utcnow() - _PEAK_WINDOW)
+        .group_by(RenderSpan.stage)
+        .all()
+    )
+    metric('opencine_stage_peak_gpu_bytes', 'gauge', 'Peak CUDA memory allocated during stages that ended in the last hour.')
+    for stage, peak_gpu, _ in peak_rows:
+        if peak_gpu is not None:
+            lines.append(f'opencine_stage_peak_gpu_bytes{_labels(stage=stage)} {peak_gpu}')
+    metric('opencine_stage_peak_host_bytes', 'gauge', 'Peak worker RSS during stages that ended in the last hour.')
+    for stage, _, peak_host in peak_rows:
+        if peak_host is not None:
+            lines.append(f'opencine_stage_peak_host_bytes{_labels(stage=stage)} {peak_host}')
+
+    metric('opencine_jobs', 'gauge', 'Render jobs by status.')
+    for status, count in db.query(RenderJob.status, func.count(RenderJob.id)).group_by(RenderJob.status):
+        lines.append(f'opencine_jobs{_labels(status=status)} {count}')
+    scenes, gpu_seconds, coalesced, gpu_seconds_saved = db.query(
+        func.sum(RenderJob.scenes_completed),
+        func.sum(RenderJob.gpu_seconds),
+        func.sum(RenderJob.coalesced_requests),
+        func.sum(RenderJob.gpu_seconds_saved),
+    ).one()
+    metric('opencine_scenes_completed_total', 'counter', 'Scenes rendered across all jobs.')
+    lines.append(f'opencine_scenes_completed_total {scenes or 0}')
+    metric('opencine_gpu_seconds_total', 'counter', 'GPU time spent on keyframes and clips across all jobs.')
+    lines.append(f'opencine_gpu_seconds_total {gpu_seconds or 0.0:.3f}')
+    metric('opencine_coalesced_requests_total', 'counter', 'Generation requests served by an identical one in flight.')
+    lines.append(f'opencine_coalesced_requests_total {coalesced or 0}')
+    metric('opencine_gpu_seconds_saved_total', 'counter', 'GPU time coalesced requests did not spend.')
+    lines.append(f'opencine_gpu_seconds_saved_total {gpu_seconds_saved or 0.0:.3f}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from app.core.config import get_settings
+from app.core.memory_manager import ModelManager, model_manager
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+T = TypeVar('T')
+
+
+@dataclass
+class GpuUsage:
+    seconds: float = 0.0
+
+
+_current_usage: contextvars.ContextVar[GpuUsage | None] = contextvars.ContextVar('gpu_usage', default=None)
+
+
+@dataclass
+class _WorkItem:
+    work: Callable[[Any], Any]
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    usage: GpuUsage | None = None
+
+
+class PhaseScheduler:
+    """
+    Runs GPU work one model residency ("phase") at a time.
+
+    Callers submit work tagged with the model it needs. A single dispatcher thread owns the GPU and,
+    once a model is loaded, keeps serving it - across scenes and across jobs handled by the same
+    worker process - until its queue drains, then swaps to a resident model or the one with the
+    oldest waiting request. `max_phase_items` caps how many items one model serves in a row while
+    another model has work waiting, so a steady stream for one model cannot starve the others; with
+    nothing else waiting the resident model is never swapped out.
+
+    Grouping is per process: only callers sharing this process (the `threads` pool) queue here
+    together. A prefork child runs one task at a time, so its scheduler never sees more than one
+    request and each task is served as it comes.
+    """
+
+    def __init__(self, manager: ModelManager, max_phase_items: int = 16) -> None:
+        self._manager = manager
+        self._max_phase_items = max_phase_items
+        self._pending: dict[str, deque[_WorkItem]] = {}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._phase_count = 0
+        self._items_served = 0
+
+    def submit(self, model_type: str, work: Callable[[Any], T]) -> Future:
+        """Queue `work(pipeline)` to run while `model_type` is resident; returns a future for its result."""
+        item = _WorkItem(work=work, usage=_current_usage.get())
+        with self._cond:
+            self._pending.setdefault(model_type, deque()).append(item)
+            self._ensure_dispatcher()
+            self._cond.notify()
+        return item.future
+
+    def run(self, model_type: str, work: Callable[[Any], T]) -> T:
+        return self.submit(model_type, work).result()
+
+    @contextmanager
+    def track(self) -> Iterator[GpuUsage]:
+        """Accumulate the GPU time of work submitted inside the block (model loads excluded)."""
+        usage = GpuUsage()
+        token = _current_usage.set(usage)
+        try:
+            yield usage
+        finally:
+            _current_usage.reset(token)
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            pending = {model_type: len(queue) for model_type, queue in self._pending.items() if queue}
+        return {
+            'phases': self._phase_count,
+            'items_served': self._items_served,
+            'pending': pending,
+            **self._manager.stats(),
+        }
+
+    def _ensure_dispatcher(self) -> None:
+        # Started lazily so prefork children each get their own dispatcher after fork.
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._dispatch_loop, name='gpu-phase-scheduler', daemon=True)
+            self._thread.start()
+
+    def _next_model(self, capped: str | None = None) -> str | None:
+        """
+        The model to serve next: the active one while it has work, unless it is `capped` (has used up
+        its run of `max_phase_items`) and another model is waiting.
+        """
+        active = self._manager.active_model
+        if active and active != capped and self._pending.get(active):
+            return active
+        waiting = [
+            (queue[0].enqueued_at, model_type)
+            for model_type, queue in self._pending.items()
+            if queue and model_type != capped
+        ]
+        # Prefer work for any model that is already resident, then the oldest waiting request.
+        resident = [entry for entry in waiting if self._manager.is_resident(entry[1])]
+        if resident:
+            return min(resident)[1]
+        if waiting:
+            return min(waiting)[1]
+        # Only the capped model has work left; keep serving it rather than idling or swapping.
+        if capped and self._pending.get(capped):
+            return capped
+        return None
+
+    def _dispatch_loop(self) -> None:
+        # Items the current model has served in a row; counts across phases that drained its queue.
+        run_model: str | None = None
+        run_length = 0
+        while True:
+            capped = run_model if run_length >= self._max_phase_items else None
+            with self._cond:
+                while (model_type := self._next_model(capped=capped)) is None:
+                    self._cond.wait()
+            if model_type != run_model or model_type == capped:
+                # A new model, or the capped one again because nothing else is waiting: start a fresh run.
+                run_model, run_length = model_type, 0
+            run_length += self._run_phase(model_type, self._max_phase_items - run_length)
+
+    def _run_phase(self, model_type: str, limit: int) -> int:
+        """Serve up to `limit` queued items for `model_type`; returns how many were served."""
+        try:
+            pipe = self._manager.load_model(model_type)
+        except Exception as exc:
+            logger.exception('Failed to load model %s; failing its pending work', model_type)
+            with self._cond:
+                failed = list(self._pending.pop(model_type, ()))
+            for item in failed:
+                item.future.set_exception(exc)
+            return 0
+
+        self._phase_count += 1
+        started = time.perf_counter()
+        served = 0
+        while served < limit:
+            with self._cond:
+                queue = self._pending.get(model_type)
+                if not queue:
+                    break
+                item = queue.popleft()
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            item_started = time.perf_counter()
+            try:
+                result, error = item.work(pipe), None
+            except BaseException as exc:
+                result, error = None, exc
+            # Charge the caller before resolving the future so its tracked usage is complete on return.
+            if item.usage is not None:
+                item.usage.seconds += time.perf_counter() - item_started
+            if error is not None:
+                item.future.set_exception(error)
+            else:
+                item.future.set_result(result)
+            served += 1
+
+        self._items_served += served
+        logger.info(
+            'Phase %s finished model=%s items=%s elapsed=%.2fs',
+            self._phase_count,
+            model_type,
+            served,
+            time.perf_counter() - started,
+        )
+        return served
+
+
+phase_scheduler = PhaseScheduler(model_manager, max_phase_items=settings.gpu_phase_max_items)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class RenderPreset:
+    """
+    Quality/speed tier for a render.
+
+    Keyframes keep their resolution across tiers so that a seeded draft keyframe has the same
+    composition as its final re-render; video, which dominates GPU time, also drops resolution.
+    Video sizes are multiples of 16 as Hunyuan requires.
+    """
+
+    name: str
+    keyframe_steps: int
+    keyframe_guidance: float
+    video_steps: int
+    video_guidance: float
+    video_width: int
+    video_height: int
+
+
+PRESETS: dict[str, RenderPreset] = {
+    'draft': RenderPreset('draft', keyframe_steps=8, keyframe_guidance=4.0, video_steps=12, video_guidance=6.0, video_width=640, video_height=368),
+    'preview': RenderPreset('preview', keyframe_steps=20, keyframe_guidance=4.0, video_steps=24, video_guidance=6.0, video_width=960, video_height=544),
+    'final': RenderPreset('final', keyframe_steps=35, keyframe_guidance=4.0, video_steps=40, video_guidance=6.0, video_width=1280, video_height=720),
+}
+
+
+def get_preset(name: str | None = None) -> RenderPreset:
+    name = name or settings.render_default_preset
+    if name not in PRESETS:
+        raise ValueError(f'Unknown render preset {name!r}; expected one of {sorted(PRESETS)}')
+    return PRESETS[name]
+
+
+def scaled_steps(steps: int, shot_type: str | None) -> int:
+    """Apply the per-shot-type step budget (`SHOT_TYPE_STEP_SCALE`) to a preset's step count."""
+    return max(1, round(steps * settings.shot_type_step_scale.get(shot_type or '', 1.0)))
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy.orm import Session
+
+from app.core.admission import PRIORITY_NAMES
+from app.core.config import get_settings
+from app.core.db import SessionLocal
+from app.models import RenderJob, RenderScene
+from app.schemas import JobStatusResponse, SceneStatusResponse
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+TERMINAL_STATUSES = ('completed', 'failed')
+_STATUS_PREFIX = 'opencine:job-status'
+_CHANNEL_PREFIX = 'opencine:progress'
+# Events buffered per watcher; snapshots are cumulative, so a slow watcher only loses intermediate ones.
+_WATCHER_BUFFER = 8
+# Redis connections per API process; a burst of stream openings queues for these instead of opening one each.
+_MAX_CONNECTIONS = 32
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    name: str
+    job: dict[str, Any]
+    # The event as published, forwarded to every watcher without re-encoding.
+    data: str
+
+
+def _status_key(job_id: str) -> str:
+    return f'{_STATUS_PREFIX}:{job_id}'
+
+
+def _channel(job_id: str) -> str:
+    return f'{_CHANNEL_PREFIX}:{job_id}'
+
+
+def load_job_status(db: Session, job_id: str) -> dict[str, Any] | None:
+    """
+    The `GET /v1/renders/<id>` body for a job, read from the database; None if the job does not exist.
+
+    One SELECT joins the job to its scenes' status columns, since workers call this after every write.
+    """
+    rows = (
+        db.query(RenderJob, RenderScene.scene_id, RenderScene.status, RenderScene.attempts)
+        .outerjoin(RenderScene, RenderScene.job_id == RenderJob.celery_task_id)
+        .filter(RenderJob.celery_task_id == job_id)
+        .order_by(RenderScene.scene_id)
+        .all()
+    )
+    if not rows:
+        return None
+    job = rows[0][0]
+    return JobStatusResponse(
+        job_id=job_id,
+        status=job.status,
+        output_url=job.output_url,
+        scenes_total=job.scenes_total,
+        scenes_completed=job.scenes_completed,
+        cache_hits=job.cache_hits,
+        cache_misses=job.cache_misses,
+        cache_bytes_saved=job.cache_bytes_saved,
+        preset=job.preset,
+        parent_job_id=job.parent_job_id,
+        gpu_seconds=round(job.gpu_seconds or 0.0, 2),
+        coalesced_requests=job.coalesced_requests or 0,
+        gpu_seconds_saved=round(job.gpu_seconds_saved or 0.0, 2),
+        tenant_id=job.tenant_id,
+        priority=PRIORITY_NAMES.get(job.priority, str(job.priority)),
+        stages=job.stage_metrics,
+        scenes=[
+            SceneStatusResponse(scene_id=scene_id, status=status, attempts=attempts)
+            for _, scene_id, status, attempts in rows
+            if scene_id is not None
+        ],
+    ).model_dump(mode='json')
+
+
+def _cache_ttl(snapshot: dict[str, Any]) -> int:
+    # Running jobs expire quickly so a snapshot published out of order by racing workers self-heals.
+    if snapshot['status'] in TERMINAL_STATUSES:
+        return settings.progress_cache_ttl_seconds
+    return settings.progress_cache_active_ttl_seconds
+
+
+class ProgressPublisher:
+    """
+    Stores a job's status snapshot in Redis and announces it on the job's progress channel.
+
+    Called by workers after every status or scene change, and by the API when it changes a job. Each
+    event carries the full snapshot, so watchers never need to merge deltas. Redis failures are
+    logged and ignored: the database stays the source of truth and readers fall back to it.
+    """
+
+    def __init__(self, url: str) -> None:
+        self._redis = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+
+    def publish(self, job_id: str, event: str = 'status', scene_id: int | None = None, stage: str | None = None) -> None:
+        self._send(job_id, [(event, scene_id, stage)])
+
+    def publish_scenes(self, job_id: str, scene_ids: Iterable[int], stage: str | None = None) -> None:
+        """One `scene` event per scene, sharing a single snapshot read and Redis round trip."""
+        self._send(job_id, [('scene', scene_id, stage) for scene_id in scene_ids])
+
+    def _send(self, job_id: str, events: list[tuple[str, int | None, str | None]]) -> None:
+        db = SessionLocal()
+        try:
+            snapshot = load_job_status(db, job_id)
+        finally:
+            db.close()
+        if snapshot is None:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.set(_status_key(job_id), json.dumps(snapshot), ex=_cache_ttl(snapshot))
+            for event, scene_id, stage in events:
+                payload = {'event': event, 'scene_id': scene_id, 'stage': stage, 'job': snapshot}
+                pipe.publish(_channel(job_id), json.dumps(payload))
+            pipe.execute()
+        except redis.RedisError as exc:
+            logger.warning('Could not publish progress for job=%s: %s', job_id, exc)
+
+
+class ProgressHub:
+    """
+    Per-API-process fan-out of job progress to streaming clients.
+
+    One pattern subscription receives every job's events, and each event is handed to the in-process
+    queues of that job's watchers, so thousands of watchers share a single Redis connection and never
+    touch the database. The status cache is read through the same client. The Redis client is bound
+    to the event loop that first uses it.
+    """
+
+    def __init__(self, url: str) -> None:
+        self._url = url
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._redis: aioredis.Redis | None = None
+        self._listener: asyncio.Task | None = None
+        self._subscribed: asyncio.Event | None = None
+        self._watchers: dict[str, set[asyncio.Queue[ProgressEvent]]] = {}
+
+    def _client(self) -> aioredis.Redis:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            pool = aioredis.BlockingConnectionPool.from_url(
+                self._url, max_connections=_MAX_CONNECTIONS, timeout=5, socket_connect_timeout=2
+            )
+            self._redis = aioredis.Redis(connection_pool=pool)
+            self._listener = None
+        return self._redis
+
+    @property
+    def watcher_count(self) -> int:
+        return sum(len(queues) for queues in self._watchers.values())
+
+    async def cached_status(self, job_id: str) -> dict[str, Any] | None:
+        try:
+            raw = await self._client().get(_status_key(job_id))
+        except redis.RedisError:
+            logger.warning('Status cache unavailable; reading job=%s from the database', job_id)
+            return None
+        return json.loads(raw) if raw else None
+
+    async def cache_status(self, job_id: str, snapshot: dict[str, Any]) -> None:
+        try:
+            await self._client().set(_status_key(job_id), json.dumps(snapshot), ex=_cache_ttl(snapshot), nx=True)
+        except redis.RedisError:
+            pass
+
+    @asynccontextmanager
+    async def watch(self, job_id: str) -> AsyncIterator[asyncio.Queue[ProgressEvent]]:
+        """Receive the job's progress events; subscribed before returning, so nothing published after is missed."""
+        await self._ensure_listener()
+        queue: asyncio.Queue[ProgressEvent] = asyncio.Queue(maxsize=_WATCHER_BUFFER)
+        self._watchers.setdefault(job_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            watchers = self._watchers.get(job_id)
+            if watchers is not None:
+                watchers.discard(queue)
+                if not watchers:
+                    del self._watchers[job_id]
+
+    async def _ensure_listener(self) -> None:
+        self._client()
+        if self._listener is None or self._listener.done():
+            self._subscribed = asyncio.Event()
+            self._listener = asyncio.create_task(self._listen(self._subscribed))
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout=2)
+        except asyncio.TimeoutError:
+            # Redis is down; watchers still get periodic snapshots from the status read path.
+            pass
+
+    async def _listen(self, subscribed: asyncio.Event) -> None:
+        prefix = f'{_CHANNEL_PREFIX}:'
+        while True:
+            try:
+                async with self._client().pubsub() as pubsub:
+                    await pubsub.psubscribe(f'{prefix}*')
+                    subscribed.set()
+                    async for message in pubsub.listen():
+                        if message['type'] != 'pmessage':
+                            continue
+                        job_id = message['channel'].decode()[len(prefix) :]
+                        queues = self._watchers.get(job_id)
+                        if queues:
+                            data = message['data'].decode()
+                            payload = json.loads(data)
+                            event = ProgressEvent(payload['event'], payload['job'], data)
+                            for queue in queues:
+                                _offer(queue, event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning('Progress subscription lost (%s); reconnecting', exc)
+                await asyncio.sleep(1)
+
+
+def _offer(queue: asyncio.Queue[ProgressEvent], event: ProgressEvent) -> None:
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+progress_publisher = ProgressPublisher(settings.redis_url)
+progress_hub = ProgressHub(settings.redis_url)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+GPU = 'cuda'
+CPU = 'cpu'
+DISK = 'disk'
+
+
+@dataclass(frozen=True)
+class Eviction:
+    model_type: str
+    source: str
+    target: str
+    size_bytes: int | None
+    reason: str
+    at: float
+
+
+class ResidencyPolicy:
+    """
+    Byte-budgeted LRU bookkeeping for the GPU and host tiers.
+
+    The policy only decides; it never touches tensors. `admit` returns the evictions the caller must
+    apply (GPU -> CPU, CPU -> disk) before moving the requested model onto the GPU. A budget of 0
+    on the GPU tier keeps a single model resident; a budget of 0 on the host tier means unbounded.
+    Models with an unknown footprint are treated as filling the GPU until `record_size` is called.
+    """
+
+    def __init__(self, gpu_budget_bytes: int = 0, host_budget_bytes: int = 0, history: int = 256) -> None:
+        self.gpu_budget_bytes = gpu_budget_bytes
+        self.host_budget_bytes = host_budget_bytes
+        self._sizes: dict[str, int] = {}
+        self._gpu: OrderedDict[str, None] = OrderedDict()
+        self._host: OrderedDict[str, None] = OrderedDict()
+        self._evictions: deque[Eviction] = deque(maxlen=history)
+
+    def declare_size(self, model_type: str, size_bytes: int | None) -> None:
+        if size_bytes:
+            self._sizes[model_type] = size_bytes
+
+    def record_size(self, model_type: str, size_bytes: int) -> None:
+        """Store a measured footprint unless one was declared at registration."""
+        if size_bytes > 0:
+            self._sizes.setdefault(model_type, size_bytes)
+
+    def size_of(self, model_type: str) -> int | None:
+        return self._sizes.get(model_type)
+
+    def tier_of(self, model_type: str) -> str:
+        if model_type in self._gpu:
+            return GPU
+        if model_type in self._host:
+            return CPU
+        return DISK
+
+    def gpu_used_bytes(self) -> int:
+        return sum(self._sizes.get(model_type, 0) for model_type in self._gpu)
+
+    def host_used_bytes(self) -> int:
+        return sum(self._sizes.get(model_type, 0) for model_type in self._host)
+
+    def touch(self, model_type: str) -> None:
+        if model_type in self._gpu:
+            self._gpu.move_to_end(model_type)
+
+    def _fits(self, model_type: str) -> bool:
+        size = self._sizes.get(model_type)
+        if self.gpu_budget_bytes <= 0 or size is None or any(resident not in self._sizes for resident in self._gpu):
+            return not self._gpu
+        return self.gpu_used_bytes() + size <= self.gpu_budget_bytes
+
+    def admit(self, model_type: str) -> list[Eviction]:
+        """Mark `model_type` GPU-resident and return the evictions needed to stay within budget."""
+        if model_type in self._gpu:
+            self._gpu.move_to_end(model_type)
+            return []
+
+        evictions: list[Eviction] = []
+        while self._gpu and not self._fits(model_type):
+            victim, _ = self._gpu.popitem(last=False)
+            self._host[victim] = None
+            evictions.append(self._evict(victim, GPU, CPU, f'make room for {model_type}'))
+
+        if self._sizes.get(model_type, 0) > self.gpu_budget_bytes > 0:
+            logger.warning(
+                'Model %s (%s bytes) exceeds GPU budget %s bytes; loading it alone',
+                model_type,
+                self._sizes[model_type],
+                self.gpu_budget_bytes,
+            )
+
+        self._host.pop(model_type, None)
+        self._gpu[model_type] = None
+
+        if self.host_budget_bytes > 0:
+            while self._host and self.host_used_bytes() > self.host_budget_bytes:
+                victim, _ = self._host.popitem(last=False)
+                evictions.append(self._evict(victim, CPU, DISK, 'host budget exceeded'))
+        return evictions
+
+    def forget(self, model_type: str) -> None:
+        """Drop `model_type` from every tier, e.g. after an admitted model failed to load or move."""
+        self._gpu.pop(model_type, None)
+        self._host.pop(model_type, None)
+
+    def enforce(self) -> list[Eviction]:
+        """Re-check the GPU budget after a footprint was measured, evicting LRU models if needed."""
+        if not self._gpu:
+            return []
+        newest = next(reversed(self._gpu))
+        self._gpu.pop(newest)
+        return self.admit(newest)
+
+    def _evict(self, model_type: str, source: str, target: str, reason: str) -> Eviction:
+        eviction = Eviction(
+            model_type=model_type,
+            source=source,
+            target=target,
+            size_bytes=self._sizes.get(model_type),
+            reason=reason,
+            at=time.time(),
+        )
+        self._evictions.append(eviction)
+        logger.info('Evicting model %s %s -> %s (%s)', model_type, source, target, reason)
+        return eviction
+
+    def resident_set(self) -> dict[str, list[str]]:
+        """Models per tier, least recently used first."""
+        return {GPU: list(self._gpu), CPU: list(self._host)}
+
+    def eviction_log(self) -> list[dict[str, Any]]:
+        return [asdict(eviction) for eviction in self._evictions]
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import logging
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_MIB = 1024 * 1024
+_READ_CHUNK = 4 * _MIB
+
+
+@lru_cache(maxsize=1)
+def s3_client():
+    """Process-wide S3 client; boto3 clients are thread-safe and keep a pool of keep-alive connections."""
+    return boto3.client(
+        's3',
+        region_name=settings.s3_region,
+        endpoint_url=settings.s3_endpoint_url or None,
+        config=Config(
+            max_pool_connections=settings.s3_max_pool_connections,
+            retries={'max_attempts': 5, 'mode': 'standard'},
+            tcp_keepalive=True,
+        ),
+    )
+
+
+def _sha256_b64(data: bytes) -> str:
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+def _same_part(stored: dict[str, Any], body: bytes, checksum: str) -> bool:
+    if stored.get('Size') != len(body):
+        return False
+    if 'ChecksumSHA256' in stored:
+        return stored['ChecksumSHA256'] == checksum
+    # Stores that omit part checksums from ListParts still report the MD5 ETag of unencrypted parts.
+    return stored.get('ETag', '').strip('"') == hashlib.md5(body).hexdigest()
+
+
+class MultipartUpload:
+    """
+    Byte sink that uploads to S3 in numbered parts while the data is still being produced.
+
+    Full parts are handed to the uploader's thread pool as soon as they are buffered; at most
+    `max_in_flight` parts are held in memory, so a fast producer blocks instead of buffering the file.
+    Every part carries a SHA-256 checksum that S3 verifies on receipt. If an unfinished upload for the
+    same key exists (an earlier attempt failed), its parts are reused wherever the new bytes produce
+    the same checksum, so a retry only sends what changed or was never received.
+    """
+
+    def __init__(
+        self,
+        client,
+        executor: ThreadPoolExecutor,
+        bucket: str,
+        key: str,
+        part_size: int,
+        max_in_flight: int,
+        content_type: str,
+    ) -> None:
+        self._client = client
+        self._executor = executor
+        self._bucket = bucket
+        self._key = key
+        self._part_size = part_size
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._buffer = bytearray()
+        self._part_number = 0
+        self._futures: list[Future] = []
+        self._error: BaseException | None = None
+        self.bytes_sent = 0
+        self.parts_reused = 0
+        self._upload_id, self._existing = self._resume_or_create(content_type)
+
+    @property
+    def url(self) -> str:
+        return f's3://{self._bucket}/{self._key}'
+
+    def _resume_or_create(self, content_type: str) -> tuple[str, dict[int, dict[str, Any]]]:
+        response = self._client.list_multipart_uploads(Bucket=self._bucket, Prefix=self._key)
+        uploads = [upload for upload in response.get('Uploads', []) if upload['Key'] == self._key]
+        if uploads:
+            upload_id = max(uploads, key=lambda upload: upload['Initiated'])['UploadId']
+            existing: dict[int, dict[str, Any]] = {}
+            paginator = self._client.get_paginator('list_parts')
+            for page in paginator.paginate(Bucket=self._bucket, Key=self._key, UploadId=upload_id):
+                for part in page.get('Parts', []):
+                    existing[part['PartNumber']] = part
+            logger.info('Resuming multipart upload key=%s with %s parts already stored', self._key, len(existing))
+            return upload_id, existing
+
+        response = self._client.create_multipart_upload(
+            Bucket=self._bucket,
+            Key=self._key,
+            ContentType=content_type,
+            ChecksumAlgorithm='SHA256',
+        )
+        return response['UploadId'], {}
+
+    def write(self, data: bytes) -> None:
+        self._buffer += data
+        while len(self._buffer) >= self._part_size:
+            part = bytes(self._buffer[: self._part_size])
+            del self._buffer[: self._part_size]
+            self._submit(part)
+
+    def _submit(self, body: bytes) -> None:
+        if self._error is not None:
+            raise self._error
+        self._part_number += 1
+        number = self._part_number
+        checksum = _sha256_b64(body)
+
+        stored = self._existing.get(number)
+        if stored and _same_part(stored, body, checksum):
+            future: Future = Future()
+            future.set_result({'PartNumber': number, 'ETag': stored['ETag'], 'ChecksumSHA256': checksum})
+            self.parts_reused += 1
+            self._futures.append(future)
+            return
+
+        self._slots.acquire()
+        future = self._executor.submit(self._upload_part, number, body, checksum)
+        future.add_done_callback(self._part_done)
+        self._futures.append(future)
+
+    def _part_done(self, future: Future) -> None:
+        self._slots.release()
+        if future.exception() is not None and self._error is None:
+            self._error = future.exception()
+
+    def _upload_part(self, number: int, body: bytes, checksum: str) -> dict[str, Any]:
+        response = self._client.upload_part(
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            PartNumber=number,
+            Body=body,
+            ChecksumAlgorithm='SHA256',
+            ChecksumSHA256=checksum,
+        )
+        self.bytes_sent += len(body)
+        return {'PartNumber': number, 'ETag': response['ETag'], 'ChecksumSHA256': checksum}
+
+    def complete(self) -> str:
+        if self._buffer or self._part_number == 0:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        parts = [future.result() for future in self._futures]
+        self._client.complete_multipart_upload(
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            MultipartUpload={'Parts': parts},
+        )
+        logger.info(
+            'Uploaded %s in %s parts (%s reused, %s bytes sent)',
+            self.url,
+            len(parts),
+            self.parts_reused,
+            self.bytes_sent,
+        )
+        return self.url
+
+    def drain(self) -> None:
+        """Wait for parts already handed to the pool so a failed attempt leaves a consistent upload behind."""
+        wait(self._futures)
+
+    def abort(self) -> None:
+        """Discard the upload and its stored parts, for output that will not be produced again as is."""
+        self.drain()
+        try:
+            self._client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id)
+        except (BotoCoreError, ClientError):
+            logger.exception('Failed to abort multipart upload of %s', self.url)
+            return
+        logger.info('Aborted multipart upload of %s', self.url)
+
+
+class S3Uploader:
+    """
+    Pooled multipart uploader shared by every task in the process.
+
+    Use `stream` to upload output while it is still being written, or `upload_file` for a finished file.
+    Uploads that fail are left open on S3 so the next attempt for the same key can resume them; a bucket
+    lifecycle rule aborting incomplete multipart uploads after a few days cleans up abandoned ones.
+    """
+
+    def __init__(self, part_size: int, max_concurrency: int, client=None) -> None:
+        self._client = client
+        self._part_size = part_size
+        self._max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='s3-upload')
+
+    @contextmanager
+    def stream(self, bucket: str, key: str, content_type: str = 'video/mp4') -> Iterator[MultipartUpload]:
+        upload = MultipartUpload(
+            self._client or s3_client(),
+            self._executor,
+            bucket,
+            key,
+            part_size=self._part_size,
+            max_in_flight=self._max_concurrency,
+            content_type=content_type,
+        )
+        try:
+            yield upload
+            upload.complete()
+        except BaseException:
+            upload.drain()
+            logger.warning('Upload of %s interrupted; stored parts are kept for the next attempt', upload.url)
+            raise
+
+    def upload_file(self, path: Path, bucket: str, key: str, content_type: str = 'video/mp4') -> str:
+        with self.stream(bucket, key, content_type=content_type) as upload:
+            with path.open('rb') as handle:
+                while chunk := handle.read(_READ_CHUNK):
+                    upload.write(chunk)
+        return upload.url
+
+
+s3_uploader = S3Uploader(
+    part_size=settings.s3_upload_part_size_mb * _MIB,
+    max_concurrency=settings.s3_upload_max_concurrency,
+)
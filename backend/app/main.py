@@ -1,21 +1,37 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import secrets
 import uuid
+from collections.abc import AsyncIterator
+from typing import Any
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import func, select
 from sqlalchemy.exc import SQLAlchemyError
-import uuid
-
-from fastapi import Depends, FastAPI, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.admission import PENDING, PRIORITIES, admission_controller
 from app.core.config import get_settings
-from app.core.db import Base, engine, get_db
+from app.core.db import AsyncSessionLocal, Base, engine, get_async_db
 from app.core.logging import setup_logging
-from app.models import RenderJob
-from app.schemas import CreateRenderRequest, CreateRenderResponse, JobStatusResponse
-from celery_worker import render_video_task
+from app.core.metrics import render_prometheus
+from app.core.presets import PRESETS
+from app.core.progress import TERMINAL_STATUSES, load_job_status, progress_hub, progress_publisher
+from app.models import RenderJob, RenderScene, RenderSpan
+from app.schemas import (
+    CreateRenderRequest,
+    CreateRenderResponse,
+    JobStatusResponse,
+    PresetResponse,
+    SpanResponse,
+    TenantQueueResponse,
+    UpgradeRenderRequest,
+)
 
 settings = get_settings()
 setup_logging(settings.log_level)
@@ -40,30 +56,274 @@ def _initialize_database_schema() -> None:
 def startup_init() -> None:
     _initialize_database_schema()
 
-app = FastAPI(title=settings.app_name)
-Base.metadata.create_all(bind=engine)
+
+def get_tenant_id(x_tenant_id: str | None = Header(default=None, max_length=64)) -> str:
+    return x_tenant_id or settings.default_tenant_id
+
+
+async def _check_backlog(db: AsyncSession, tenant_id: str) -> None:
+    retry_after = await db.run_sync(admission_controller.retry_after, tenant_id)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail=f'Tenant {tenant_id} has {admission_controller.quota(tenant_id)} renders waiting; retry later',
+            headers={'Retry-After': str(retry_after)},
+        )
+
+
+def _admit_and_publish(job_ids: tuple[str, ...]) -> list[str]:
+    admitted = admission_controller.admit()
+    for job_id in dict.fromkeys((*job_ids, *admitted)):
+        progress_publisher.publish(job_id)
+    return admitted
+
+
+async def _admit(*job_ids: str) -> list[str]:
+    """
+    Run an admission pass and announce the status of `job_ids` and of every job it admitted.
+
+    The pass locks rows through the sync engine and sends Celery tasks, so it runs in a worker thread.
+    """
+    return await run_in_threadpool(_admit_and_publish, job_ids)
+
+
+async def _job_status(job_id: str) -> dict[str, Any] | None:
+    """The job's status snapshot from the Redis cache, filling it from the database on a miss."""
+    snapshot = await progress_hub.cached_status(job_id)
+    if snapshot is not None:
+        return snapshot
+    async with AsyncSessionLocal() as db:
+        snapshot = await db.run_sync(load_job_status, job_id)
+    if snapshot is not None:
+        await progress_hub.cache_status(job_id, snapshot)
+    return snapshot
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def _job_gone(job_id: str) -> str:
+    """The last event of a stream whose job was deleted (or its row lost) after the stream opened."""
+    return _sse('error', {'event': 'error', 'scene_id': None, 'stage': None, 'detail': f'Job not found: {job_id}'})
 
 
 @app.post('/v1/renders', response_model=CreateRenderResponse)
-async def create_render(payload: CreateRenderRequest, db: Session = Depends(get_db)):
-    task = render_video_task.delay(payload.prompt, payload.face_reference_image)
-    job = RenderJob(celery_task_id=task.id, prompt=payload.prompt, status='queued')
+async def create_render(
+    payload: CreateRenderRequest,
+    db: AsyncSession = Depends(get_async_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    await _check_backlog(db, tenant_id)
+    await db.run_sync(admission_controller.register_tenant, tenant_id)
+    # Persist the job before enqueueing so scene subtasks can always find their parent row.
+    task_id = str(uuid.uuid4())
+    preset = payload.preset or settings.render_default_preset
+    seed = payload.seed
+    if seed is None and preset != 'final':
+        # Pin a seed so an upgraded re-render keeps the composition of the draft the user accepted.
+        seed = secrets.randbelow(2**31)
     job = RenderJob(
-        celery_task_id=task.id,
+        celery_task_id=task_id,
         prompt=payload.prompt,
-        status='queued',
+        face_reference_image=payload.face_reference_image,
+        seed=seed,
+        preset=preset,
+        tenant_id=tenant_id,
+        priority=PRIORITIES[payload.priority],
+        bypass_screenplay_cache=payload.bypass_screenplay_cache,
+        status=PENDING,
     )
     db.add(job)
-    db.commit()
-    return CreateRenderResponse(job_id=task.id, status='queued')
+    await db.commit()
+    admitted = await _admit(task_id)
+    return CreateRenderResponse(job_id=task_id, status='queued' if task_id in admitted else PENDING)
 
 
 @app.get('/v1/renders/{job_id}', response_model=JobStatusResponse)
-async def get_render(job_id: str, db: Session = Depends(get_db)):
-    job = db.query(RenderJob).filter(RenderJob.celery_task_id == job_id).first()
+async def get_render(job_id: str):
+    snapshot = await _job_status(job_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return snapshot
+
+
+@app.get('/v1/renders/{job_id}/events')
+async def stream_render_events(job_id: str, request: Request):
+    """
+    Server-sent events for a job: a `status` event with the current snapshot, then one event per change
+    (`status`, or `scene` with the scene id and stage) until the job completes or fails.
+    """
+    if await _job_status(job_id) is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+
+    async def events() -> AsyncIterator[str]:
+        # Subscribe before reading the snapshot so a change in between is not lost.
+        async with progress_hub.watch(job_id) as queue:
+            snapshot = await _job_status(job_id)
+            if snapshot is None:
+                yield _job_gone(job_id)
+                return
+            yield _sse('status', {'event': 'status', 'scene_id': None, 'stage': None, 'job': snapshot})
+            while snapshot['status'] not in TERMINAL_STATUSES:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.progress_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # Also covers events missed while Redis was unreachable.
+                    latest = await _job_status(job_id)
+                    if latest is None:
+                        yield _job_gone(job_id)
+                        return
+                    if latest != snapshot:
+                        snapshot = latest
+                        yield _sse('status', {'event': 'status', 'scene_id': None, 'stage': None, 'job': snapshot})
+                    else:
+                        yield ': keepalive\n\n'
+                    continue
+                snapshot = event.job
+                yield f'event: {event.name}\ndata: {event.data}\n\n'
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@app.get('/v1/renders/{job_id}/spans', response_model=list[SpanResponse])
+async def get_render_spans(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Every timed stage of a job in the order it finished, for finding where a render's time went."""
+    if await db.scalar(select(RenderJob.id).where(RenderJob.celery_task_id == job_id)) is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    spans = await db.scalars(
+        select(RenderSpan).where(RenderSpan.job_id == job_id).order_by(RenderSpan.created_at, RenderSpan.id)
+    )
+    return [
+        SpanResponse(
+            stage=span.stage,
+            scene_id=span.scene_id,
+            detail=span.detail,
+            status=span.status,
+            seconds=round(span.seconds, 3),
+            peak_gpu_bytes=span.peak_gpu_bytes,
+            peak_host_bytes=span.peak_host_bytes,
+            bytes_written=span.bytes_written,
+            ended_at=span.created_at,
+        )
+        for span in spans
+    ]
+
+
+@app.post('/v1/renders/{job_id}/retry', response_model=CreateRenderResponse)
+async def retry_render(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    job = await db.scalar(select(RenderJob).where(RenderJob.celery_task_id == job_id))
     if not job:
         raise HTTPException(status_code=404, detail='Job not found')
-    return JobStatusResponse(job_id=job_id, status=job.status, output_url=job.output_url)
+    if job.status != 'failed':
+        raise HTTPException(status_code=409, detail=f'Only failed jobs can be retried (status={job.status})')
+    # Back into the backlog, so the retry takes its tenant's fair share like any new job. Once admitted
+    # it re-renders only its unfinished scenes, or starts over if the screenplay never finished.
+    job.status = PENDING
+    await db.commit()
+    admitted = await _admit(job_id)
+    return CreateRenderResponse(job_id=job_id, status='queued' if job_id in admitted else PENDING)
+
+
+@app.post('/v1/renders/{job_id}/upgrade', response_model=CreateRenderResponse)
+async def upgrade_render(job_id: str, payload: UpgradeRenderRequest, db: AsyncSession = Depends(get_async_db)):
+    """Re-render the accepted scenes of a finished job at a higher preset, as a new job with its own film."""
+    parent = await db.scalar(select(RenderJob).where(RenderJob.celery_task_id == job_id))
+    if not parent:
+        raise HTTPException(status_code=404, detail='Job not found')
+    if parent.status != 'completed':
+        raise HTTPException(status_code=409, detail=f'Only completed jobs can be upgraded (status={parent.status})')
+    await _check_backlog(db, parent.tenant_id)
+    scenes = (
+        await db.scalars(
+            select(RenderScene)
+            .where(RenderScene.job_id == job_id, RenderScene.scene_id.in_(payload.scene_ids))
+            .order_by(RenderScene.scene_id)
+        )
+    ).all()
+    missing = sorted(set(payload.scene_ids) - {scene.scene_id for scene in scenes})
+    if missing:
+        raise HTTPException(status_code=422, detail=f'Unknown scene ids: {missing}')
+
+    task_id = str(uuid.uuid4())
+    db.add(
+        RenderJob(
+            celery_task_id=task_id,
+            prompt=parent.prompt,
+            face_reference_image=parent.face_reference_image,
+            seed=parent.seed,
+            preset=payload.preset,
+            parent_job_id=job_id,
+            tenant_id=parent.tenant_id,
+            priority=PRIORITIES[payload.priority],
+            status=PENDING,
+            screenplay_complete=True,
+            scenes_total=len(scenes),
+        )
+    )
+    # Scene ids are kept so every scene is re-rendered with the seed it had in the draft.
+    db.add_all(
+        RenderScene(
+            job_id=task_id,
+            scene_id=scene.scene_id,
+            visual_prompt=scene.visual_prompt,
+            dialogue=scene.dialogue,
+            shot_type=scene.shot_type,
+        )
+        for scene in scenes
+    )
+    await db.commit()
+    admitted = await _admit(task_id)
+    return CreateRenderResponse(job_id=task_id, status='queued' if task_id in admitted else PENDING)
+
+
+@app.get('/v1/presets', response_model=list[PresetResponse])
+async def list_presets(db: AsyncSession = Depends(get_async_db)):
+    rows = await db.execute(
+        select(
+            RenderJob.preset,
+            func.count(RenderJob.id),
+            func.sum(RenderJob.gpu_seconds),
+            func.sum(RenderJob.scenes_total),
+        )
+        .where(RenderJob.status == 'completed')
+        .group_by(RenderJob.preset)
+    )
+    measured = {preset: (jobs, gpu_seconds, scenes) for preset, jobs, gpu_seconds, scenes in rows}
+    response = []
+    for name, preset in PRESETS.items():
+        jobs, gpu_seconds, scenes = measured.get(name, (0, None, None))
+        response.append(
+            PresetResponse(
+                name=name,
+                keyframe_steps=preset.keyframe_steps,
+                video_steps=preset.video_steps,
+                video_width=preset.video_width,
+                video_height=preset.video_height,
+                completed_jobs=jobs,
+                gpu_seconds_per_scene=round(gpu_seconds / scenes, 2) if scenes else None,
+            )
+        )
+    return response
+
+
+@app.get('/v1/queue', response_model=list[TenantQueueResponse])
+async def get_queue(tenant_id: str | None = None, db: AsyncSession = Depends(get_async_db)):
+    """Admission backlog, running jobs and estimated wait per tenant."""
+    queues = await db.run_sync(admission_controller.queues, tenant_id)
+    return [TenantQueueResponse(**vars(queue)) for queue in queues]
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics(db: AsyncSession = Depends(get_async_db)):
+    """Prometheus scrape endpoint: stage durations, errors, bytes and peak memory, plus job counters."""
+    return PlainTextResponse(await db.run_sync(render_prometheus), media_type='text/plain; version=0.0.4')
 
 
 @app.get('/healthz')
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy import JSON, BigInteger, Boolean, DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.db import Base
@@ -14,7 +14,96 @@ class RenderJob(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     celery_task_id: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     prompt: Mapped[str] = mapped_column(Text)
+    face_reference_image: Mapped[str | None] = mapped_column(Text, nullable=True)
+    seed: Mapped[int | None] = mapped_column(Integer, nullable=True)
     status: Mapped[str] = mapped_column(String(50), default='queued', index=True)
+    tenant_id: Mapped[str] = mapped_column(String(64), default='default', index=True)
+    # 0 is the most urgent class; jobs wait in `pending` until fair-share admission queues them.
+    priority: Mapped[int] = mapped_column(Integer, default=1)
+    admitted_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    bypass_screenplay_cache: Mapped[bool] = mapped_column(Boolean, default=False)
+    preset: Mapped[str] = mapped_column(String(20), default='final')
+    # Set on jobs created by upgrading accepted scenes of an earlier (draft/preview) job.
+    parent_job_id: Mapped[str | None] = mapped_column(String(255), nullable=True, index=True)
+    work_dir: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    screenplay_complete: Mapped[bool] = mapped_column(Boolean, default=False)
+    scenes_total: Mapped[int] = mapped_column(Integer, default=0)
+    scenes_completed: Mapped[int] = mapped_column(Integer, default=0)
+    cache_hits: Mapped[int] = mapped_column(Integer, default=0)
+    cache_misses: Mapped[int] = mapped_column(Integer, default=0)
+    cache_bytes_saved: Mapped[int] = mapped_column(BigInteger, default=0)
+    gpu_seconds: Mapped[float] = mapped_column(Float, default=0.0)
+    # Artifacts taken from an identical request of another job that was in flight, and the GPU time saved.
+    coalesced_requests: Mapped[int] = mapped_column(Integer, default=0)
+    gpu_seconds_saved: Mapped[float] = mapped_column(Float, default=0.0)
+    # Per-stage span totals, written when the job finishes (see app.core.metrics.stage_summary).
+    stage_metrics: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     output_url: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TenantShare(Base):
+    """Deficit round robin credit carried between admission passes, one row per tenant."""
+
+    __tablename__ = 'tenant_shares'
+
+    tenant_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    deficit: Mapped[float] = mapped_column(Float, default=0.0)
+    rounds: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class RenderSpan(Base):
+    """One timed pipeline stage; scene-level stages carry a scene id, model swaps carry no job."""
+
+    __tablename__ = 'render_spans'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    job_id: Mapped[str | None] = mapped_column(String(255), nullable=True, index=True)
+    scene_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    stage: Mapped[str] = mapped_column(String(32), index=True)
+    detail: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    status: Mapped[str] = mapped_column(String(20), default='ok')
+    seconds: Mapped[float] = mapped_column(Float)
+    peak_gpu_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    peak_host_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    bytes_written: Mapped[int] = mapped_column(BigInteger, default=0)
+    # When the span ended.
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+class RenderStageRollup(Base):
+    """Running totals of spans per stage and duration bucket, so /metrics never scans render_spans."""
+
+    __tablename__ = 'render_stage_rollups'
+
+    stage: Mapped[str] = mapped_column(String(32), primary_key=True)
+    # Index of the smallest duration bucket the span fits in; len(buckets) for spans above the last.
+    bucket: Mapped[int] = mapped_column(Integer, primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, default=0)
+    errors: Mapped[int] = mapped_column(BigInteger, default=0)
+    seconds: Mapped[float] = mapped_column(Float, default=0.0)
+    bytes_written: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class RenderScene(Base):
+    __tablename__ = 'render_scenes'
+    __table_args__ = (UniqueConstraint('job_id', 'scene_id', name='uq_render_scene'),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    job_id: Mapped[str] = mapped_column(String(255), ForeignKey('render_jobs.celery_task_id'), index=True)
+    scene_id: Mapped[int] = mapped_column(Integer)
+    visual_prompt: Mapped[str] = mapped_column(Text)
+    dialogue: Mapped[str] = mapped_column(Text)
+    shot_type: Mapped[str] = mapped_column(String(50))
+    status: Mapped[str] = mapped_column(String(50), default='pending', index=True)
+    keyframe_path: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    clip_path: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    audio_path: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    # SHA-256 of each artifact when it was recorded; a resumed job re-renders artifacts that no longer match.
+    keyframe_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    clip_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    audio_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
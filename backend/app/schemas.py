@@ -1,13 +1,28 @@
 from __future__ import annotations
 
+from datetime import datetime
 from typing import Literal
 
 from pydantic import BaseModel, Field
 
+PresetName = Literal['draft', 'preview', 'final']
+PriorityName = Literal['high', 'normal', 'low']
+
 
 class CreateRenderRequest(BaseModel):
     prompt: str = Field(min_length=10)
     face_reference_image: str | None = None
+    seed: int | None = None
+    bypass_screenplay_cache: bool = False
+    # Defaults to RENDER_DEFAULT_PRESET.
+    preset: PresetName | None = None
+    priority: PriorityName = 'normal'
+
+
+class UpgradeRenderRequest(BaseModel):
+    scene_ids: list[int] = Field(min_length=1)
+    preset: PresetName = 'final'
+    priority: PriorityName = 'normal'
 
 
 class CreateRenderResponse(BaseModel):
@@ -15,10 +30,65 @@ class CreateRenderResponse(BaseModel):
     status: str
 
 
+class SceneStatusResponse(BaseModel):
+    scene_id: int
+    status: str
+    attempts: int = 0
+
+
 class JobStatusResponse(BaseModel):
     job_id: str
     status: str
     output_url: str | None = None
+    scenes_total: int = 0
+    scenes_completed: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    cache_bytes_saved: int = 0
+    preset: str = 'final'
+    parent_job_id: str | None = None
+    gpu_seconds: float = 0.0
+    coalesced_requests: int = 0
+    gpu_seconds_saved: float = 0.0
+    tenant_id: str = 'default'
+    priority: str = 'normal'
+    # Per-stage span totals (count, errors, seconds, peak memory, bytes written), once the job has finished.
+    stages: dict[str, dict[str, int | float | None]] | None = None
+    scenes: list[SceneStatusResponse] = Field(default_factory=list)
+
+
+class SpanResponse(BaseModel):
+    stage: str
+    scene_id: int | None = None
+    detail: str | None = None
+    status: str
+    seconds: float
+    peak_gpu_bytes: int | None = None
+    peak_host_bytes: int | None = None
+    bytes_written: int = 0
+    ended_at: datetime
+
+
+class PresetResponse(BaseModel):
+    name: str
+    keyframe_steps: int
+    video_steps: int
+    video_width: int
+    video_height: int
+    completed_jobs: int = 0
+    # Measured over completed jobs; None until a job with this preset has finished.
+    gpu_seconds_per_scene: float | None = None
+
+
+class TenantQueueResponse(BaseModel):
+    tenant_id: str
+    weight: float
+    pending: int
+    active: int
+    quota: int
+    pending_by_priority: dict[str, int] = Field(default_factory=dict)
+    # Until the tenant's whole backlog is admitted; None when admission control is disabled.
+    estimated_wait_seconds: float | None = None
 
 
 class Scene(BaseModel):
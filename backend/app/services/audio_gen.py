@@ -1,60 +1,289 @@
 from __future__ import annotations
 
 import logging
+import threading
+import time
 import wave
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
 import numpy as np
 
+from app.core.artifact_cache import artifact_cache, inflight_requests
+from app.core.config import get_settings
+
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 _SAMPLE_RATE = 22050
+_MAX_SILENCE_SECONDS = 15
+# Inference defaults of `f5_tts.infer.utils_infer`, which the batched path reproduces.
+_F5_TARGET_RMS = 0.1
+_F5_NFE_STEPS = 32
+_F5_CFG_STRENGTH = 2.0
+_F5_SWAY_SAMPLING = -1.0
+# Longest mel a single sample call may produce; longer lines go through F5's own chunked `infer`.
+_F5_MAX_FRAMES = 4096
+# The reference voice the F5-TTS CLI uses when none is given.
+_F5_DEFAULT_VOICE = ('infer/examples/basic/basic_ref_en.wav', 'Some call me nature, others call me mother nature.')
+_MAX_VOICES = 8
+
+
+@dataclass(frozen=True)
+class DialogueLine:
+    text: str
+    output_path: Path
+
+
+@dataclass(frozen=True)
+class Voice:
+    """A reference voice prepared for conditioning: its mel frames, transcript and loudness."""
+
+    cond: Any
+    text: str
+    frames: int
+    rms: float
+    reference_audio: str
+
+
+class F5Engine:
+    """
+    F5-TTS inference that encodes a reference voice once and samples several lines per forward pass.
+
+    `F5TTS.infer` reloads, resamples and re-encodes the reference audio on every call and renders one
+    line at a time. Here the reference mel is computed once per voice, and a batch of lines shares
+    one flow-matching sampling run (the expensive part) with per-line durations; each line is then
+    vocoded on its own so no padding leaks into the audio.
+    """
+
+    def __init__(self, f5: Any) -> None:
+        self._f5 = f5
+        self.sample_rate: int = f5.target_sample_rate
+        self.max_frames = _F5_MAX_FRAMES
+
+    def encode_voice(self, reference_audio: str, reference_text: str) -> Voice:
+        import torch
+        import torchaudio
+        from f5_tts.infer.utils_infer import preprocess_ref_audio_text
+
+        # Trims the reference to a usable length and transcribes it when no text is given.
+        ref_file, ref_text = preprocess_ref_audio_text(reference_audio, reference_text)
+        audio, sample_rate = torchaudio.load(ref_file)
+        if audio.shape[0] > 1:
+            audio = audio.mean(dim=0, keepdim=True)
+        rms = float(torch.sqrt(torch.mean(torch.square(audio))))
+        if rms < _F5_TARGET_RMS:
+            audio = audio * _F5_TARGET_RMS / rms
+        if sample_rate != self.sample_rate:
+            audio = torchaudio.transforms.Resample(sample_rate, self.sample_rate)(audio)
+        with torch.inference_mode():
+            cond = self._f5.ema_model.mel_spec(audio.to(self._f5.device)).permute(0, 2, 1)
+        return Voice(cond=cond, text=ref_text, frames=cond.shape[1], rms=rms, reference_audio=ref_file)
+
+    def frames_for(self, voice: Voice, text: str) -> int:
+        """Mel frames of reference plus line, paced like the reference (as `infer_process` estimates it)."""
+        return voice.frames + int(voice.frames / len(voice.text.encode()) * len(text.encode()))
+
+    def generate(self, voice: Voice, texts: list[str]) -> list[np.ndarray]:
+        """Float32 waveforms at `sample_rate` for `texts`, sampled in one batch."""
+        import torch
+        from f5_tts.model.utils import convert_char_to_pinyin
+
+        model = self._f5.ema_model
+        device = voice.cond.device
+        durations = [self.frames_for(voice, text) for text in texts]
+        with torch.inference_mode():
+            generated, _ = model.sample(
+                cond=voice.cond.repeat(len(texts), 1, 1),
+                text=convert_char_to_pinyin([voice.text + text for text in texts]),
+                duration=torch.tensor(durations, device=device, dtype=torch.long),
+                lens=torch.full((len(texts),), voice.frames, device=device, dtype=torch.long),
+                steps=_F5_NFE_STEPS,
+                cfg_strength=_F5_CFG_STRENGTH,
+                sway_sampling_coef=_F5_SWAY_SAMPLING,
+            )
+            waves = []
+            for mel, frames in zip(generated, durations):
+                mel = mel[voice.frames : frames].to(torch.float32).T.unsqueeze(0)
+                if self._f5.mel_spec_type == 'vocos':
+                    samples = self._f5.vocoder.decode(mel)
+                else:
+                    samples = self._f5.vocoder(mel)
+                if voice.rms < _F5_TARGET_RMS:
+                    samples = samples * voice.rms / _F5_TARGET_RMS
+                waves.append(samples.squeeze().cpu().numpy())
+        return waves
+
+    def generate_long(self, voice: Voice, text: str) -> np.ndarray:
+        """One line too long for a single sampling run, through F5's chunked inference."""
+        samples, _, _ = self._f5.infer(voice.reference_audio, voice.text, text, show_info=logger.debug)
+        return samples
 
 
 class DialogueAudioGenerator:
-    """F5-TTS wrapper with graceful fallback when package isn't available."""
+    """
+    F5-TTS wrapper with graceful fallback when package isn't available; the engine loads on first use.
+
+    `synthesize_many` renders every line of a job together: cached lines are materialised, the
+    reference voice is encoded once per voice (kept in a small LRU), the remaining lines are
+    sampled `TTS_BATCH_SIZE` at a time, shortest first so a batch pads little, and all tracks are
+    written in one pass. The silence fallback writes every track from one shared buffer.
+    """
 
-    def __init__(self) -> None:
-        self._f5 = None
+    def __init__(self, engine: F5Engine | None = None, batch_size: int | None = None) -> None:
+        self._engine = engine
+        self._initialized = engine is not None
+        self._batch_size = batch_size or settings.tts_batch_size
+        self._init_lock = threading.Lock()
+        # One inference at a time per process; the engine is not thread-safe.
+        self._infer_lock = threading.Lock()
+        self._voices: OrderedDict[tuple[str | None, str], Voice] = OrderedDict()
+        self._silence = np.zeros(_SAMPLE_RATE * _MAX_SILENCE_SECONDS, dtype=np.int16)
+
+    def warm(self) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            self._initialized = True
+            try:
+                from f5_tts.api import F5TTS  # type: ignore
+
+                self._engine = F5Engine(F5TTS())
+                logger.info('Initialized F5-TTS engine')
+            except ModuleNotFoundError:
+                logger.warning('F5-TTS not installed; using silence fallback wav generator')
+            except Exception:
+                logger.exception('F5-TTS initialization failed; using silence fallback wav generator')
+
+    def synthesize(self, text: str, output_path: Path) -> Path:
+        return self.synthesize_many([DialogueLine(text, output_path)])[0]
+
+    def synthesize_many(
+        self,
+        lines: list[DialogueLine],
+        reference_audio: str | None = None,
+        reference_text: str | None = None,
+    ) -> list[Path]:
+        """
+        Write one WAV per line, all in the same voice; returns the output paths in order.
+
+        The voice defaults to `TTS_REFERENCE_AUDIO` / `TTS_REFERENCE_TEXT` (F5-TTS's bundled voice
+        when unset). An empty transcript is filled in by F5-TTS's speech recognition, once per voice.
+        A line another job is already synthesizing in this process, in the same voice, is copied
+        from that job once written.
+        """
+        self.warm()
+        for line in lines:
+            line.output_path.parent.mkdir(parents=True, exist_ok=True)
+        if self._engine is None:
+            self._write_silence(lines)
+            return [line.output_path for line in lines]
+
+        reference_audio, reference_text = self._reference(reference_audio, reference_text)
+        pending: list[tuple[DialogueLine, str]] = []
+        following: list[tuple[DialogueLine, Future]] = []
+        leading: list[str] = []
         try:
-            from f5_tts.api import F5TTS  # type: ignore
-
-            self._f5 = F5TTS()
-            logger.info('Initialized F5-TTS engine')
-        except ModuleNotFoundError:
-            logger.warning('F5-TTS not installed; using silence fallback wav generator')
-        except Exception:
-            logger.exception('F5-TTS initialization failed; using silence fallback wav generator')
-
-    def _write_silence(self, text: str, output_path: Path) -> Path:
-        duration = max(2, min(15, len(text) // 12))
-        samples = np.zeros(_SAMPLE_RATE * duration, dtype=np.int16)
+            for line in lines:
+                cache_key = artifact_cache.key_for(
+                    'dialogue',
+                    'f5-tts',
+                    {'text': line.text, 'voice_text': reference_text, 'sample_rate': self._engine.sample_rate},
+                    {'voice': reference_audio},
+                )
+                flight = inflight_requests.join(cache_key, line.output_path)
+                if flight is not None:
+                    following.append((line, flight))
+                    continue
+                leading.append(cache_key)
+                if artifact_cache.fetch(cache_key, line.output_path):
+                    inflight_requests.finish(cache_key, line.output_path)
+                else:
+                    pending.append((line, cache_key))
+            if pending:
+                self._synthesize_pending(pending, reference_audio, reference_text)
+        finally:
+            # Releases the followers of any line this call led but did not write.
+            for cache_key in leading:
+                inflight_requests.finish(cache_key, None)
+        orphaned = [line for line, flight in following if not inflight_requests.wait(flight)]
+        if orphaned:
+            self.synthesize_many(orphaned, reference_audio, reference_text)
+        return [line.output_path for line in lines]
+
+    def _synthesize_pending(self, pending: list[tuple[DialogueLine, str]], reference_audio: str, reference_text: str) -> None:
+        logger.info('Generating dialogue audio for %s lines', len(pending))
+        with self._infer_lock:
+            voice = self._voice(reference_audio, reference_text)
+            started = time.perf_counter()
+            tracks = self._generate(voice, [line for line, _ in pending])
+            seconds = time.perf_counter() - started
+        for (line, cache_key), samples in zip(pending, tracks):
+            self._write_wav(line.output_path, _to_pcm16(samples), self._engine.sample_rate)
+            artifact_cache.store(cache_key, line.output_path)
+            inflight_requests.finish(cache_key, line.output_path, seconds / len(pending))
+
+    def _generate(self, voice: Voice, lines: list[DialogueLine]) -> list[np.ndarray]:
+        tracks: dict[int, np.ndarray] = {}
+        batchable: list[int] = []
+        for index, line in enumerate(lines):
+            if self._engine.frames_for(voice, line.text) > self._engine.max_frames:
+                tracks[index] = self._engine.generate_long(voice, line.text)
+            else:
+                batchable.append(index)
+        batchable.sort(key=lambda index: len(lines[index].text.encode()))
+        for start in range(0, len(batchable), self._batch_size):
+            batch = batchable[start : start + self._batch_size]
+            for index, samples in zip(batch, self._engine.generate(voice, [lines[index].text for index in batch])):
+                tracks[index] = samples
+        return [tracks[index] for index in range(len(lines))]
+
+    def _reference(self, reference_audio: str | None, reference_text: str | None) -> tuple[str, str]:
+        if not reference_audio and settings.tts_reference_audio:
+            reference_audio, reference_text = settings.tts_reference_audio, reference_text or settings.tts_reference_text
+        if not reference_audio:
+            from importlib.resources import files
+
+            reference_audio = str(files('f5_tts').joinpath(_F5_DEFAULT_VOICE[0]))
+            reference_text = reference_text or _F5_DEFAULT_VOICE[1]
+        return reference_audio, reference_text or ''
+
+    def _voice(self, reference_audio: str, reference_text: str) -> Voice:
+        key = (artifact_cache.hash_input(reference_audio), reference_text)
+        voice = self._voices.get(key)
+        if voice is not None:
+            self._voices.move_to_end(key)
+            return voice
+        voice = self._engine.encode_voice(reference_audio, reference_text)
+        logger.info('Encoded reference voice %s', reference_audio)
+        self._voices[key] = voice
+        if len(self._voices) > _MAX_VOICES:
+            self._voices.popitem(last=False)
+        return voice
+
+    def _write_silence(self, lines: list[DialogueLine]) -> None:
+        for line in lines:
+            cache_key = artifact_cache.key_for('dialogue', 'silence', {'text': line.text, 'sample_rate': _SAMPLE_RATE}, {})
+            if artifact_cache.fetch(cache_key, line.output_path):
+                continue
+            duration = max(2, min(_MAX_SILENCE_SECONDS, len(line.text) // 12))
+            self._write_wav(line.output_path, self._silence[: _SAMPLE_RATE * duration], _SAMPLE_RATE)
+            artifact_cache.store(cache_key, line.output_path)
+
+    @staticmethod
+    def _write_wav(output_path: Path, samples: np.ndarray, sample_rate: int) -> None:
         with wave.open(str(output_path), 'w') as wav_file:
             wav_file.setnchannels(1)
             wav_file.setsampwidth(2)
-            wav_file.setframerate(_SAMPLE_RATE)
-            wav_file.writeframes(samples.tobytes())
-        return output_path
-        except Exception:
-            logger.exception('F5-TTS unavailable; using silence fallback wav generator')
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(memoryview(samples).cast('B'))
 
-    def synthesize(self, text: str, output_path: Path) -> Path:
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        logger.info('Generating dialogue audio at %s', output_path)
-        if self._f5 is not None:
-            self._f5.infer(text=text, output_path=str(output_path))
-            return output_path
-
-        return self._write_silence(text=text, output_path=output_path)
-        sr = 22050
-        duration = max(2, min(15, len(text) // 12))
-        samples = np.zeros(sr * duration, dtype=np.int16)
-        with wave.open(str(output_path), 'w') as f:
-            f.setnchannels(1)
-            f.setsampwidth(2)
-            f.setframerate(sr)
-            f.writeframes(samples.tobytes())
-        return output_path
+
+def _to_pcm16(samples: np.ndarray) -> np.ndarray:
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
 
 
 audio_generator = DialogueAudioGenerator()
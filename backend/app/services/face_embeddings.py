@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import torch
+
+from app.core.artifact_cache import artifact_cache
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclass
+class _Entry:
+    embeds: list[Any]
+    encode_seconds: float
+
+
+class FaceEmbeddingCache:
+    """
+    IP-Adapter face embeddings keyed by the content hash of the reference image and the adapter id.
+
+    A bounded LRU in memory serves repeated scenes of a job; an on-disk tier of small `.pt` files
+    serves repeat customers across jobs and worker restarts. Embeddings are kept on the CPU and
+    moved to the pipeline device on use. Time saved is the recorded encode time of each hit, minus
+    the load time for disk hits.
+    """
+
+    def __init__(self, root: Path, max_entries: int, enabled: bool = True) -> None:
+        self._root = root
+        self._max_entries = max_entries
+        self._enabled = enabled
+        self._memory: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'seconds_saved': 0.0}
+
+    @staticmethod
+    def key_for(face_reference_image: str, adapter_id: str) -> str:
+        material = json.dumps([artifact_cache.hash_input(face_reference_image), adapter_id])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get_or_compute(self, key: str, encode: Callable[[], list[Any]], device: Any) -> list[Any]:
+        if not self._enabled:
+            return encode()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                self._stats['seconds_saved'] += entry.encode_seconds
+        if entry is not None:
+            return [tensor.to(device) for tensor in entry.embeds]
+
+        started = time.perf_counter()
+        entry = self._load(key)
+        if entry is not None:
+            self._record(key, entry, 'disk_hits', entry.encode_seconds - (time.perf_counter() - started))
+            logger.info('Face embedding loaded from disk key=%s', key[:12])
+            return [tensor.to(device) for tensor in entry.embeds]
+
+        started = time.perf_counter()
+        embeds = encode()
+        entry = _Entry(embeds=[tensor.detach().to('cpu') for tensor in embeds], encode_seconds=time.perf_counter() - started)
+        self._save(key, entry)
+        self._record(key, entry, 'misses', 0.0)
+        logger.info('Encoded face reference key=%s in %.2fs', key[:12], entry.encode_seconds)
+        return embeds
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'seconds_saved': round(self._stats['seconds_saved'], 3), 'entries': len(self._memory)}
+
+    def _record(self, key: str, entry: _Entry, counter: str, saved: float) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._max_entries:
+                self._memory.popitem(last=False)
+            self._stats[counter] += 1
+            self._stats['seconds_saved'] += max(0.0, saved)
+
+    def _path(self, key: str) -> Path:
+        return self._root / f'{key}.pt'
+
+    def _load(self, key: str) -> _Entry | None:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            payload = torch.load(path, map_location='cpu')
+        except Exception:
+            logger.warning('Discarding unreadable face embedding %s', path)
+            path.unlink(missing_ok=True)
+            return None
+        return _Entry(embeds=payload['embeds'], encode_seconds=payload['encode_seconds'])
+
+    def _save(self, key: str, entry: _Entry) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Private to this writer, so concurrent saves of one key never interleave in the same file.
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp')
+        try:
+            torch.save({'embeds': entry.embeds, 'encode_seconds': entry.encode_seconds}, tmp)
+            os.replace(tmp, path)
+        except Exception:
+            tmp.unlink(missing_ok=True)
+            logger.exception('Failed to persist face embedding key=%s', key[:12])
+
+
+face_embedding_cache = FaceEmbeddingCache(
+    root=Path(settings.face_embedding_cache_dir),
+    max_entries=settings.face_embedding_cache_max_entries,
+    enabled=settings.face_embedding_cache_enabled,
+)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from pathlib import Path
+
+import ffmpeg
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class FrameWriter:
+    """
+    Encode raw RGB frames to H.264 as they are produced.
+
+    Frames are written to an ffmpeg subprocess over stdin, so the host only ever holds the frame being
+    written plus the pipe buffer, and ffmpeg encodes while the caller is still decoding later frames.
+    `write` accepts any C-contiguous HxWx3 uint8 buffer (numpy array, memoryview) without copying it.
+
+    With `queue_frames`, frames are handed to a feeder thread through a queue of that many frames and
+    `write` only blocks once the queue is full, so a producer on the GPU is not held back by the
+    encoder. Queued buffers are referenced, not copied: do not modify a frame after writing it.
+    """
+
+    def __init__(self, output_path: Path, width: int, height: int, fps: int, crf: int = 18, queue_frames: int = 0) -> None:
+        self._output_path = output_path
+        self._frame_bytes = width * height * 3
+        self.frames_written = 0
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._process = (
+            ffmpeg.input('pipe:', format='rawvideo', pix_fmt='rgb24', s=f'{width}x{height}', framerate=fps)
+            .output(str(output_path), vcodec='libx264', pix_fmt='yuv420p', crf=crf)
+            .global_args('-loglevel', 'error')
+            .overwrite_output()
+            .run_async(pipe_stdin=True, pipe_stderr=True)
+        )
+        self._stderr: list[bytes] = []
+        self._drain = threading.Thread(target=lambda: self._stderr.append(self._process.stderr.read()), daemon=True)
+        self._drain.start()
+        self._queue: queue.Queue | None = None
+        self._feed_error: BaseException | None = None
+        if queue_frames:
+            self._queue = queue.Queue(maxsize=queue_frames)
+            self._feeder = threading.Thread(target=self._feed, name='frame-writer', daemon=True)
+            self._feeder.start()
+
+    def write(self, frame) -> None:
+        view = memoryview(frame).cast('B')
+        if view.nbytes != self._frame_bytes:
+            raise ValueError(f'Expected {self._frame_bytes} bytes per frame, got {view.nbytes}')
+        if self._queue is None:
+            self._process.stdin.write(view)
+        elif self._feed_error is not None:
+            raise self._feed_error
+        else:
+            self._queue.put(view)
+        self.frames_written += 1
+
+    def _feed(self) -> None:
+        while (view := self._queue.get()) is not _END:
+            # After a failed write keep draining, so a blocked `write` or `close` is released.
+            if self._feed_error is None:
+                try:
+                    self._process.stdin.write(view)
+                except BaseException as exc:
+                    self._feed_error = exc
+
+    def _stop_feeder(self) -> None:
+        if self._queue is not None:
+            self._queue.put(_END)
+            self._feeder.join()
+
+    def close(self) -> Path:
+        """Flush the last frames and wait for ffmpeg to finish the file."""
+        self._stop_feeder()
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        self._drain.join()
+        if returncode != 0:
+            self._output_path.unlink(missing_ok=True)
+            raise ffmpeg.Error('ffmpeg', None, b''.join(self._stderr))
+        if self._feed_error is not None:
+            self._output_path.unlink(missing_ok=True)
+            raise self._feed_error
+        logger.info('Encoded %s frames to %s', self.frames_written, self._output_path)
+        return self._output_path
+
+    def abort(self) -> None:
+        self._process.kill()
+        self._stop_feeder()
+        self._process.wait()
+        self._drain.join()
+        self._output_path.unlink(missing_ok=True)
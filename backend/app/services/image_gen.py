@@ -1,21 +1,43 @@
 from __future__ import annotations
 
 import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import groupby
 from pathlib import Path
+from typing import Any
 
 import torch
 from diffusers import FluxPipeline
+from diffusers.utils import load_image
 
+from app.core.artifact_cache import artifact_cache, inflight_requests
 from app.core.config import get_settings
 from app.core.memory_manager import model_manager
+from app.core.phase_scheduler import phase_scheduler
+from app.core.presets import RenderPreset, get_preset, scaled_steps
+from app.services.face_embeddings import face_embedding_cache
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+_GIB = 1024**3
+_KEYFRAME_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class KeyframeRequest:
+    scene_prompt: str
+    output_path: Path
+    seed: int | None = None
+    shot_type: str | None = None
+
 
 class KeyframeGenerator:
     def __init__(self) -> None:
         model_manager.register_model('flux', self._build_flux)
+        self._writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='keyframe-writer')
 
     @staticmethod
     def _build_flux() -> FluxPipeline:
@@ -37,24 +59,151 @@ class KeyframeGenerator:
         scene_prompt: str,
         output_path: Path,
         face_reference_image: str | None = None,
+        seed: int | None = None,
+        preset: RenderPreset | None = None,
+        shot_type: str | None = None,
     ) -> Path:
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        pipe = model_manager.load_model('flux')
-        logger.info('Generating keyframe at %s', output_path)
-
-        kwargs = {
-            'prompt': scene_prompt,
-            'num_inference_steps': 35,
-            'guidance_scale': 4.0,
-            'height': 1024,
-            'width': 1024,
-        }
-        if face_reference_image:
-            kwargs['ip_adapter_image'] = face_reference_image
-
-        image = pipe(**kwargs).images[0]
+        request = KeyframeRequest(scene_prompt=scene_prompt, output_path=output_path, seed=seed, shot_type=shot_type)
+        return self.generate_keyframes([request], face_reference_image, preset)[0]
+
+    def generate_keyframes(
+        self,
+        requests: list[KeyframeRequest],
+        face_reference_image: str | None = None,
+        preset: RenderPreset | None = None,
+    ) -> list[Path]:
+        """
+        Render several keyframes that share one face reference, K prompts per Flux forward pass.
+
+        Steps and guidance come from `preset` (default `RENDER_DEFAULT_PRESET`), with steps scaled per
+        shot type; prompts are only batched with others that use the same step count. K is
+        `KEYFRAME_BATCH_SIZE`, or when that is 0 as many images as fit in free GPU memory (capped by
+        `KEYFRAME_MAX_BATCH`). The face embedding comes from the face embedding cache, and images are
+        saved and stored in the artifact cache on a writer thread while the next batch denoises.
+        Cached keyframes are materialised without touching the GPU, and a keyframe another job is
+        already rendering in this process is taken from that job once it is written.
+        """
+        preset = preset or get_preset()
+        pending: list[tuple[KeyframeRequest, dict[str, Any], str]] = []
+        following: list[tuple[KeyframeRequest, Future]] = []
+        leading: list[str] = []
+        try:
+            for request in requests:
+                request.output_path.parent.mkdir(parents=True, exist_ok=True)
+                kwargs = {
+                    'num_inference_steps': scaled_steps(preset.keyframe_steps, request.shot_type),
+                    'guidance_scale': preset.keyframe_guidance,
+                    'height': _KEYFRAME_SIZE,
+                    'width': _KEYFRAME_SIZE,
+                }
+                cache_key = artifact_cache.key_for(
+                    'keyframe',
+                    f'{settings.flux_model_id}+{settings.ip_adapter_id}',
+                    {'prompt': request.scene_prompt, **kwargs, 'seed': request.seed},
+                    {'face_reference_image': face_reference_image},
+                )
+                flight = inflight_requests.join(cache_key, request.output_path)
+                if flight is not None:
+                    following.append((request, flight))
+                    continue
+                leading.append(cache_key)
+                if artifact_cache.fetch(cache_key, request.output_path):
+                    inflight_requests.finish(cache_key, request.output_path)
+                else:
+                    pending.append((request, kwargs, cache_key))
+            if pending:
+                self._render_pending(pending, face_reference_image)
+        finally:
+            # Releases the followers of any keyframe this call led but did not produce.
+            for cache_key in leading:
+                inflight_requests.finish(cache_key, None)
+        # Waited on only after this call's own keyframes are done, so two jobs following each other cannot deadlock.
+        orphaned = [request for request, flight in following if not inflight_requests.wait(flight)]
+        if orphaned:
+            self.generate_keyframes(orphaned, face_reference_image, preset)
+        return [request.output_path for request in requests]
+
+    def _render_pending(
+        self,
+        pending: list[tuple[KeyframeRequest, dict[str, Any], str]],
+        face_reference_image: str | None,
+    ) -> None:
+        def work(pipe: FluxPipeline) -> tuple[list[Future], float]:
+            started = time.perf_counter()
+            writes = self._render(pipe, pending, face_reference_image)
+            return writes, time.perf_counter() - started
+
+        writes, seconds = phase_scheduler.run('flux', work)
+        # Followers are credited with an even share of the phase's GPU time per keyframe.
+        for (request, _, cache_key), write in zip(pending, writes):
+            write.result()
+            inflight_requests.finish(cache_key, request.output_path, seconds / len(pending))
+
+    def _render(
+        self,
+        pipe: FluxPipeline,
+        pending: list[tuple[KeyframeRequest, dict[str, Any], str]],
+        face_reference_image: str | None,
+    ) -> list[Future]:
+        """Returns the write of each pending keyframe, in order."""
+        conditioning = self._face_conditioning(pipe, face_reference_image)
+        batch_size = self._batch_size()
+        writes: dict[int, Future] = {}
+
+        def steps(index: int) -> int:
+            return pending[index][1]['num_inference_steps']
+
+        for _, group in groupby(sorted(range(len(pending)), key=steps), key=steps):
+            group = list(group)
+            for start in range(0, len(group), batch_size):
+                batch = group[start : start + batch_size]
+                logger.info('Generating %s keyframes in one Flux pass', len(batch))
+                requests = [pending[index][0] for index in batch]
+                kwargs: dict[str, Any] = {
+                    'prompt': [request.scene_prompt for request in requests],
+                    **pending[batch[0]][1],
+                    **conditioning,
+                }
+                if all(request.seed is not None for request in requests):
+                    kwargs['generator'] = [torch.Generator(device='cpu').manual_seed(request.seed) for request in requests]
+                images = pipe(**kwargs).images
+                for index, image in zip(batch, images):
+                    request, _, cache_key = pending[index]
+                    writes[index] = self._writer.submit(self._write, image, request.output_path, cache_key)
+        return [writes[index] for index in range(len(pending))]
+
+    @staticmethod
+    def _write(image, output_path: Path, cache_key: str) -> None:
         image.save(str(output_path))
-        return output_path
+        artifact_cache.store(cache_key, output_path)
+
+    @staticmethod
+    def _face_conditioning(pipe: FluxPipeline, face_reference_image: str | None) -> dict[str, Any]:
+        """Resolve the face embedding from the cache; the pipeline repeats it for every prompt in a batch."""
+        if not face_reference_image:
+            return {}
+        device = pipe._execution_device
+        embeds = face_embedding_cache.get_or_compute(
+            face_embedding_cache.key_for(face_reference_image, settings.ip_adapter_id),
+            lambda: pipe.prepare_ip_adapter_image_embeds(
+                ip_adapter_image=load_image(face_reference_image),
+                ip_adapter_image_embeds=None,
+                device=device,
+                num_images_per_prompt=1,
+            ),
+            device,
+        )
+        return {'ip_adapter_image_embeds': embeds}
+
+    @staticmethod
+    def _batch_size() -> int:
+        if settings.keyframe_batch_size:
+            return settings.keyframe_batch_size
+        if not torch.cuda.is_available():
+            return settings.keyframe_max_batch
+        free_bytes, _ = torch.cuda.mem_get_info()
+        fits = int(free_bytes // (settings.keyframe_batch_image_gb * _GIB))
+        return max(1, min(settings.keyframe_max_batch, fits))
 
 
 keyframe_generator = KeyframeGenerator()
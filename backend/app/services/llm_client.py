@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without contacting the endpoint while the circuit breaker is open."""
+
+
+class RetryableResponseError(RuntimeError):
+    def __init__(self, status_code: int, retry_after: float | None) -> None:
+        super().__init__(f'LLM endpoint returned HTTP {status_code}')
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets one trial call through after `cooldown`."""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float) -> None:
+        self._failure_threshold = failure_threshold
+        self._cooldown_seconds = cooldown_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self._cooldown_seconds:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self) -> bool:
+        """Raise while the circuit is open; True when this call is the half-open trial and must `end_trial`."""
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self._trial_in_flight):
+                raise CircuitOpenError('LLM endpoint circuit is open')
+            if state == 'half-open':
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def end_trial(self) -> None:
+        # Also reached when the trial died of an error that says nothing about endpoint health.
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self._failure_threshold:
+                if self._opened_at is None:
+                    logger.warning('Opening LLM circuit after %s consecutive failures', self._failures)
+                self._opened_at = time.monotonic()
+
+
+@dataclass
+class _BatchItem:
+    prompt: str
+    future: Future = field(default_factory=Future)
+
+
+class LLMClient:
+    """
+    Pooled HTTP client for the external screenplay LLM endpoint.
+
+    One keep-alive session is shared by all callers in the process, with at most `max_concurrency`
+    requests in flight. 429 and 5xx responses and connection errors are retried with exponential
+    backoff and jitter (honouring Retry-After); repeated failures open a circuit breaker so workers
+    fail fast instead of queueing behind a dead endpoint. With batching enabled, concurrent `complete`
+    calls arriving within `batch_window_ms` are coalesced into one request carrying a `prompts` list.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str | None = None,
+        model_id: str = '',
+        max_concurrency: int = 8,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 120.0,
+        max_retries: int = 4,
+        backoff_seconds: float = 1.0,
+        circuit_failures: int = 5,
+        circuit_cooldown_seconds: float = 30.0,
+        batching: bool = False,
+        batch_window_ms: int = 50,
+        max_batch: int = 8,
+    ) -> None:
+        self._url = url
+        self._model_id = model_id
+        self._timeout = (connect_timeout, read_timeout)
+        self._max_retries = max_retries
+        self._backoff_seconds = backoff_seconds
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._breaker = CircuitBreaker(circuit_failures, circuit_cooldown_seconds)
+        self._batching = batching
+        self._batch_window = batch_window_ms / 1000
+        self._max_batch = max_batch
+        self._batch: list[_BatchItem] = []
+        self._batch_lock = threading.Lock()
+        self._batch_timer: threading.Timer | None = None
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        if api_key:
+            self._session.headers['Authorization'] = f'Bearer {api_key}'
+
+    @property
+    def batching(self) -> bool:
+        return self._batching
+
+    @property
+    def circuit_state(self) -> str:
+        return self._breaker.state
+
+    def complete(self, prompt: str) -> str:
+        """Return the full completion text for `prompt`."""
+        if self._batching:
+            return self._enqueue(prompt).result()
+        response = self._post({'model': self._model_id, 'prompt': prompt})
+        return response.json().get('text', '[]')
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Yield completion text chunks as they arrive.
+
+        Retries only cover establishing the response; once the first chunk has been yielded a broken
+        stream propagates to the caller, whose incremental parser keeps the scenes already received.
+        The concurrency slot is held until the body has been read or the stream is abandoned.
+        """
+        response = self._post({'model': self._model_id, 'prompt': prompt, 'stream': True}, stream=True)
+        try:
+            with response:
+                if response.headers.get('content-type', '').startswith('application/json'):
+                    # Endpoint ignored the stream flag and returned the whole completion at once.
+                    yield response.json().get('text', '[]')
+                    return
+                response.encoding = response.encoding or 'utf-8'
+                yield from response.iter_content(chunk_size=None, decode_unicode=True)
+        finally:
+            self._slots.release()
+
+    def _post(self, payload: dict[str, Any], stream: bool = False) -> requests.Response:
+        """
+        POST with retries. A streamed response is returned still holding its concurrency slot; the
+        caller must release `_slots` once the response is closed.
+        """
+        attempt = 0
+        while True:
+            trial = self._breaker.before_call()
+            self._slots.acquire()
+            try:
+                response = self._session.post(self._url, json=payload, timeout=self._timeout, stream=stream)
+                if response.status_code in _RETRYABLE_STATUS:
+                    retry_after = response.headers.get('Retry-After')
+                    response.close()
+                    raise RetryableResponseError(
+                        response.status_code,
+                        float(retry_after) if retry_after and retry_after.isdigit() else None,
+                    )
+                response.raise_for_status()
+            except (RetryableResponseError, requests.ConnectionError, requests.Timeout) as exc:
+                self._slots.release()
+                # record_failure ends the trial; don't clear a later caller's trial after the backoff.
+                self._breaker.record_failure()
+                trial = False
+                if attempt >= self._max_retries:
+                    raise
+                delay = self._backoff_seconds * 2**attempt * (0.5 + random.random())
+                if isinstance(exc, RetryableResponseError) and exc.retry_after is not None:
+                    delay = max(delay, exc.retry_after)
+                logger.warning('LLM request failed (%s); retry %s/%s in %.1fs', exc, attempt + 1, self._max_retries, delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except requests.HTTPError:
+                # Other 4xx are caller errors; they say nothing about endpoint health.
+                response.close()
+                self._slots.release()
+                self._breaker.record_success()
+                raise
+            except BaseException:
+                self._slots.release()
+                raise
+            else:
+                self._breaker.record_success()
+            finally:
+                if trial:
+                    self._breaker.end_trial()
+            if not stream:
+                self._slots.release()
+            return response
+
+    def _enqueue(self, prompt: str) -> Future:
+        item = _BatchItem(prompt=prompt)
+        with self._batch_lock:
+            self._batch.append(item)
+            if len(self._batch) >= self._max_batch:
+                batch = self._take_batch()
+            else:
+                batch = None
+                if self._batch_timer is None:
+                    self._batch_timer = threading.Timer(self._batch_window, self._flush_timer)
+                    self._batch_timer.daemon = True
+                    self._batch_timer.start()
+        if batch:
+            self._send_batch(batch)
+        return item.future
+
+    def _take_batch(self) -> list[_BatchItem]:
+        batch, self._batch = self._batch, []
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        return batch
+
+    def _flush_timer(self) -> None:
+        with self._batch_lock:
+            batch = self._take_batch()
+        if batch:
+            self._send_batch(batch)
+
+    def _send_batch(self, batch: list[_BatchItem]) -> None:
+        logger.info('Sending batched LLM request with %s prompts', len(batch))
+        try:
+            if len(batch) == 1:
+                response = self._post({'model': self._model_id, 'prompt': batch[0].prompt})
+                texts = [response.json().get('text', '[]')]
+            else:
+                response = self._post({'model': self._model_id, 'prompts': [item.prompt for item in batch]})
+                texts = response.json()['texts']
+            if len(texts) != len(batch):
+                raise ValueError(f'Batched LLM response has {len(texts)} texts for {len(batch)} prompts')
+        except Exception as exc:
+            for item in batch:
+                item.future.set_exception(exc)
+            return
+        for item, text in zip(batch, texts):
+            item.future.set_result(text)
+
+
+llm_client = (
+    LLMClient(
+        url=settings.llm_api_url,
+        api_key=settings.llm_api_key,
+        model_id=settings.llm_model_id,
+        max_concurrency=settings.llm_api_max_concurrency,
+        connect_timeout=settings.llm_api_connect_timeout_seconds,
+        read_timeout=settings.llm_api_timeout_seconds,
+        max_retries=settings.llm_api_max_retries,
+        backoff_seconds=settings.llm_api_backoff_seconds,
+        circuit_failures=settings.llm_api_circuit_failures,
+        circuit_cooldown_seconds=settings.llm_api_circuit_cooldown_seconds,
+        batching=settings.llm_api_batching,
+        batch_window_ms=settings.llm_api_batch_window_ms,
+        max_batch=settings.llm_api_max_batch,
+    )
+    if settings.llm_api_url
+    else None
+)
@@ -1,18 +1,27 @@
 from __future__ import annotations
 
-import json
 import logging
-from typing import Any
+import threading
+from collections.abc import Iterator
 
-import requests
-from transformers import AutoTokenizer, pipeline
+from transformers import AutoTokenizer, TextIteratorStreamer, pipeline
 
 from app.core.config import get_settings
 from app.schemas import Scene
+from app.services.llm_client import llm_client
+from app.services.screenplay_cache import screenplay_cache
+from app.services.screenplay_stream import iter_scenes
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Bump whenever SYSTEM_PROMPT changes so cached screenplays from the old prompt are not reused.
+SYSTEM_PROMPT_VERSION = 1
+SYSTEM_PROMPT = (
+    'Return ONLY valid JSON. Output a list of scenes with fields '
+    'scene_id, visual_prompt, dialogue, shot_type (wide|medium|close-up).'
+)
+
 
 class ScriptDirector:
     def __init__(self) -> None:
@@ -31,33 +40,66 @@ class ScriptDirector:
             )
         return self._pipe
 
-    def generate_screenplay(self, prompt: str) -> list[Scene]:
+    def warm(self) -> None:
+        if llm_client is None:
+            self._local_pipeline()
+
+    def generate_screenplay(self, prompt: str, use_cache: bool = True) -> list[Scene]:
+        scenes = list(self.stream_screenplay(prompt, use_cache=use_cache))
+        logger.info('Generated %s screenplay scenes', len(scenes))
+        return scenes
+
+    def cached_screenplay(self, prompt: str) -> list[Scene] | None:
+        key = screenplay_cache.key_for(prompt, settings.llm_model_id, SYSTEM_PROMPT_VERSION)
+        return screenplay_cache.get(key)
+
+    def stream_screenplay(self, prompt: str, use_cache: bool = True) -> Iterator[Scene]:
+        """Yield scenes as soon as the LLM finishes writing each one."""
+        if not use_cache:
+            yield from iter_scenes(self._stream_text(prompt))
+            return
+        key = screenplay_cache.key_for(prompt, settings.llm_model_id, SYSTEM_PROMPT_VERSION)
+        yield from screenplay_cache.stream_through(key, lambda: iter_scenes(self._stream_text(prompt)))
+
+    def _stream_text(self, prompt: str) -> Iterator[str]:
         logger.info('Generating screenplay for prompt length=%s', len(prompt))
-        system_prompt = (
-            'Return ONLY valid JSON. Output a list of scenes with fields '
-            'scene_id, visual_prompt, dialogue, shot_type (wide|medium|close-up).'
-        )
-        user_prompt = f'{system_prompt}\n\nUser request: {prompt}'
+        user_prompt = f'{SYSTEM_PROMPT}\n\nUser request: {prompt}'
 
-        if settings.llm_api_url:
+        if llm_client is not None:
             logger.info('Calling external LLM API endpoint for screenplay generation')
-            payload: dict[str, Any] = {'model': settings.llm_model_id, 'prompt': user_prompt}
-            headers = {'Authorization': f'Bearer {settings.llm_api_key}'} if settings.llm_api_key else {}
-            response = requests.post(settings.llm_api_url, json=payload, headers=headers, timeout=120)
-            response.raise_for_status()
-            raw_text = response.json().get('text', '[]')
+            if llm_client.batching:
+                # Batched calls trade first-scene latency for endpoint throughput.
+                yield llm_client.complete(user_prompt)
+            else:
+                yield from llm_client.stream(user_prompt)
         else:
-            local_pipe = self._local_pipeline()
-            output = local_pipe(user_prompt, max_new_tokens=1200, temperature=0.3, do_sample=False)
-            raw_text = output[0]['generated_text']
-
-        json_start = raw_text.find('[')
-        json_end = raw_text.rfind(']') + 1
-        candidate = raw_text[json_start:json_end]
-        scenes_raw = json.loads(candidate)
-        scenes = [Scene.model_validate(scene) for scene in scenes_raw]
-        logger.info('Generated %s screenplay scenes', len(scenes))
-        return scenes
+            yield from self._stream_local(user_prompt)
+
+    def _stream_local(self, user_prompt: str) -> Iterator[str]:
+        local_pipe = self._local_pipeline()
+        streamer = TextIteratorStreamer(
+            self._tokenizer,
+            skip_prompt=True,
+            skip_special_tokens=True,
+            timeout=settings.llm_local_token_timeout_seconds,
+        )
+        errors: list[BaseException] = []
+
+        def generate() -> None:
+            try:
+                local_pipe(user_prompt, max_new_tokens=1200, temperature=0.3, do_sample=False, streamer=streamer)
+            except BaseException as exc:
+                errors.append(exc)
+            finally:
+                # Without this a failed generation leaves the consumer blocked on the streamer forever.
+                streamer.end()
+
+        worker = threading.Thread(target=generate, daemon=True)
+        worker.start()
+        yield from streamer
+        worker.join()
+        if errors:
+            raise errors[0]
 
 
 director = ScriptDirector()
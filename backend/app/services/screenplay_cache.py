@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future
+
+import redis
+
+from app.core.config import get_settings
+from app.schemas import Scene
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_KEY_PREFIX = 'opencine:screenplay'
+_INDEX_KEY = f'{_KEY_PREFIX}:index'
+
+
+def normalize_prompt(prompt: str) -> str:
+    return ' '.join(prompt.split()).casefold()
+
+
+class ScreenplayCache:
+    """
+    Redis-backed screenplay cache with in-flight request deduplication.
+
+    Entries are keyed on the normalised prompt, the LLM model id and the system prompt version, and
+    expire after `ttl_seconds`; an index sorted by insertion time trims the cache to `max_entries`.
+    Concurrent requests for the same key share one LLM call: threads in this process wait on a shared
+    future, other processes wait on a short-lived Redis lock and then read the stored result. If Redis
+    is unreachable the cache is skipped and every request calls the LLM.
+    """
+
+    def __init__(self, url: str, ttl_seconds: int, max_entries: int, enabled: bool = True, lock_timeout: int = 300) -> None:
+        self._redis = redis.Redis.from_url(url, socket_timeout=5)
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._enabled = enabled
+        self._lock_timeout = lock_timeout
+        self._inflight: dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    @staticmethod
+    def key_for(prompt: str, model_id: str, system_prompt_version: int) -> str:
+        material = json.dumps([normalize_prompt(prompt), model_id, system_prompt_version])
+        return f'{_KEY_PREFIX}:{hashlib.sha256(material.encode()).hexdigest()}'
+
+    def get(self, key: str) -> list[Scene] | None:
+        return self._get(key) if self._enabled else None
+
+    def get_or_create(self, key: str, factory: Callable[[], list[Scene]]) -> list[Scene]:
+        return list(self.stream_through(key, lambda: iter(factory())))
+
+    def stream_through(self, key: str, source: Callable[[], Iterator[Scene]]) -> Iterator[Scene]:
+        """
+        Yield the screenplay for `key`, streaming from `source` only when no cached or in-flight copy exists.
+
+        The owner of an in-flight request yields scenes as they arrive; callers that join it receive the
+        complete list once the owner finishes. Only fully consumed, non-empty screenplays are stored,
+        and a source that reports `complete` (a `SceneStream`) only when the LLM output parsed cleanly:
+        a truncated or partly malformed response is used once but not served for the whole TTL.
+        """
+        if not self._enabled:
+            yield from source()
+            return
+
+        cached = self._get(key)
+        if cached is not None:
+            logger.info('Screenplay cache hit key=%s', key[-12:])
+            yield from cached
+            return
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            logger.info('Joining in-flight screenplay request key=%s', key[-12:])
+            yield from future.result()
+            return
+
+        try:
+            cached, acquired = self._claim(key)
+            if cached is not None:
+                scenes = cached
+                yield from cached
+            else:
+                scenes = []
+                try:
+                    stream = source()
+                    for scene in stream:
+                        scenes.append(scene)
+                        yield scene
+                    if scenes and getattr(stream, 'complete', True):
+                        self._put(key, scenes)
+                    elif scenes:
+                        logger.warning('Not caching incomplete screenplay key=%s', key[-12:])
+                finally:
+                    if acquired:
+                        self._release(key)
+            future.set_result(scenes)
+        except GeneratorExit:
+            future.set_exception(RuntimeError('In-flight screenplay request was abandoned'))
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _claim(self, key: str) -> tuple[list[Scene] | None, bool]:
+        """Take the cross-worker lock for `key`, or wait for its holder and return what it produced."""
+        lock_key = f'{key}:lock'
+        try:
+            if self._redis.set(lock_key, '1', nx=True, ex=self._lock_timeout):
+                return None, True
+            deadline = time.monotonic() + self._lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.5)
+                cached = self._get(key)
+                if cached is not None:
+                    logger.info('Screenplay produced by another worker key=%s', key[-12:])
+                    return cached, False
+                if not self._redis.exists(lock_key):
+                    break
+        except redis.RedisError:
+            logger.warning('Screenplay cache unavailable; calling LLM directly')
+            return None, False
+        logger.info('In-flight screenplay owner gone; generating key=%s', key[-12:])
+        return None, False
+
+    def _release(self, key: str) -> None:
+        try:
+            self._redis.delete(f'{key}:lock')
+        except redis.RedisError:
+            logger.warning('Failed to release screenplay lock for key=%s', key[-12:])
+
+    def _get(self, key: str) -> list[Scene] | None:
+        try:
+            raw = self._redis.get(key)
+        except redis.RedisError:
+            logger.warning('Screenplay cache read failed for key=%s', key[-12:])
+            return None
+        if raw is None:
+            return None
+        return [Scene.model_validate(scene) for scene in json.loads(raw)]
+
+    def _put(self, key: str, scenes: list[Scene]) -> None:
+        payload = json.dumps([scene.model_dump() for scene in scenes])
+        try:
+            pipe = self._redis.pipeline()
+            pipe.set(key, payload, ex=self._ttl_seconds)
+            pipe.zadd(_INDEX_KEY, {key: time.time()})
+            pipe.zremrangebyscore(_INDEX_KEY, 0, time.time() - self._ttl_seconds)
+            pipe.execute()
+            overflow = self._redis.zcard(_INDEX_KEY) - self._max_entries
+            if overflow > 0:
+                stale = self._redis.zrange(_INDEX_KEY, 0, overflow - 1)
+                self._redis.delete(*stale)
+                self._redis.zrem(_INDEX_KEY, *stale)
+        except redis.RedisError:
+            logger.warning('Screenplay cache write failed for key=%s', key[-12:])
+
+
+screenplay_cache = ScreenplayCache(
+    url=settings.redis_url,
+    ttl_seconds=settings.screenplay_cache_ttl_seconds,
+    max_entries=settings.screenplay_cache_max_entries,
+    enabled=settings.screenplay_cache_enabled,
+)
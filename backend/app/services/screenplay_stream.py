@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+import logging
+from collections.abc import Iterable, Iterator
+
+from pydantic import ValidationError
+
+from app.schemas import Scene
+
+logger = logging.getLogger(__name__)
+
+
+class SceneStreamParser:
+    """
+    Incremental parser for a JSON array of scene objects arriving in arbitrary text chunks.
+
+    Text before the first '[' is skipped and everything after the closing ']' is ignored. Each
+    top-level object is decoded as soon as its closing brace arrives; objects that are not valid JSON
+    or fail `Scene` validation are logged and skipped so one bad scene does not sink the screenplay.
+    """
+
+    def __init__(self) -> None:
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._buffer: list[str] = []
+        self.skipped = 0
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> list[Scene]:
+        scenes: list[Scene] = []
+        for char in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                self._started = char == '['
+                continue
+
+            if self._depth == 0:
+                if char == '{':
+                    self._depth = 1
+                    self._buffer = [char]
+                elif char == ']':
+                    self._finished = True
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    scene = self._decode(''.join(self._buffer))
+                    if scene is not None:
+                        scenes.append(scene)
+        return scenes
+
+    def _decode(self, raw: str) -> Scene | None:
+        try:
+            return Scene.model_validate(json.loads(raw))
+        except (json.JSONDecodeError, ValidationError):
+            self.skipped += 1
+            logger.warning('Skipping malformed screenplay scene: %.200s', raw)
+            return None
+
+
+class SceneStream:
+    """
+    Iterator over the scenes of streamed LLM text, yielding each as soon as its object closes.
+
+    Once exhausted, `complete` tells whether the array was closed and no object had to be skipped;
+    only a complete screenplay is worth caching.
+    """
+
+    def __init__(self, chunks: Iterable[str]) -> None:
+        self._parser = SceneStreamParser()
+        self._scenes = self._parse(chunks)
+
+    def __iter__(self) -> SceneStream:
+        return self
+
+    def __next__(self) -> Scene:
+        return next(self._scenes)
+
+    @property
+    def complete(self) -> bool:
+        return self._parser.finished and self._parser.skipped == 0
+
+    def _parse(self, chunks: Iterable[str]) -> Iterator[Scene]:
+        for chunk in chunks:
+            yield from self._parser.feed(chunk)
+            if self._parser.finished:
+                break
+        if not self._parser.finished:
+            logger.warning('Screenplay stream ended before the closing bracket; keeping parsed scenes')
+
+
+def iter_scenes(chunks: Iterable[str]) -> SceneStream:
+    """Yield scenes from streamed LLM text as soon as each object closes."""
+    return SceneStream(chunks)
@@ -1,54 +1,137 @@
 from __future__ import annotations
 
 import logging
+import threading
+from collections.abc import Callable
 from pathlib import Path
 
 import ffmpeg
 
+from app.services.timeline import Timeline, build_timeline
+
 logger = logging.getLogger(__name__)
 
+_AUDIO_FORMAT = {'sample_fmts': 'fltp', 'sample_rates': 48000, 'channel_layouts': 'stereo'}
+# Fragmented MP4 is written strictly front to back, so bytes can leave the machine as soon as they exist.
+_FRAGMENTED_MP4 = 'frag_keyframe+empty_moov+default_base_moof'
+_PIPE_CHUNK = 1024 * 1024
+
 
 class Stitcher:
-    def concat_with_crossfade(self, video_paths: list[Path], output_path: Path, transition: float = 0.5) -> Path:
+    def render_film(
+        self,
+        video_paths: list[Path],
+        audio_paths: list[Path],
+        output_path: Path,
+        transition: float = 0.5,
+        sink: Callable[[bytes], None] | None = None,
+    ) -> Path:
+        """
+        Produce the final film in a single ffmpeg invocation.
+
+        Crossfades, dialogue placement and muxing share one filter graph, so every frame is decoded and
+        encoded once and nothing intermediate is written to disk. With hard cuts (`transition <= 0`)
+        the clips are joined with the concat demuxer and the video stream is copied untouched.
+        Crossfade offsets and dialogue start times come from the probed clip and audio durations.
+
+        With a `sink`, the film is muxed as fragmented MP4 and every chunk is passed to it while ffmpeg
+        is still encoding (e.g. a multipart upload); `output_path` still receives a full local copy.
+        """
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        logger.info('Stitching %s clips with crossfade=%s', len(video_paths), transition)
-        if len(video_paths) == 1:
-            (
-                ffmpeg.input(str(video_paths[0]))
-                .output(str(output_path), c='copy')
-                .overwrite_output()
-                .run(quiet=True)
+        if transition <= 0 or len(video_paths) == 1:
+            timeline = build_timeline(video_paths, audio_paths, transition=0)
+            return self._concat_copy(timeline, output_path, sink)
+
+        timeline = build_timeline(video_paths, audio_paths, transition)
+        logger.info(
+            'Rendering %.1fs film from %s clips with crossfade=%s in one pass',
+            timeline.duration,
+            len(video_paths),
+            timeline.transition,
+        )
+        stream = ffmpeg.input(str(video_paths[0])).video
+        for slot in timeline.slots[1:]:
+            nxt = ffmpeg.input(str(slot.video_path)).video
+            stream = ffmpeg.filter(
+                [stream, nxt],
+                'xfade',
+                transition='fade',
+                duration=timeline.transition,
+                offset=round(slot.start, 3),
             )
-            return output_path
 
-        stream = ffmpeg.input(str(video_paths[0]))
-        for idx, path in enumerate(video_paths[1:], start=1):
-            nxt = ffmpeg.input(str(path))
-            stream = ffmpeg.filter([stream, nxt], 'xfade', transition='fade', duration=transition, offset=idx * 4)
+        streams = [stream]
+        audio_options = {}
+        if audio_paths:
+            streams.append(self._dialogue_track(timeline))
+            audio_options = {'acodec': 'aac'}
+        self._run(streams, output_path, sink, vcodec='libx264', pix_fmt='yuv420p', **audio_options)
+        return output_path
 
-        ffmpeg.output(stream, str(output_path), vcodec='libx264', pix_fmt='yuv420p').overwrite_output().run(quiet=True)
+    def _concat_copy(self, timeline: Timeline, output_path: Path, sink: Callable[[bytes], None] | None) -> Path:
+        logger.info('Joining %s clips with hard cuts via stream copy', len(timeline.slots))
+        list_path = output_path.with_suffix('.concat.txt')
+        list_path.write_text(''.join(f"file '{slot.video_path.resolve()}'\n" for slot in timeline.slots))
+        try:
+            streams = [ffmpeg.input(str(list_path), format='concat', safe=0).video]
+            audio_options = {}
+            if timeline.slots[0].audio_path is not None:
+                streams.append(self._dialogue_track(timeline))
+                audio_options = {'acodec': 'aac'}
+            self._run(streams, output_path, sink, vcodec='copy', **audio_options)
+        finally:
+            list_path.unlink(missing_ok=True)
         return output_path
 
-    def mix_audio(self, video_path: Path, audio_paths: list[Path], output_path: Path) -> Path:
-        logger.info('Mixing %s audio tracks into %s', len(audio_paths), video_path)
-        if not audio_paths:
-            return video_path
-
-        audio_streams = [ffmpeg.input(str(a)).audio for a in audio_paths]
-        mixed = ffmpeg.filter(audio_streams, 'amix', inputs=len(audio_paths), dropout_transition=0)
-        (
-            ffmpeg.output(
-                ffmpeg.input(str(video_path)).video,
-                mixed,
-                str(output_path),
-                vcodec='copy',
-                acodec='aac',
-                shortest=None,
-            )
-            .overwrite_output()
-            .run(quiet=True)
+    @staticmethod
+    def _run(streams: list, output_path: Path, sink: Callable[[bytes], None] | None, **options) -> None:
+        if sink is None:
+            ffmpeg.output(*streams, str(output_path), **options).overwrite_output().run(quiet=True)
+            return
+
+        process = ffmpeg.output(*streams, 'pipe:', format='mp4', movflags=_FRAGMENTED_MP4, **options).run_async(
+            pipe_stdout=True, pipe_stderr=True
         )
-        return output_path
+        stderr: list[bytes] = []
+        drain = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+        drain.start()
+        try:
+            with output_path.open('wb') as handle:
+                while chunk := process.stdout.read(_PIPE_CHUNK):
+                    handle.write(chunk)
+                    sink(chunk)
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            returncode = process.wait()
+            drain.join()
+        if returncode != 0:
+            raise ffmpeg.Error('ffmpeg', None, b''.join(stderr))
+
+    @staticmethod
+    def _dialogue_track(timeline: Timeline):
+        """
+        One audio stream the length of the film with each line starting at its scene's offset.
+
+        Every track is padded with silence (or cut) to exactly the film time its scene owns and the
+        pieces are concatenated, so ffmpeg processes film-length audio once instead of mixing N
+        film-length streams.
+        """
+        pieces = []
+        for idx, slot in enumerate(timeline.slots):
+            length = round(timeline.slot_length(idx), 3)
+            piece = (
+                ffmpeg.input(str(slot.audio_path))
+                .audio.filter('aformat', **_AUDIO_FORMAT)
+                .filter('apad', whole_dur=length)
+                .filter('atrim', end=length)
+                .filter('asetpts', 'PTS-STARTPTS')
+            )
+            pieces.append(piece)
+        if len(pieces) == 1:
+            return pieces[0]
+        return ffmpeg.concat(*pieces, v=0, a=1)
 
 
 stitcher = Stitcher()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+import ffmpeg
+
+logger = logging.getLogger(__name__)
+
+
+def probe_duration(path: Path) -> float:
+    return float(ffmpeg.probe(str(path))['format']['duration'])
+
+
+@dataclass(frozen=True)
+class TimelineSlot:
+    video_path: Path
+    audio_path: Path | None
+    start: float
+    video_duration: float
+    audio_duration: float | None
+
+
+@dataclass(frozen=True)
+class Timeline:
+    """
+    Film layout derived from measured clip and dialogue durations.
+
+    Consecutive clips overlap by `transition` seconds, so clip k starts at the sum of the previous
+    clip durations minus k transitions; that start is also the xfade offset used when clip k is
+    joined onto the clips before it. Each dialogue track is placed at its scene's start.
+    """
+
+    slots: list[TimelineSlot]
+    transition: float
+
+    @property
+    def duration(self) -> float:
+        last = self.slots[-1]
+        return last.start + last.video_duration
+
+    def slot_length(self, idx: int) -> float:
+        """Film time owned by slot `idx`: until the next clip starts, or the film ends."""
+        if idx + 1 < len(self.slots):
+            return self.slots[idx + 1].start - self.slots[idx].start
+        return self.duration - self.slots[idx].start
+
+
+def build_timeline(video_paths: list[Path], audio_paths: list[Path], transition: float) -> Timeline:
+    if audio_paths and len(audio_paths) != len(video_paths):
+        raise ValueError(f'Expected one dialogue track per clip, got {len(audio_paths)} for {len(video_paths)}')
+
+    video_durations = [probe_duration(path) for path in video_paths]
+    audio_durations = [probe_duration(path) for path in audio_paths] or [None] * len(video_paths)
+    if len(video_paths) > 1 and transition >= min(video_durations):
+        clamped = min(video_durations) / 2
+        logger.warning('Transition %.2fs exceeds shortest clip; clamping to %.2fs', transition, clamped)
+        transition = clamped
+
+    slots: list[TimelineSlot] = []
+    start = 0.0
+    for idx, (video_path, video_duration) in enumerate(zip(video_paths, video_durations)):
+        slots.append(
+            TimelineSlot(
+                video_path=video_path,
+                audio_path=audio_paths[idx] if audio_paths else None,
+                start=start,
+                video_duration=video_duration,
+                audio_duration=audio_durations[idx],
+            )
+        )
+        start += video_duration - transition
+
+    timeline = Timeline(slots=slots, transition=transition)
+    for idx, slot in enumerate(slots):
+        if slot.audio_duration and slot.audio_duration > timeline.slot_length(idx):
+            logger.warning(
+                'Dialogue for clip %s runs %.2fs but its slot is %.2fs; the line will be cut',
+                idx,
+                slot.audio_duration,
+                timeline.slot_length(idx),
+            )
+    return timeline
@@ -1,17 +1,39 @@
 from __future__ import annotations
 
 import logging
+import math
+import time
+from collections.abc import Iterator
 from pathlib import Path
+from typing import Any
 
+import numpy as np
 import torch
 from diffusers import HunyuanVideoPipeline, HunyuanVideoTransformer3DModel
+from diffusers.utils import load_image
+from PIL import Image
 
+from app.core.artifact_cache import artifact_cache, inflight_requests
 from app.core.config import get_settings
 from app.core.memory_manager import model_manager
+from app.core.phase_scheduler import phase_scheduler
+from app.core.presets import RenderPreset, get_preset, scaled_steps
+from app.services.frame_export import FrameWriter
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+_WINDOW_FRAMES = 129
+_FPS = 24
+
+
+def clip_frames(duration_seconds: float | None, fps: int = _FPS) -> int:
+    """Frames a clip needs to hold `duration_seconds` of dialogue plus the crossfade into the next scene."""
+    if duration_seconds is None:
+        return _WINDOW_FRAMES
+    wanted = math.ceil((duration_seconds + settings.stitch_transition_seconds) * fps)
+    return max(_WINDOW_FRAMES, min(wanted, int(settings.video_max_seconds * fps)))
+
 
 class SceneVideoGenerator:
     def __init__(self) -> None:
@@ -34,24 +56,159 @@ class SceneVideoGenerator:
         pipe.enable_model_cpu_offload()
         return pipe
 
-    def generate_video(self, prompt: str, image_path: Path, output_path: Path) -> Path:
+    def generate_video(
+        self,
+        prompt: str,
+        image_path: Path,
+        output_path: Path,
+        seed: int | None = None,
+        duration_seconds: float | None = None,
+        preset: RenderPreset | None = None,
+        shot_type: str | None = None,
+    ) -> Path:
+        """
+        Render a clip from a keyframe; `duration_seconds` (the scene's dialogue) lengthens it past one window.
+
+        Clips longer than one 129-frame window are rendered as a chain of windows, each conditioned on
+        the frame where its overlap with the previous window begins; the `VIDEO_WINDOW_OVERLAP_FRAMES`
+        overlapping frames are crossfaded. Only the overlap and at most `VIDEO_WRITE_QUEUE_FRAMES` frames
+        waiting for the encoder are held on the host, so memory does not grow with the clip length. Resolution, steps and guidance come from `preset`
+        (default `RENDER_DEFAULT_PRESET`), with steps scaled per shot type. An identical clip already
+        being rendered for another job in this process is waited for and copied instead.
+        """
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        pipe = model_manager.load_model('hunyuan')
-        logger.info('Generating video for keyframe=%s', image_path)
-
-        image = pipe.image_processor.load_image(str(image_path))
-        result = pipe(
-            prompt=prompt,
-            image=image,
-            num_frames=129,
-            height=720,
-            width=1280,
-            num_inference_steps=40,
-            guidance_scale=6.0,
-        )
-        frames = result.frames[0]
-        pipe.export_to_video(frames, str(output_path), fps=24)
+
+        preset = preset or get_preset()
+        kwargs: dict[str, Any] = {
+            'prompt': prompt,
+            'num_frames': _WINDOW_FRAMES,
+            'height': preset.video_height,
+            'width': preset.video_width,
+            'num_inference_steps': scaled_steps(preset.video_steps, shot_type),
+            'guidance_scale': preset.video_guidance,
+        }
+        fps = _FPS
+        total_frames = clip_frames(duration_seconds, fps)
+        params = {**kwargs, 'fps': fps, 'seed': seed}
+        if total_frames > _WINDOW_FRAMES:
+            params.update(total_frames=total_frames, overlap_frames=settings.video_window_overlap_frames)
+        cache_key = artifact_cache.key_for('clip', settings.hunyuan_model_id, params, {'image': image_path})
+        flight = inflight_requests.join(cache_key, output_path)
+        if flight is not None:
+            if inflight_requests.wait(flight):
+                return output_path
+            return self.generate_video(
+                prompt, image_path, output_path, seed=seed, duration_seconds=duration_seconds, preset=preset, shot_type=shot_type
+            )
+
+        try:
+            gpu_seconds = 0.0
+            if not artifact_cache.fetch(cache_key, output_path):
+                gpu_seconds = self._render_clip(image_path, output_path, kwargs, seed, total_frames, fps)
+                artifact_cache.store(cache_key, output_path)
+        except BaseException:
+            inflight_requests.finish(cache_key, None)
+            raise
+        inflight_requests.finish(cache_key, output_path, gpu_seconds)
         return output_path
 
+    def _render_clip(
+        self,
+        image_path: Path,
+        output_path: Path,
+        kwargs: dict[str, Any],
+        seed: int | None,
+        total_frames: int,
+        fps: int,
+    ) -> float:
+        """Render and encode the clip; returns the GPU phase's seconds."""
+        logger.info('Generating %s-frame video for keyframe=%s', total_frames, image_path)
+        # Decoded here rather than inside the GPU phase, which only runs the pipeline.
+        image = load_image(str(image_path))
+
+        def _render(pipe) -> tuple[FrameWriter, float]:
+            started = time.perf_counter()
+            writer = FrameWriter(
+                output_path,
+                width=kwargs['width'],
+                height=kwargs['height'],
+                fps=fps,
+                queue_frames=settings.video_write_queue_frames,
+            )
+            try:
+                self._render_windows(pipe, image, kwargs, seed, total_frames, writer)
+            except BaseException:
+                writer.abort()
+                raise
+            return writer, time.perf_counter() - started
+
+        # Frames are queued for ffmpeg during the GPU phase, which moves on to the next window or clip
+        # while the encoder catches up; the queue and the encoder's tail are drained after the phase.
+        writer, seconds = phase_scheduler.run('hunyuan', _render)
+        writer.close()
+        return seconds
+
+    def _render_windows(
+        self,
+        pipe: HunyuanVideoPipeline,
+        image: Image.Image,
+        kwargs: dict[str, Any],
+        seed: int | None,
+        total_frames: int,
+        writer: FrameWriter,
+    ) -> None:
+        overlap = settings.video_window_overlap_frames
+        stride = _WINDOW_FRAMES - overlap
+        tail: list[np.ndarray] = []
+        window = 0
+        while True:
+            start = window * stride
+            more = total_frames > start + _WINDOW_FRAMES
+            if seed is not None:
+                kwargs['generator'] = torch.Generator(device='cpu').manual_seed(seed + window)
+            latents = pipe(image=image, output_type='latent', **kwargs).frames
+
+            held: list[np.ndarray] = []
+            for idx, frame in enumerate(self._decoded_frames(pipe, latents)):
+                if start + idx >= total_frames:
+                    break
+                if idx < len(tail):
+                    alpha = (idx + 1) / (len(tail) + 1)
+                    writer.write((tail[idx] * (1 - alpha) + frame * alpha).astype(np.uint8))
+                elif more and idx >= stride:
+                    held.append(frame)
+                else:
+                    writer.write(frame)
+            if not more:
+                return
+            logger.info('Rendered window %s; %s of %s frames written', window + 1, writer.frames_written, total_frames)
+            tail = held
+            image = Image.fromarray(tail[0])
+            window += 1
+
+    @staticmethod
+    def _decoded_frames(pipe: HunyuanVideoPipeline, latents: torch.Tensor) -> Iterator:
+        """
+        Yield uint8 HxWx3 frames, VAE-decoding the latent video a window of latent frames at a time.
+
+        Each window is decoded together with up to `VIDEO_DECODE_CONTEXT_FRAMES` preceding latent frames
+        so the causal VAE sees the history it expects; frames produced from that context are dropped.
+        Frames are converted on the GPU and copied to the host one at a time.
+        """
+        latents = latents.to(pipe.vae.dtype) / pipe.vae.config.scaling_factor
+        total = latents.shape[2]
+        window = settings.video_decode_window_frames or total
+        ratio = pipe.vae_scale_factor_temporal
+        for start in range(0, total, window):
+            end = min(start + window, total)
+            first = max(0, start - settings.video_decode_context_frames)
+            with torch.no_grad():
+                video = pipe.vae.decode(latents[:, :, first:end], return_dict=False)[0]
+            # The first latent frame of a clip decodes to one frame, every later one to `ratio` frames.
+            keep = ratio * (end - start) if start else ratio * (end - 1) + 1
+            frames = ((video[0, :, -keep:] / 2 + 0.5).clamp(0, 1) * 255).to(torch.uint8)
+            for frame in frames.permute(1, 2, 3, 0).contiguous():
+                yield frame.cpu().numpy()
+
 
 scene_video_generator = SceneVideoGenerator()
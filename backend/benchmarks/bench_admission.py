@@ -0,0 +1,144 @@
+"""
+Per-tenant latency with one tenant flooding the render queue, plain FIFO vs fair-share admission.
+
+Runs the real API routes, admission controller and Celery app against SQLite and an in-memory broker
+with `--slots` in-process workers. The render task is replaced by one that sleeps
+`--job-ms` and then finishes the job the way the worker does. A bulk tenant submits `--bulk` jobs at
+once, then `--tenants` small tenants submit `--small` jobs each. Reported per tenant: mean and max
+seconds from submission to completion, and how many submissions were answered with 429.
+
+    python -m benchmarks.bench_admission --bulk 60 --tenants 3 --small 2 --job-ms 100 --slots 4
+"""
+
+from __future__ import annotations
+
+import os
+
+os.environ.setdefault('CELERY_BROKER_URL', 'memory://')
+os.environ.setdefault('CELERY_RESULT_BACKEND', 'cache+memory://')
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+
+def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    from celery.contrib.testing.worker import start_worker
+    from fastapi.testclient import TestClient
+    from sqlalchemy import update
+
+    from app.core.admission import admission_controller
+    from app.core.celery_app import celery
+    from app.core.db import Base, SessionLocal, engine
+    from app.main import app
+    from app.models import RenderJob
+
+    Base.metadata.create_all(bind=engine)
+    # The memory transport polls its queues; the default 1s interval would dominate short fake jobs.
+    celery.conf.broker_transport_options = {'polling_interval': 0.01}
+    finished: dict[str, float] = {}
+    done = threading.Event()
+
+    @celery.task(name='render_video_task', bind=True)
+    def fake_render_video_task(self, prompt, face_reference_image=None, bypass_screenplay_cache=False):
+        time.sleep(args.job_ms / 1000)
+        db = SessionLocal()
+        try:
+            db.execute(update(RenderJob).where(RenderJob.celery_task_id == self.request.id).values(status='completed'))
+            db.commit()
+        finally:
+            db.close()
+        finished[self.request.id] = time.perf_counter()
+        admission_controller.admit()
+        if len(finished) == len(submitted):
+            done.set()
+
+    client = TestClient(app)
+    submitted: dict[str, tuple[str, float]] = {}
+    rejected: dict[str, int] = {}
+
+    def submit(tenant: str) -> None:
+        response = client.post(
+            '/v1/renders',
+            json={'prompt': f'a short film for {tenant}', 'preset': 'final'},
+            headers={'X-Tenant-Id': tenant},
+        )
+        if response.status_code == 429:
+            rejected[tenant] = rejected.get(tenant, 0) + 1
+            return
+        response.raise_for_status()
+        submitted[response.json()['job_id']] = (tenant, time.perf_counter())
+
+    with ExitStack() as workers:
+        # One solo-pool worker per slot: a thread pool's finished tasks only wake the memory transport's
+        # consumer on its next drain timeout, which would add seconds per job.
+        for _ in range(args.slots):
+            workers.enter_context(start_worker(celery, pool='solo', perform_ping_check=False, queues=['render']))
+        for _ in range(args.bulk):
+            submit('bulk')
+        for index in range(args.tenants):
+            for _ in range(args.small):
+                submit(f'small-{index}')
+        queue = client.get('/v1/queue').json()
+        if not done.wait(timeout=args.bulk * args.job_ms / 1000 * 4 + 30):
+            raise TimeoutError(f'{len(finished)} of {len(submitted)} jobs finished')
+
+    latencies: dict[str, list[float]] = {}
+    for job_id, (tenant, started) in submitted.items():
+        latencies.setdefault('bulk' if tenant == 'bulk' else 'small', []).append(finished[job_id] - started)
+    return {
+        'latency_seconds': {
+            group: {'mean': round(sum(values) / len(values), 2), 'max': round(max(values), 2)}
+            for group, values in latencies.items()
+        },
+        'rejected_429': rejected,
+        'queue_after_submit': {entry['tenant_id']: entry['pending'] for entry in queue if entry['pending']},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bulk', type=int, default=60)
+    parser.add_argument('--tenants', type=int, default=3)
+    parser.add_argument('--small', type=int, default=2)
+    parser.add_argument('--job-ms', type=float, default=100.0)
+    parser.add_argument('--slots', type=int, default=4)
+    parser.add_argument('--quota', type=int, default=40, help='TENANT_BACKLOG_QUOTA for the fair-share run')
+    parser.add_argument('--mode', choices=['fifo', 'fair'])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args)))
+        return
+
+    results = {}
+    for mode, max_active in (('fifo', 0), ('fair', args.slots)):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                'DATABASE_URL': f'sqlite:///{Path(tmp) / "bench.db"}',
+                'ADMISSION_MAX_ACTIVE_JOBS': str(max_active),
+                'ADMISSION_DEFAULT_JOB_SECONDS': str(args.job_ms / 1000),
+                'TENANT_BACKLOG_QUOTA': str(args.quota),
+                'LOG_LEVEL': 'WARNING',
+            }
+            child = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_admission', '--mode', mode, *sys.argv[1:]],
+                capture_output=True,
+                text=True,
+                env=env,
+            )
+            if child.returncode:
+                raise RuntimeError(child.stderr)
+            results[mode] = json.loads(child.stdout.strip().splitlines()[-1])
+    print(json.dumps({'bulk_jobs': args.bulk, 'small_tenants': args.tenants, 'slots': args.slots, **results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
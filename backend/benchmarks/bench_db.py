@@ -0,0 +1,440 @@
+"""
+Database round trips of worker status writes, and API latency with sync vs async sessions.
+
+Worker side: replays the status writes of one job with `--scenes` scenes (status changes, batched
+keyframes, per-scene audio and clips, clip-phase claims) through the previous helpers, which read each
+row before writing it and committed every counter separately, and through `JobStatusWriter`.
+Each replay also reads the progress snapshot wherever the worker publishes one: two SELECTs per
+publish before, one joined SELECT now. Reported per job: SQL statements (snapshot reads included),
+commits, publishes and wall time.
+
+API side: `--requests` concurrent `GET /v1/renders/<id>/spans` calls (`--concurrency` at a time)
+served in-process, once by the previous handler (sync session inside `async def`) and once by the
+current one (async session). Reported: requests per second, p50/p99 latency and the longest event
+loop stall. A sync handler blocks the loop for its whole database round trip, so its requests run one
+at a time: their own latency looks low while everything else on the loop (other requests, SSE
+streams) waits behind them.
+
+Runs against a temporary SQLite database by default, with `--db-latency-ms` added to every statement
+and commit to stand in for the network round trip to Postgres. `--database-url` points both runs at
+a real database (the schema is created; jobs named `bench-db-*` are written) with no added latency.
+
+    python -m benchmarks.bench_db --scenes 12 --db-latency-ms 1 --requests 400 --concurrency 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+_DELAY = [0.0]
+
+
+class _SlowCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        time.sleep(_DELAY[0])
+        return super().execute(*args)
+
+    def executemany(self, *args):
+        time.sleep(_DELAY[0])
+        return super().executemany(*args)
+
+
+class _SlowConnection(sqlite3.Connection):
+    """A SQLite connection that pays a network round trip per statement and commit, on the caller's thread."""
+
+    def cursor(self, factory=_SlowCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        time.sleep(_DELAY[0])
+        return super().commit()
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class _Counter:
+    def __init__(self, engine) -> None:
+        from sqlalchemy import event
+
+        self.statements = 0
+        self.commits = 0
+        self.publishes = 0
+        event.listen(engine, 'before_cursor_execute', self._statement)
+        event.listen(engine, 'commit', self._commit)
+
+    def _statement(self, *args) -> None:
+        self.statements += 1
+
+    def _commit(self, *args) -> None:
+        self.commits += 1
+
+    def reset(self) -> None:
+        self.statements = self.commits = self.publishes = 0
+
+
+def _publisher(counter: _Counter, load):
+    """Stands in for `ProgressPublisher.publish`: the snapshot read it makes, without Redis."""
+    from app.core.db import SessionLocal
+
+    def publish(job_id):
+        counter.publishes += 1
+        db = SessionLocal()
+        try:
+            load(db, job_id)
+        finally:
+            db.close()
+
+    return publish
+
+
+def _legacy_snapshot(db, job_id):
+    """The progress snapshot as it was read before: the job, then all of its scenes."""
+    from app.models import RenderJob, RenderScene
+
+    job = db.query(RenderJob).filter(RenderJob.celery_task_id == job_id).first()
+    return job, db.query(RenderScene).filter(RenderScene.job_id == job_id).order_by(RenderScene.scene_id).all()
+
+
+def _legacy_writes(publish):
+    """The worker's status helpers before they were folded into `JobStatusWriter`."""
+    from sqlalchemy import func, or_, select, update
+
+    from app.core.db import SessionLocal
+    from app.models import RenderJob, RenderScene
+
+    def update_status(job_id, status):
+        db = SessionLocal()
+        try:
+            job = db.query(RenderJob).filter(RenderJob.celery_task_id == job_id).first()
+            job.status = status
+            db.commit()
+        finally:
+            db.close()
+
+    def mark_scene_attempt(job_id, scene_id, status):
+        db = SessionLocal()
+        try:
+            scene = db.query(RenderScene).filter(RenderScene.job_id == job_id, RenderScene.scene_id == scene_id).first()
+            scene.status = status
+            db.commit()
+        finally:
+            db.close()
+
+    def record_counters(job_id, **values):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(RenderJob)
+                .where(RenderJob.celery_task_id == job_id)
+                .values({name: getattr(RenderJob, name) + value for name, value in values.items()})
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def record_scene_artifact(job_id, scene_id, **paths):
+        db = SessionLocal()
+        try:
+            scene = db.query(RenderScene).filter(RenderScene.job_id == job_id, RenderScene.scene_id == scene_id).first()
+            for field, path in paths.items():
+                setattr(scene, field, path)
+            if scene.clip_path and scene.audio_path:
+                scene.status = 'completed'
+            elif scene.status != 'failed':
+                scene.status = 'rendering'
+            db.commit()
+            completed = (
+                select(func.count(RenderScene.id))
+                .where(RenderScene.job_id == job_id, RenderScene.status == 'completed')
+                .scalar_subquery()
+            )
+            db.execute(update(RenderJob).where(RenderJob.celery_task_id == job_id).values(scenes_completed=completed))
+            db.commit()
+        finally:
+            db.close()
+
+    def advance_to_clips_if_ready(job_id):
+        db = SessionLocal()
+        try:
+            job = db.query(RenderJob).filter(RenderJob.celery_task_id == job_id).first()
+            if not job or not job.screenplay_complete or job.status != 'rendering':
+                return False
+            waiting = (
+                db.query(func.count(RenderScene.id))
+                .filter(
+                    RenderScene.job_id == job_id,
+                    or_(
+                        RenderScene.audio_path.is_(None),
+                        RenderScene.keyframe_path.is_(None) & RenderScene.clip_path.is_(None),
+                    ),
+                )
+                .scalar()
+            )
+            if waiting:
+                return False
+            claimed = db.execute(
+                update(RenderJob)
+                .where(RenderJob.celery_task_id == job_id, RenderJob.status == 'rendering')
+                .values(status='rendering_clips')
+            )
+            db.commit()
+        finally:
+            db.close()
+        return claimed.rowcount == 1
+
+    def replay(job_id, scene_ids, batch):
+        update_status(job_id, 'rendering')
+        publish(job_id)
+        for start in range(0, len(scene_ids), batch):
+            chunk = scene_ids[start : start + batch]
+            for scene_id in chunk:
+                mark_scene_attempt(job_id, scene_id, 'rendering')
+                publish(job_id)
+            record_counters(job_id, cache_hits=0, cache_misses=len(chunk), cache_bytes_saved=0)
+            record_counters(job_id, gpu_seconds=1.0)
+            for scene_id in chunk:
+                record_scene_artifact(job_id, scene_id, keyframe_path=f'/tmp/{scene_id}.png')
+                publish(job_id)
+            if advance_to_clips_if_ready(job_id):
+                publish(job_id)
+        for scene_id in scene_ids:
+            record_counters(job_id, cache_hits=0, cache_misses=1, cache_bytes_saved=0)
+            record_scene_artifact(job_id, scene_id, audio_path=f'/tmp/{scene_id}.wav')
+            publish(job_id)
+            if advance_to_clips_if_ready(job_id):
+                publish(job_id)
+        for scene_id in scene_ids:
+            record_counters(job_id, cache_hits=0, cache_misses=1, cache_bytes_saved=0)
+            record_counters(job_id, gpu_seconds=1.0)
+            record_scene_artifact(job_id, scene_id, clip_path=f'/tmp/{scene_id}.mp4')
+            publish(job_id)
+        for status in ('stitching', 'completed'):
+            update_status(job_id, status)
+            publish(job_id)
+
+    return replay
+
+
+def _coalesced_writes(publish):
+    from app.core.artifact_cache import CacheStats
+    from app.core.job_status import job_status_writer as writer
+
+    def replay(job_id, scene_ids, batch):
+        writer.set_status(job_id, 'rendering')
+        publish(job_id)
+        for start in range(0, len(scene_ids), batch):
+            chunk = scene_ids[start : start + batch]
+            writer.mark_scenes(job_id, chunk, 'rendering')
+            publish(job_id)
+            writer.record_artifacts(
+                job_id,
+                'keyframe_path',
+                {scene_id: f'/tmp/{scene_id}.png' for scene_id in chunk},
+                cache_stats=CacheStats(misses=len(chunk)),
+                gpu_seconds=1.0,
+            )
+            publish(job_id)
+            if writer.claim_clip_phase(job_id):
+                publish(job_id)
+        for scene_id in scene_ids:
+            writer.record_artifacts(job_id, 'audio_path', {scene_id: f'/tmp/{scene_id}.wav'}, cache_stats=CacheStats(misses=1))
+            publish(job_id)
+            if writer.claim_clip_phase(job_id):
+                publish(job_id)
+        for scene_id in scene_ids:
+            writer.record_artifacts(
+                job_id, 'clip_path', {scene_id: f'/tmp/{scene_id}.mp4'}, cache_stats=CacheStats(misses=1), gpu_seconds=1.0
+            )
+            publish(job_id)
+        for status in ('stitching', 'completed'):
+            writer.set_status(job_id, status)
+            publish(job_id)
+
+    return replay
+
+
+def _create_job(job_id: str, scenes: int) -> None:
+    from app.core.db import SessionLocal
+    from app.models import RenderJob, RenderScene
+
+    db = SessionLocal()
+    try:
+        db.add(RenderJob(celery_task_id=job_id, prompt='bench', status='processing', screenplay_complete=True, scenes_total=scenes))
+        db.add_all(
+            RenderScene(job_id=job_id, scene_id=scene_id, visual_prompt='bench', dialogue='bench', shot_type='wide')
+            for scene_id in range(1, scenes + 1)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _bench_worker_writes(args: argparse.Namespace, counter: _Counter) -> dict:
+    from app.core.db import SessionLocal
+    from app.core.progress import load_job_status
+    from app.models import RenderJob
+
+    results = {}
+    replays = (
+        ('read_then_write', _legacy_writes(_publisher(counter, _legacy_snapshot))),
+        ('coalesced', _coalesced_writes(_publisher(counter, load_job_status))),
+    )
+    for name, replay in replays:
+        job_ids = [f'bench-db-{name}-{time.time_ns()}-{index}' for index in range(args.jobs)]
+        for job_id in job_ids:
+            _create_job(job_id, args.scenes)
+        counter.reset()
+        started = time.perf_counter()
+        for job_id in job_ids:
+            replay(job_id, list(range(1, args.scenes + 1)), args.keyframe_batch)
+        elapsed = time.perf_counter() - started
+        db = SessionLocal()
+        try:
+            job = db.query(RenderJob).filter(RenderJob.celery_task_id == job_ids[-1]).one()
+            if (job.status, job.scenes_completed) != ('completed', args.scenes):
+                raise RuntimeError(f'{name} left job in {job.status} with {job.scenes_completed} scenes')
+        finally:
+            db.close()
+        results[name] = {
+            'statements_per_job': counter.statements / args.jobs,
+            'commits_per_job': counter.commits / args.jobs,
+            'publishes_per_job': counter.publishes / args.jobs,
+            'ms_per_job': round(elapsed / args.jobs * 1000, 1),
+        }
+    return results
+
+
+async def _drive(client, path: str, total: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def call() -> None:
+        async with gate:
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    stalls: list[float] = []
+    done = asyncio.Event()
+
+    async def probe() -> None:
+        # How late a 5 ms timer fires: the time every other request on the loop spends waiting.
+        while not done.is_set():
+            expected = time.perf_counter() + 0.005
+            await asyncio.sleep(0.005)
+            stalls.append(max(0.0, time.perf_counter() - expected))
+
+    prober = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await prober
+    return {
+        'requests_per_second': round(total / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+        'event_loop_max_stall_ms': round(max(stalls, default=0.0) * 1000, 1),
+    }
+
+
+async def _bench_api(args: argparse.Namespace, async_engine) -> dict:
+    import httpx
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from app.core.db import SessionLocal, get_async_db
+    from app.main import app
+    from app.models import RenderJob, RenderSpan
+
+    job_id = f'bench-db-api-{time.time_ns()}'
+    _create_job(job_id, args.scenes)
+    db = SessionLocal()
+    try:
+        db.add_all(RenderSpan(job_id=job_id, scene_id=index % args.scenes, stage='video', seconds=1.0) for index in range(40))
+        db.commit()
+    finally:
+        db.close()
+
+    @app.get('/bench/sync-spans/{job_id}')
+    async def sync_spans(job_id: str):
+        # The handler as it was: a sync session used directly on the event loop.
+        db = SessionLocal()
+        try:
+            if not db.query(RenderJob.id).filter(RenderJob.celery_task_id == job_id).first():
+                return []
+            spans = db.query(RenderSpan).filter(RenderSpan.job_id == job_id).order_by(RenderSpan.created_at, RenderSpan.id)
+            return [{'stage': span.stage, 'seconds': span.seconds} for span in spans]
+        finally:
+            db.close()
+
+    sessions = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    async def bench_async_db():
+        async with sessions() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = bench_async_db
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        await client.get(f'/v1/renders/{job_id}/spans')
+        return {
+            'sync_session': await _drive(client, f'/bench/sync-spans/{job_id}', args.requests, args.concurrency),
+            'async_session': await _drive(client, f'/v1/renders/{job_id}/spans', args.requests, args.concurrency),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenes', type=int, default=12)
+    parser.add_argument('--keyframe-batch', type=int, default=8)
+    parser.add_argument('--jobs', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--db-latency-ms', type=float, default=1.0)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{Path(tmp) / "bench.db"}'
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        from sqlalchemy import create_engine
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        import app.models  # noqa: F401  registers the tables on Base
+        from app.core.db import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+
+        if not args.database_url:
+            # Both engines open connections through the slow factory; aiosqlite runs it on its own thread.
+            database = Path(tmp) / 'bench.db'
+            engine = create_engine(f'sqlite:///{database}', connect_args={'factory': _SlowConnection})
+            async_engine = create_async_engine(f'sqlite+aiosqlite:///{database}', connect_args={'factory': _SlowConnection})
+            SessionLocal.configure(bind=engine)
+            AsyncSessionLocal.configure(bind=async_engine)
+        Base.metadata.create_all(bind=engine)
+        counter = _Counter(engine)
+        _DELAY[0] = 0.0 if args.database_url else args.db_latency_ms / 1000
+
+        results = {
+            'scenes': args.scenes,
+            'db_latency_ms': 0.0 if args.database_url else args.db_latency_ms,
+            'worker_status_writes': _bench_worker_writes(args, counter),
+            'api_spans_endpoint': asyncio.run(_bench_api(args, async_engine)),
+        }
+        engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,391 @@
+"""
+End-to-end load test: jobs/hour, per-stage latency, model swaps and queue wait, without GPUs or weights.
+
+Everything runs in one process against the real API routes, admission controller, Celery tasks,
+phase scheduler and model manager:
+
+- Flux and Hunyuan are stub pipelines registered with `ModelManager` under a declared VRAM footprint
+  (`--flux-gb`, `--hunyuan-gb`, against `--gpu-budget-gb`; 0 keeps one model resident). Building one
+  takes `--load-ms`, and moving it onto the GPU takes its footprint over `--pcie-gbps`. A keyframe
+  costs `--flux-step-ms` per denoising step (each extra prompt in a batch `--marginal` of that),
+  and a 129-frame clip window `--video-step-ms` per step plus `--decode-ms` per decoded frame.
+  Keyframes are real PNGs and clips real H.264, so writing artifacts is part of the measurement.
+- Dialogue goes through a stub F5-TTS engine that costs `--tts-ms` per line.
+- The screenplay comes from `benchmarks.stub_llm_server` over HTTP (`--llm-latency`, `--scenes`).
+- The film is stitched by ffmpeg and uploaded to an in-process moto S3 server, or `--s3-endpoint-url`.
+- Celery uses the in-memory broker with solo-pool workers per queue (`--render-workers`,
+  `--gpu-workers`, `--audio-workers`). GPU tasks from all workers share the phase scheduler,
+  like a thread-pool GPU worker.
+- Progress goes to Redis at `--redis-url`, or with `--fakeredis` a local fakeredis server process.
+
+`--jobs` renders are submitted to `POST /v1/renders` at `--rate` per minute (open loop), each with its
+own prompt, or with `--prompt-variants N` cycling through N prompts and seeds so that concurrent
+jobs request identical keyframes and clips (the artifact cache is off, so only in-flight
+coalescing can share them; `--no-coalescing` turns that off too). Reported as JSON (also written to `--output`), tagged
+with the commit and parameters: jobs/hour over the run, submit-to-completion latency, p50/p99
+seconds per stage from the recorded spans (a batched stage records one span per batch), model swaps
+and phases, GPU utilisation, admission wait, per-queue wait between a task being published and a
+worker starting it, and coalesced requests with the GPU seconds they saved.
+
+    python -m benchmarks.bench_e2e --jobs 6 --rate 12 --scenes 4 --preset draft --fakeredis
+    python -m benchmarks.bench_e2e --jobs 6 --rate 30 --prompt-variants 2 --fakeredis
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+_GIB = 1024**3
+_FAKEREDIS = (
+    'import sys; from fakeredis import TcpFakeServer; '
+    "server = TcpFakeServer(('127.0.0.1', int(sys.argv[1])), server_type='redis'); "
+    'server.daemon_threads = True; server.serve_forever()'
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentiles(values: list[float]) -> dict[str, float | int]:
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+
+    def pct(value: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(round(value / 100 * (len(ordered) - 1))))], 3)
+
+    return {'count': len(ordered), 'p50': pct(50), 'p99': pct(99), 'max': round(ordered[-1], 3)}
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class StubModel:
+    """A pipeline that costs `load_ms` to build and `footprint / pcie` seconds to move onto the GPU."""
+
+    busy = 0.0
+    _busy_lock = threading.Lock()
+
+    def __init__(self, args: argparse.Namespace, footprint_gb: float) -> None:
+        time.sleep(args.load_ms / 1000)
+        self.args = args
+        self.footprint_gb = footprint_gb
+
+    def to(self, device, *args, **kwargs) -> StubModel:
+        if str(device).startswith('cuda'):
+            time.sleep(self.footprint_gb / self.args.pcie_gbps)
+        return self
+
+    def hold(self, seconds: float) -> None:
+        """Occupy the (simulated) GPU."""
+        time.sleep(seconds)
+        with StubModel._busy_lock:
+            StubModel.busy += seconds
+
+
+class StubFlux(StubModel):
+    _execution_device = 'cpu'
+
+    def __call__(self, prompt: list[str], num_inference_steps: int, height: int, width: int, **kwargs):
+        self.hold(num_inference_steps * self.args.flux_step_ms / 1000 * (1 + (len(prompt) - 1) * self.args.marginal))
+        return SimpleNamespace(images=[Image.effect_noise((width, height), 64).convert('RGB') for _ in prompt])
+
+
+class StubHunyuan(StubModel):
+    """Latents are placeholders; the VAE "decodes" them to flat frames at the requested size."""
+
+    vae_scale_factor_temporal = 4
+
+    def __init__(self, args: argparse.Namespace, footprint_gb: float) -> None:
+        super().__init__(args, footprint_gb)
+        self._size = (0, 0)
+        self.vae = SimpleNamespace(dtype=None, config=SimpleNamespace(scaling_factor=1.0), decode=self._decode)
+
+    def __call__(self, image, num_frames: int, height: int, width: int, num_inference_steps: int, **kwargs):
+        import torch
+
+        self.hold(num_inference_steps * self.args.video_step_ms / 1000)
+        self._size = (height, width)
+        latent_frames = (num_frames - 1) // self.vae_scale_factor_temporal + 1
+        return SimpleNamespace(frames=torch.zeros(1, 1, latent_frames, 1, 1))
+
+    def _decode(self, latents, return_dict: bool = False):
+        import torch
+
+        frames = latents.shape[2] * self.vae_scale_factor_temporal
+        self.hold(frames * self.args.decode_ms / 1000)
+        return (torch.zeros(1, 3, frames, *self._size),)
+
+
+class StubTTSEngine:
+    """The `F5Engine` interface; every line costs `--tts-ms` and is as long as it takes to read."""
+
+    sample_rate = 24000
+    max_frames = 4096
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+
+    def encode_voice(self, reference_audio: str, reference_text: str):
+        from app.services.audio_gen import Voice
+
+        return Voice(cond=None, text=reference_text or 'reference', frames=0, rms=0.1, reference_audio=reference_audio)
+
+    def frames_for(self, voice, text: str) -> int:
+        return len(text)
+
+    def generate(self, voice, texts: list[str]) -> list[np.ndarray]:
+        time.sleep(len(texts) * self.args.tts_ms / 1000)
+        return [np.zeros(int(max(1.0, len(text) / 15) * self.sample_rate), dtype=np.float32) for text in texts]
+
+    def generate_long(self, voice, text: str) -> np.ndarray:
+        return self.generate(voice, [text])[0]
+
+
+def run(args: argparse.Namespace) -> dict:
+    from celery.contrib.testing.worker import start_worker
+    from celery.signals import before_task_publish, task_prerun
+    from fastapi.testclient import TestClient
+
+    import celery_worker
+    from app.core.artifact_cache import inflight_requests
+    from app.core.celery_app import celery
+    from app.core.db import Base, SessionLocal, engine
+    from app.core.memory_manager import model_manager
+    from app.core.metrics import span_recorder
+    from app.core.phase_scheduler import phase_scheduler
+    from app.main import app
+    from app.models import RenderJob, RenderSpan
+
+    Base.metadata.create_all(bind=engine)
+    # The memory transport polls its queues; the default 1s interval would dominate short stages.
+    celery.conf.broker_transport_options = {'polling_interval': 0.01}
+    model_manager.register_model('flux', lambda: StubFlux(args, args.flux_gb), vram_bytes=int(args.flux_gb * _GIB))
+    model_manager.register_model(
+        'hunyuan', lambda: StubHunyuan(args, args.hunyuan_gb), vram_bytes=int(args.hunyuan_gb * _GIB)
+    )
+    celery_worker.audio_generator._engine = StubTTSEngine(args)
+    celery_worker.audio_generator._initialized = True
+
+    published: dict[str, tuple[str, float]] = {}
+    queue_waits: dict[str, list[float]] = {}
+
+    @before_task_publish.connect(weak=False)
+    def _published(headers=None, routing_key=None, **kwargs) -> None:
+        published[headers['id']] = (routing_key, time.perf_counter())
+
+    @task_prerun.connect(weak=False)
+    def _started(task_id=None, **kwargs) -> None:
+        entry = published.pop(task_id, None)
+        if entry is not None:
+            queue_waits.setdefault(entry[0], []).append(time.perf_counter() - entry[1])
+
+    client = TestClient(app)
+    submitted: list[str] = []
+    rejected = 0
+    queues = {'render': args.render_workers, 'gpu': args.gpu_workers, 'audio': args.audio_workers}
+    with ExitStack() as workers:
+        # Solo-pool workers: a thread pool's finished tasks only wake the memory transport's consumer
+        # on its next drain timeout, which would add seconds per task.
+        for queue, count in queues.items():
+            for _ in range(count):
+                workers.enter_context(start_worker(celery, pool='solo', perform_ping_check=False, queues=[queue]))
+
+        started = time.perf_counter()
+        for index in range(args.jobs):
+            time.sleep(max(0.0, started + index * 60 / args.rate - time.perf_counter()))
+            payload = {'prompt': f'Benchmark film {index}: a courier crosses a flooded neon city', 'preset': args.preset}
+            if args.prompt_variants:
+                # Templated renders share a seed as well, or draft jobs would each pin a random one.
+                variant = index % args.prompt_variants
+                payload.update(prompt=f'Benchmark film {variant}: a courier crosses a flooded neon city', seed=variant)
+            response = client.post(
+                '/v1/renders',
+                json=payload,
+                headers={'X-Tenant-Id': f'tenant-{index % args.tenants}'},
+            )
+            if response.status_code == 429:
+                rejected += 1
+                continue
+            response.raise_for_status()
+            submitted.append(response.json()['job_id'])
+
+        while True:
+            db = SessionLocal()
+            try:
+                jobs = db.query(RenderJob).filter(RenderJob.celery_task_id.in_(submitted)).all()
+            finally:
+                db.close()
+            if all(job.status in ('completed', 'failed') for job in jobs):
+                break
+            if time.perf_counter() - started > args.timeout:
+                break
+            time.sleep(0.25)
+        elapsed = time.perf_counter() - started
+
+    span_recorder.flush()
+    db = SessionLocal()
+    try:
+        stage_seconds: dict[str, list[float]] = {}
+        for stage, seconds in db.query(RenderSpan.stage, RenderSpan.seconds).filter(RenderSpan.status == 'ok'):
+            stage_seconds.setdefault(stage, []).append(seconds)
+    finally:
+        db.close()
+
+    completed = [job for job in jobs if job.status == 'completed']
+    scheduler = phase_scheduler.stats()
+    return {
+        'jobs': {
+            'submitted': len(submitted),
+            'rejected_429': rejected,
+            'completed': len(completed),
+            'failed': sum(job.status == 'failed' for job in jobs),
+            'unfinished': sum(job.status not in ('completed', 'failed') for job in jobs),
+        },
+        'wall_seconds': round(elapsed, 2),
+        'jobs_per_hour': round(len(completed) / elapsed * 3600, 1),
+        'job_latency_seconds': _percentiles([(job.updated_at - job.created_at).total_seconds() for job in completed]),
+        'admission_wait_seconds': _percentiles(
+            [(job.admitted_at - job.created_at).total_seconds() for job in jobs if job.admitted_at]
+        ),
+        'queue_wait_seconds': {queue: _percentiles(waits) for queue, waits in sorted(queue_waits.items())},
+        'stage_seconds': {stage: _percentiles(values) for stage, values in sorted(stage_seconds.items())},
+        'model_swaps': {
+            'swap_count': scheduler['swap_count'],
+            'swap_seconds': scheduler['swap_seconds'],
+            'loads_by_model': scheduler['loads_by_model'],
+            'gpu_phases': scheduler['phases'],
+            'gpu_items_served': scheduler['items_served'],
+        },
+        'gpu_busy_seconds': round(StubModel.busy, 2),
+        'gpu_utilisation': round(StubModel.busy / elapsed, 2),
+        'coalescing': {
+            'coalesced_requests': sum(job.coalesced_requests or 0 for job in jobs),
+            'gpu_seconds_saved': round(sum(job.gpu_seconds_saved or 0.0 for job in jobs), 2),
+            'in_flight_leaders': inflight_requests.stats()['led'],
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=6)
+    parser.add_argument('--rate', type=float, default=12.0, help='job submissions per minute')
+    parser.add_argument('--tenants', type=int, default=1)
+    parser.add_argument('--preset', choices=('draft', 'preview', 'final'), default='draft')
+    parser.add_argument('--scenes', type=int, default=4)
+    parser.add_argument('--prompt-variants', type=int, default=0, help='distinct prompts across jobs; 0 for one per job')
+    parser.add_argument('--no-coalescing', action='store_true', help='INFLIGHT_COALESCING_ENABLED=false')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='seconds before the first screenplay byte')
+    parser.add_argument('--llm-scene-delay', type=float, default=0.2, help='seconds between streamed scenes')
+    parser.add_argument('--flux-gb', type=float, default=24.0)
+    parser.add_argument('--hunyuan-gb', type=float, default=40.0)
+    parser.add_argument('--gpu-budget-gb', type=float, default=0.0)
+    parser.add_argument('--pcie-gbps', type=float, default=12.0, help='host-to-GPU bandwidth for model swaps')
+    parser.add_argument('--load-ms', type=float, default=2000.0, help='time to build a pipeline from disk')
+    parser.add_argument('--flux-step-ms', type=float, default=50.0)
+    parser.add_argument('--marginal', type=float, default=0.35, help='cost of each extra prompt in a Flux batch')
+    parser.add_argument('--video-step-ms', type=float, default=100.0)
+    parser.add_argument('--decode-ms', type=float, default=2.0, help='VAE decode time per frame')
+    parser.add_argument('--tts-ms', type=float, default=200.0, help='synthesis time per dialogue line')
+    parser.add_argument('--render-workers', type=int, default=2)
+    parser.add_argument('--gpu-workers', type=int, default=2)
+    parser.add_argument('--audio-workers', type=int, default=1)
+    parser.add_argument('--max-active-jobs', type=int, default=8, help='ADMISSION_MAX_ACTIVE_JOBS')
+    parser.add_argument('--s3-endpoint-url', help='S3-compatible store to upload to instead of moto')
+    parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/15')
+    parser.add_argument('--fakeredis', action='store_true')
+    parser.add_argument('--timeout', type=float, default=900.0)
+    parser.add_argument('--output', type=Path, help='also write the JSON report here')
+    args = parser.parse_args()
+
+    from benchmarks.stub_llm_server import StubLLMServer
+
+    with ExitStack() as services, tempfile.TemporaryDirectory() as tmp:
+        if args.fakeredis:
+            redis_port = _free_port()
+            fake = subprocess.Popen([sys.executable, '-c', _FAKEREDIS, str(redis_port)])
+            services.callback(fake.terminate)
+            args.redis_url = f'redis://127.0.0.1:{redis_port}/0'
+            time.sleep(1)
+        s3_endpoint_url = args.s3_endpoint_url
+        if s3_endpoint_url is None:
+            from moto.server import ThreadedMotoServer
+
+            s3 = ThreadedMotoServer(port=0, verbose=False)
+            s3.start()
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+            services.callback(s3.stop)
+            host, port = s3.get_host_and_port()
+            s3_endpoint_url = f'http://{host}:{port}'
+        llm = StubLLMServer(latency=args.llm_latency, scene_delay=args.llm_scene_delay, scenes=args.scenes)
+        llm.start_background()
+        services.callback(llm.shutdown)
+
+        # Settings are read once at import, so the environment is complete before any app module loads.
+        for name, value in {
+            'DATABASE_URL': f'sqlite:///{Path(tmp) / "bench.db"}',
+            'REDIS_URL': args.redis_url,
+            'CELERY_BROKER_URL': 'memory://',
+            'CELERY_RESULT_BACKEND': 'cache+memory://',
+            'LLM_API_URL': llm.url,
+            'S3_ENDPOINT_URL': s3_endpoint_url,
+            'S3_BUCKET': 'opencine-bench',
+            'OUTPUT_DIR': str(Path(tmp) / 'outputs'),
+            'ARTIFACT_CACHE_ENABLED': 'false',
+            'INFLIGHT_COALESCING_ENABLED': str(not args.no_coalescing).lower(),
+            'GPU_MEMORY_BUDGET_GB': str(args.gpu_budget_gb),
+            'ADMISSION_MAX_ACTIVE_JOBS': str(args.max_active_jobs),
+            'TTS_REFERENCE_AUDIO': 'bench-voice.wav',
+            'TTS_REFERENCE_TEXT': 'A benchmark voice.',
+            'LOG_LEVEL': 'WARNING',
+        }.items():
+            os.environ[name] = value
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+
+        from app.core.s3_uploader import s3_client
+
+        with contextlib.suppress(Exception):
+            s3_client().create_bucket(Bucket='opencine-bench')
+        results = run(args)
+
+    report = {
+        'commit': _commit(),
+        'params': {name: str(value) if isinstance(value, Path) else value for name, value in vars(args).items()},
+        'cpus': os.cpu_count(),
+        **results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Keyframe throughput (images/minute), one Flux call per scene vs `generate_keyframes` batches.
+
+Registers a stub Flux pipeline whose forward pass sleeps `steps * step_ms * (1 + (K - 1) * marginal)`
+for a batch of K prompts, i.e. each extra image in a batch costs `marginal` of a single image, and
+returns real 1024x1024 images so saving PNGs is part of the measurement. The artifact cache is off.
+
+    python -m benchmarks.bench_keyframes --scenes 16 --step-ms 20 --marginal 0.35
+"""
+
+from __future__ import annotations
+
+import os
+
+os.environ.setdefault('ARTIFACT_CACHE_ENABLED', 'false')
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from app.core.memory_manager import model_manager
+from app.services.image_gen import KeyframeRequest, keyframe_generator
+
+
+class StubFlux:
+    _execution_device = 'cpu'
+
+    def __init__(self, step_ms: float, marginal: float) -> None:
+        self.step_ms = step_ms
+        self.marginal = marginal
+        self.calls: list[int] = []
+
+    def to(self, *args, **kwargs) -> StubFlux:
+        return self
+
+    def __call__(self, prompt: list[str], num_inference_steps: int, height: int, width: int, **kwargs):
+        self.calls.append(len(prompt))
+        time.sleep(num_inference_steps * self.step_ms / 1000 * (1 + (len(prompt) - 1) * self.marginal))
+        images = [Image.effect_noise((width, height), 64).convert('RGB') for _ in prompt]
+        return type('FluxOutput', (), {'images': images})()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenes', type=int, default=16)
+    parser.add_argument('--step-ms', type=float, default=20.0)
+    parser.add_argument('--marginal', type=float, default=0.35)
+    args = parser.parse_args()
+
+    stub = StubFlux(args.step_ms, args.marginal)
+    model_manager.register_model('flux', lambda: stub)
+    results: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        keyframe_generator.generate_keyframe('warm-up', work_dir / 'warm.png')
+
+        started = time.perf_counter()
+        for idx in range(args.scenes):
+            keyframe_generator.generate_keyframe(f'single scene {idx}', work_dir / f'single_{idx:03d}.png')
+        elapsed = time.perf_counter() - started
+        results['single_image'] = {'images_per_minute': round(args.scenes / elapsed * 60, 1)}
+
+        stub.calls.clear()
+        requests = [KeyframeRequest(f'batched scene {idx}', work_dir / f'batch_{idx:03d}.png') for idx in range(args.scenes)]
+        started = time.perf_counter()
+        keyframe_generator.generate_keyframes(requests)
+        elapsed = time.perf_counter() - started
+        results['batched'] = {'images_per_minute': round(args.scenes / elapsed * 60, 1), 'batch_sizes': stub.calls}
+
+    print(json.dumps({'scenes': args.scenes, 'step_ms': args.step_ms, 'marginal': args.marginal, **results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Latency/throughput of the screenplay LLM client against the local stub endpoint.
+
+Compares one bare `requests.post` per call (the previous behaviour) with the pooled `LLMClient`,
+with and without micro-batching, and reports time-to-first-scene for the streamed path.
+
+    python -m benchmarks.bench_llm_client --requests 200 --concurrency 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from app.services.llm_client import LLMClient
+from app.services.screenplay_stream import iter_scenes
+from benchmarks.stub_llm_server import StubLLMServer
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _drive(call: Callable[[int], object], total: int, concurrency: int) -> dict[str, float]:
+    latencies: list[float] = []
+
+    def timed(idx: int) -> None:
+        started = time.perf_counter()
+        call(idx)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests_per_second': round(total / elapsed, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubLLMServer(latency=args.latency, fail_rate=args.fail_rate).start_background()
+    results: dict[str, dict] = {}
+
+    if not args.fail_rate:
+        results['bare_requests_post'] = _drive(
+            lambda idx: requests.post(server.url, json={'prompt': f'p{idx}'}, timeout=120).json(),
+            args.requests,
+            args.concurrency,
+        )
+
+    pooled = LLMClient(server.url, max_concurrency=args.concurrency, backoff_seconds=0.01)
+    results['pooled_client'] = _drive(lambda idx: pooled.complete(f'p{idx}'), args.requests, args.concurrency)
+
+    server.requests_served = 0
+    batched = LLMClient(server.url, max_concurrency=args.concurrency, backoff_seconds=0.01, batching=True, batch_window_ms=10)
+    results['pooled_batched_client'] = _drive(lambda idx: batched.complete(f'p{idx}'), args.requests, args.concurrency)
+    results['pooled_batched_client']['http_requests'] = server.requests_served
+
+    streamed = LLMClient(server.url)
+    started = time.perf_counter()
+    first_scene_ms = None
+    for _ in iter_scenes(streamed.stream('stream me')):
+        if first_scene_ms is None:
+            first_scene_ms = round((time.perf_counter() - started) * 1000, 1)
+    results['streaming'] = {
+        'first_scene_ms': first_scene_ms,
+        'full_screenplay_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Job wall time and GPU utilisation, serial per-scene loop vs the staged pipeline.
+
+Stub models stand in for every stage. Dialogue synthesis burns `--tts-ms` of CPU per scene. A keyframe
+holds the GPU for `--keyframe-ms`, then its 1024x1024 PNG is saved. A clip holds the GPU for
+`--window-ms` per window (`--windows` of them), then "decodes" 129 frames at `--decode-ms` each, and
+those frames are encoded by ffmpeg through `FrameWriter`. GPU work runs on the worker's phase scheduler.
+
+- `serial`: one scene at a time: synthesize, render and save the keyframe, then render the clip with
+  its frames written inline, so the GPU waits for TTS, PNG encoding and ffmpeg
+- `pipelined`: dialogue for every scene is synthesized by `--audio-workers` processes (the `audio`
+  queue) while keyframes render, PNGs are saved on a writer thread, and once every scene has its
+  keyframe and audio the clips render from `--gpu-concurrency` task threads, queuing their frames for
+  ffmpeg (`VIDEO_WRITE_QUEUE_FRAMES`) and draining the encoder after the GPU phase
+
+Reported per mode: job wall time, seconds the GPU was busy, and their ratio.
+
+    python -m benchmarks.bench_pipeline --scenes 6 --tts-ms 1500 --keyframe-ms 800 --window-ms 1000
+"""
+
+from __future__ import annotations
+
+import os
+
+os.environ.setdefault('ARTIFACT_CACHE_ENABLED', 'false')
+os.environ.setdefault('METRICS_ENABLED', 'false')
+
+import argparse
+import json
+import multiprocessing
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from app.core.memory_manager import model_manager
+from app.core.phase_scheduler import phase_scheduler
+from app.services.frame_export import FrameWriter
+
+_WINDOW_FRAMES = 129
+
+
+class StubPipeline:
+    """A model that holds the (simulated) GPU for the requested time and records how long it was busy."""
+
+    busy = 0.0
+    _lock = threading.Lock()
+
+    def to(self, *args, **kwargs) -> StubPipeline:
+        return self
+
+    def hold(self, seconds: float) -> None:
+        time.sleep(seconds)
+        with StubPipeline._lock:
+            StubPipeline.busy += seconds
+
+
+def _synthesize(output_path: Path, tts_ms: float) -> Path:
+    """Spend `tts_ms` of CPU, then write a second of silence."""
+    deadline = time.thread_time() + tts_ms / 1000
+    while time.thread_time() < deadline:
+        pass
+    with wave.open(str(output_path), 'w') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(22050)
+        wav_file.writeframes(bytes(44100))
+    return output_path
+
+
+def _render_keyframe(pipe: StubPipeline, args: argparse.Namespace, scene_id: int) -> Image.Image:
+    pipe.hold(args.keyframe_ms / 1000)
+    return Image.effect_noise((1024, 1024), 64 + scene_id).convert('RGB')
+
+
+def _render_clip(pipe: StubPipeline, args: argparse.Namespace, output_path: Path, queue_frames: int) -> FrameWriter:
+    width, height = args.width, args.height
+    texture = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    writer = FrameWriter(output_path, width=width, height=height, fps=24, queue_frames=queue_frames)
+    try:
+        for window in range(args.windows):
+            pipe.hold(args.window_ms / 1000)
+            for idx in range(_WINDOW_FRAMES):
+                pipe.hold(args.decode_ms / 1000)
+                writer.write(np.roll(texture, (window * _WINDOW_FRAMES + idx) * 8, axis=1))
+    except BaseException:
+        writer.abort()
+        raise
+    return writer
+
+
+def run_serial(args: argparse.Namespace, work_dir: Path) -> None:
+    for scene_id in range(args.scenes):
+        _synthesize(work_dir / f'scene_{scene_id:03d}.wav', args.tts_ms)
+        image = phase_scheduler.run('flux', lambda pipe: _render_keyframe(pipe, args, scene_id))
+        image.save(work_dir / f'scene_{scene_id:03d}.png')
+        clip_path = work_dir / f'scene_{scene_id:03d}.mp4'
+        phase_scheduler.run('hunyuan', lambda pipe: _render_clip(pipe, args, clip_path, 0)).close()
+
+
+def run_pipelined(args: argparse.Namespace, work_dir: Path, audio_pool: ProcessPoolExecutor) -> None:
+    with (
+        ThreadPoolExecutor(max_workers=2) as png_writer,
+        ThreadPoolExecutor(max_workers=args.gpu_concurrency) as gpu_tasks,
+    ):
+        audio = [
+            audio_pool.submit(_synthesize, work_dir / f'scene_{scene_id:03d}.wav', args.tts_ms)
+            for scene_id in range(args.scenes)
+        ]
+
+        def keyframe(pipe: StubPipeline, scene_id: int):
+            image = _render_keyframe(pipe, args, scene_id)
+            return png_writer.submit(image.save, work_dir / f'scene_{scene_id:03d}.png')
+
+        keyframes = [
+            phase_scheduler.submit('flux', lambda pipe, scene_id=scene_id: keyframe(pipe, scene_id))
+            for scene_id in range(args.scenes)
+        ]
+        saves = [future.result() for future in keyframes]
+        # The clip phase starts once every scene has its keyframe and audio.
+        wait([*saves, *audio])
+        for future in [*saves, *audio]:
+            future.result()
+
+        def clip(scene_id: int) -> None:
+            clip_path = work_dir / f'scene_{scene_id:03d}.mp4'
+            phase_scheduler.run('hunyuan', lambda pipe: _render_clip(pipe, args, clip_path, args.queue_frames)).close()
+
+        for future in [gpu_tasks.submit(clip, scene_id) for scene_id in range(args.scenes)]:
+            future.result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenes', type=int, default=6)
+    parser.add_argument('--tts-ms', type=float, default=1500.0, help='CPU time per scene of dialogue')
+    parser.add_argument('--keyframe-ms', type=float, default=800.0)
+    parser.add_argument('--window-ms', type=float, default=1000.0, help='denoising time per 129-frame window')
+    parser.add_argument('--windows', type=int, default=2, help='windows per clip')
+    parser.add_argument('--decode-ms', type=float, default=2.0, help='VAE decode time per frame')
+    parser.add_argument('--size', default='854x480')
+    parser.add_argument('--audio-workers', type=int, default=2)
+    parser.add_argument('--gpu-concurrency', type=int, default=4)
+    parser.add_argument('--queue-frames', type=int, default=64)
+    args = parser.parse_args()
+    args.width, args.height = (int(value) for value in args.size.split('x'))
+
+    stub = StubPipeline()
+    model_manager.register_model('flux', lambda: stub)
+    model_manager.register_model('hunyuan', lambda: stub)
+    results = {}
+    # Audio workers are long-lived processes; start them before the clock does.
+    with ProcessPoolExecutor(max_workers=args.audio_workers, mp_context=multiprocessing.get_context('spawn')) as audio_pool:
+        list(audio_pool.map(time.sleep, [0.5] * args.audio_workers))
+        for mode in ('serial', 'pipelined'):
+            with tempfile.TemporaryDirectory() as tmp:
+                StubPipeline.busy = 0.0
+                started = time.perf_counter()
+                if mode == 'serial':
+                    run_serial(args, Path(tmp))
+                else:
+                    run_pipelined(args, Path(tmp), audio_pool)
+                elapsed = time.perf_counter() - started
+            results[mode] = {
+                'job_seconds': round(elapsed, 2),
+                'gpu_busy_seconds': round(StubPipeline.busy, 2),
+                'gpu_utilisation': round(StubPipeline.busy / elapsed, 2),
+            }
+    print(json.dumps({'scenes': args.scenes, 'cpus': os.cpu_count(), **results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+Concurrent progress watchers served by one API process, and cached vs database status reads.
+
+Starts the API under uvicorn (one process) against a temporary SQLite database and Redis at
+`--redis-url`, or with `--fakeredis` a local fakeredis server process (`pip install fakeredis`).
+Opens `--watchers` SSE streams on `GET /v1/renders/<id>/events` from `--clients` processes, spread
+over `--jobs` jobs, then publishes `--events` scene events per job the way a worker does and finally
+completes the jobs. Reported: watchers that received every event and closed cleanly, publish-to-client
+latency, the API process's CPU use and RSS per watcher, and `GET /v1/renders/<id>` throughput from
+the Redis cache vs a database read.
+
+    python -m benchmarks.bench_progress --fakeredis --watchers 2000 --jobs 20 --events 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+# Events are parsed by prefix only, so the watchers are not the bottleneck being measured.
+_SCENE_ID = re.compile(rb'"scene_id": (\d+|null)')
+_FAKEREDIS = (
+    'import sys; from fakeredis import TcpFakeServer; '
+    "server = TcpFakeServer(('127.0.0.1', int(sys.argv[1])), server_type='redis'); "
+    'server.daemon_threads = True; server.serve_forever()'
+)
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _rss_bytes(pid: int) -> int:
+    for line in Path(f'/proc/{pid}/status').read_text().splitlines():
+        if line.startswith('VmRSS:'):
+            return int(line.split()[1]) * 1024
+    return 0
+
+
+def _cpu_seconds(pid: int) -> float:
+    fields = Path(f'/proc/{pid}/stat').read_text().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+async def _watch(port: int, job_id: str, ready: asyncio.Event, received: dict[int, float]) -> bool:
+    """Follow one event stream; True when it ended with the job's terminal status."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=1 << 20)
+    # HTTP/1.0 keeps the body unchunked; the server closes the stream when the job finishes.
+    writer.write(f'GET /v1/renders/{job_id}/events HTTP/1.0\r\nAccept: text/event-stream\r\n\r\n'.encode())
+    await writer.drain()
+    finished = False
+    try:
+        while line := await reader.readline():
+            if not line.startswith(b'data: '):
+                continue
+            # CLOCK_MONOTONIC is system-wide, so client and publisher timestamps compare.
+            at = time.monotonic()
+            scene_id = _SCENE_ID.search(line, 0, 80).group(1)
+            if scene_id != b'null':
+                received.setdefault(int(scene_id), at)
+            elif b'"status": "completed"' in line:
+                finished = True
+            ready.set()
+    finally:
+        writer.close()
+    return finished
+
+
+async def _watch_many(port: int, job_ids: list[str], results: multiprocessing.Queue) -> None:
+    readies = [asyncio.Event() for _ in job_ids]
+    received: list[dict[int, float]] = [{} for _ in job_ids]
+    tasks = []
+    for index, job_id in enumerate(job_ids):
+        tasks.append(asyncio.create_task(_watch(port, job_id, readies[index], received[index])))
+        if index % 200 == 199:
+            await asyncio.sleep(0.05)
+    await asyncio.wait_for(asyncio.gather(*(ready.wait() for ready in readies)), timeout=120)
+    results.put('ready')
+    finished = await asyncio.gather(*tasks)
+    results.put((received, finished))
+
+
+def _client_process(port: int, job_ids: list[str], results: multiprocessing.Queue) -> None:
+    asyncio.run(_watch_many(port, job_ids, results))
+
+
+def _run_watchers(args: argparse.Namespace, job_ids: list[str], publish, server_pid: int) -> dict:
+    """Open the watchers from `--clients` processes, publish the events, and collect what arrived."""
+    results: multiprocessing.Queue = multiprocessing.Queue()
+    watched = [job_ids[index % len(job_ids)] for index in range(args.watchers)]
+    rss_before = _rss_bytes(server_pid)
+    clients = [
+        multiprocessing.Process(target=_client_process, args=(args.port, watched[index :: args.clients], results))
+        for index in range(args.clients)
+    ]
+    for client in clients:
+        client.start()
+    for _ in clients:
+        if results.get(timeout=180) != 'ready':
+            raise RuntimeError('watcher process failed')
+    rss_after = _rss_bytes(server_pid)
+
+    sent: dict[int, float] = {}
+    cpu_before, started = _cpu_seconds(server_pid), time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(job_ids)) as pool:
+        for scene_id in range(1, args.events + 1):
+            sent[scene_id] = time.monotonic()
+            list(pool.map(lambda job_id: publish(job_id, scene_id), job_ids))
+            time.sleep(args.interval_ms / 1000)
+        list(pool.map(lambda job_id: publish(job_id, None), job_ids))
+    received: list[dict[int, float]] = []
+    finished: list[bool] = []
+    for _ in clients:
+        client_received, client_finished = results.get(timeout=180)
+        received += client_received
+        finished += client_finished
+    api_cpu = (_cpu_seconds(server_pid) - cpu_before) / (time.monotonic() - started)
+    for client in clients:
+        client.join()
+
+    latencies = [at - sent[scene_id] for events in received for scene_id, at in events.items()]
+    complete = sum(1 for events, done in zip(received, finished) if done and len(events) == args.events)
+    return {
+        'watchers': args.watchers,
+        # Saw every event; a watcher that falls behind skips intermediate snapshots but still finishes.
+        'watchers_complete': complete,
+        'watchers_finished': sum(finished),
+        'events_delivered': len(latencies),
+        'events_expected': args.watchers * args.events,
+        'publish_to_client_p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'publish_to_client_p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+        'api_cpu_utilisation': round(api_cpu, 2),
+        'api_rss_per_watcher_kib': round((rss_after - rss_before) / args.watchers / 1024, 1),
+    }
+
+
+def _read_throughput(port: int, job_ids: list[str], total: int, concurrency: int, before=None) -> dict:
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+    latencies: list[float] = []
+
+    def read(index: int) -> None:
+        job_id = job_ids[index % len(job_ids)]
+        if before is not None:
+            before(job_id)
+        started = time.perf_counter()
+        session.get(f'http://127.0.0.1:{port}/v1/renders/{job_id}').raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(read, range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests_per_second': round(total / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--watchers', type=int, default=2000)
+    parser.add_argument('--jobs', type=int, default=20)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--interval-ms', type=float, default=100.0)
+    parser.add_argument('--clients', type=int, default=4, help='processes the watchers are spread over')
+    parser.add_argument('--scenes', type=int, default=12, help='scene rows per job, for a realistic snapshot size')
+    parser.add_argument('--reads', type=int, default=2000)
+    parser.add_argument('--read-concurrency', type=int, default=16)
+    parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/15')
+    parser.add_argument('--fakeredis', action='store_true')
+    args = parser.parse_args()
+    args.port = _free_port()
+
+    fake = None
+    if args.fakeredis:
+        # Its own process, so the server does not share a GIL with the watchers.
+        redis_port = _free_port()
+        fake = subprocess.Popen([sys.executable, '-c', _FAKEREDIS, str(redis_port)])
+        args.redis_url = f'redis://127.0.0.1:{redis_port}/0'
+        time.sleep(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            DATABASE_URL=f'sqlite:///{Path(tmp) / "bench.db"}',
+            REDIS_URL=args.redis_url,
+            PROGRESS_KEEPALIVE_SECONDS='5',
+            LOG_LEVEL='WARNING',
+        )
+        import redis
+        from sqlalchemy import update
+
+        from app.core.db import Base, SessionLocal, engine
+        from app.core.progress import progress_publisher
+        from app.models import RenderJob, RenderScene
+
+        Base.metadata.create_all(bind=engine)
+        job_ids = [f'bench-progress-{index}' for index in range(args.jobs)]
+        db = SessionLocal()
+        db.add_all(RenderJob(celery_task_id=job_id, prompt='bench', status='rendering', scenes_total=args.scenes) for job_id in job_ids)
+        db.add_all(
+            RenderScene(job_id=job_id, scene_id=scene_id, visual_prompt='bench', dialogue='bench', shot_type='wide', status='rendering')
+            for job_id in job_ids
+            for scene_id in range(1, args.scenes + 1)
+        )
+        db.commit()
+        db.close()
+
+        def publish(job_id: str, scene_id: int | None) -> None:
+            if scene_id is None:
+                db = SessionLocal()
+                try:
+                    db.execute(update(RenderJob).where(RenderJob.celery_task_id == job_id).values(status='completed'))
+                    db.commit()
+                finally:
+                    db.close()
+                progress_publisher.publish(job_id)
+            else:
+                progress_publisher.publish(job_id, 'scene', scene_id, stage='video')
+
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(args.port), '--log-level', 'warning'],
+            env=os.environ.copy(),
+        )
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    requests.get(f'http://127.0.0.1:{args.port}/healthz', timeout=1).raise_for_status()
+                    break
+                except requests.RequestException:
+                    if time.monotonic() > deadline or server.poll() is not None:
+                        raise RuntimeError('API did not start')
+                    time.sleep(0.2)
+            requests.get(f'http://127.0.0.1:{args.port}/v1/renders/{job_ids[0]}').raise_for_status()
+
+            streaming = _run_watchers(args, job_ids, publish, server.pid)
+            cache = redis.Redis.from_url(args.redis_url)
+            cached = _read_throughput(args.port, job_ids, args.reads, args.read_concurrency)
+            uncached = _read_throughput(
+                args.port,
+                job_ids,
+                args.reads,
+                args.read_concurrency,
+                before=lambda job_id: cache.delete(f'opencine:job-status:{job_id}'),
+            )
+        finally:
+            server.terminate()
+            server.wait()
+            if fake is not None:
+                fake.terminate()
+
+    print(json.dumps({'streaming': streaming, 'status_read': {'redis_cache': cached, 'database': uncached}}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
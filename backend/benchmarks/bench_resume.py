@@ -0,0 +1,280 @@
+"""
+Resuming a render job after its worker is killed: what is regenerated, and whether the job finishes.
+
+Runs real Celery workers (solo pool, all queues) against Redis at `--redis-url`, or with `--fakeredis`
+a local fakeredis server process (`pip install "fakeredis[lua]"`, the broker runs Lua scripts), and
+a temporary SQLite database. Stub generators stand in for the models: the screenplay streams
+`--scenes` scenes `--scene-ms` apart, and a keyframe, a dialogue line and a clip take
+`--keyframe-ms`, `--audio-ms` and `--clip-ms`. Every generator call is logged.
+
+The first worker is killed with SIGKILL while it renders clip `--kill-after + 1` (`--kill-during clip`)
+or while the screenplay streams scene `--kill-after + 1` (`--kill-during screenplay`). Once the lost
+task is older than `--visibility-timeout`, a second worker with that broker visibility timeout starts
+and picks up the unacknowledged task and the rest of the queue. Reported: whether the job completed,
+generator calls per stage, the interrupted work that was redone, and artifacts recorded before the
+kill that were generated again (expected: none). Exits non-zero if the job did not complete or a
+recorded artifact was regenerated.
+
+    python -m benchmarks.bench_resume --fakeredis --scenes 6 --kill-after 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from collections import Counter
+from pathlib import Path
+
+_FAKEREDIS = (
+    'import sys; from fakeredis import TcpFakeServer; '
+    "server = TcpFakeServer(('127.0.0.1', int(sys.argv[1])), server_type='redis'); "
+    'server.daemon_threads = True; server.serve_forever()'
+)
+_SCENE_ID = re.compile(r'scene_(\d+)')
+_STAGES = {'keyframe_path': 'keyframe', 'audio_path': 'audio', 'clip_path': 'clip'}
+_KILLED = 'killed'
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _log(log_path: Path, *fields: object) -> None:
+    with log_path.open('a') as handle:
+        handle.write(' '.join(str(field) for field in fields) + '\n')
+
+
+def _read_log(log_path: Path) -> list[list[str]]:
+    if not log_path.exists():
+        return []
+    return [line.split() for line in log_path.read_text().splitlines() if line]
+
+
+def _run_worker(args: argparse.Namespace) -> None:
+    """Worker mode: stub every generator, then consume all queues in this process."""
+    import celery_worker
+    from app.schemas import Scene
+
+    log_path = Path(args.worker)
+
+    def scene_of(path: Path) -> int:
+        return int(_SCENE_ID.search(path.name).group(1))
+
+    def stream_screenplay(prompt: str, use_cache: bool = True):
+        for scene_id in range(1, args.scenes + 1):
+            _log(log_path, 'scene', scene_id, 'start')
+            time.sleep(args.scene_ms / 1000)
+            _log(log_path, 'scene', scene_id, 'done')
+            yield Scene(scene_id=scene_id, visual_prompt=f'shot {scene_id}', dialogue=f'line {scene_id}', shot_type='wide')
+
+    def generate_keyframe(scene_prompt: str, output_path: Path, **kwargs) -> Path:
+        _log(log_path, 'keyframe', scene_of(output_path), 'start')
+        time.sleep(args.keyframe_ms / 1000)
+        output_path.write_bytes(os.urandom(4096))
+        _log(log_path, 'keyframe', scene_of(output_path), 'done')
+        return output_path
+
+    def generate_keyframes(requests, **kwargs) -> list[Path]:
+        return [generate_keyframe(request.scene_prompt, request.output_path) for request in requests]
+
+    def synthesize(text: str, output_path: Path) -> Path:
+        _log(log_path, 'audio', scene_of(output_path), 'start')
+        time.sleep(args.audio_ms / 1000)
+        with wave.open(str(output_path), 'w') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(22050)
+            wav_file.writeframes(bytes(44100))
+        _log(log_path, 'audio', scene_of(output_path), 'done')
+        return output_path
+
+    def synthesize_many(lines, reference_audio=None, reference_text=None) -> list[Path]:
+        return [synthesize(line.text, line.output_path) for line in lines]
+
+    def generate_video(prompt: str, image_path: Path, output_path: Path, **kwargs) -> Path:
+        _log(log_path, 'clip', scene_of(output_path), 'start')
+        time.sleep(args.clip_ms / 1000)
+        output_path.write_bytes(os.urandom(16384))
+        _log(log_path, 'clip', scene_of(output_path), 'done')
+        return output_path
+
+    def render_film(video_clips, audio_tracks, output_path, transition=0.0, sink=None) -> Path:
+        _log(log_path, 'stitch', 0, 'done')
+        sink(b'film')
+        return output_path
+
+    class Upload:
+        url = 's3://bench/final.mp4'
+        bytes_sent = 4
+
+        def write(self, data: bytes) -> None:
+            pass
+
+    celery_worker.director.stream_screenplay = stream_screenplay
+    celery_worker.director.cached_screenplay = lambda prompt: None
+    celery_worker.keyframe_generator.generate_keyframe = generate_keyframe
+    celery_worker.keyframe_generator.generate_keyframes = generate_keyframes
+    celery_worker.audio_generator.synthesize = synthesize
+    celery_worker.audio_generator.synthesize_many = synthesize_many
+    celery_worker.scene_video_generator.generate_video = generate_video
+    celery_worker.probe_duration = lambda path: 2.0
+    celery_worker.stitcher.render_film = render_film
+    celery_worker.s3_uploader.stream = contextlib.contextmanager(lambda bucket, key: (yield Upload()))
+    celery_worker.celery.worker_main(
+        ['worker', '--pool=solo', '--queues=render,gpu,audio', '--loglevel=WARNING', '--without-gossip', '--without-mingle']
+    )
+
+
+def _start_worker(args: argparse.Namespace, log_path: Path, env: dict[str, str]) -> subprocess.Popen:
+    command = [sys.executable, '-m', 'benchmarks.bench_resume', '--worker', str(log_path)]
+    for name in ('scenes', 'scene_ms', 'keyframe_ms', 'audio_ms', 'clip_ms'):
+        command += [f'--{name.replace("_", "-")}', str(getattr(args, name))]
+    return subprocess.Popen(command, env=env)
+
+
+def _job(job_id: str):
+    from app.core.db import SessionLocal
+    from app.models import RenderJob, RenderScene
+
+    db = SessionLocal()
+    try:
+        job = db.query(RenderJob).filter(RenderJob.celery_task_id == job_id).first()
+        scenes = db.query(RenderScene).filter(RenderScene.job_id == job_id).all()
+        return job, scenes
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenes', type=int, default=6)
+    parser.add_argument('--scene-ms', type=float, default=200.0)
+    parser.add_argument('--keyframe-ms', type=float, default=300.0)
+    parser.add_argument('--audio-ms', type=float, default=100.0)
+    parser.add_argument('--clip-ms', type=float, default=1500.0)
+    parser.add_argument('--kill-during', choices=('clip', 'screenplay'), default='clip')
+    parser.add_argument('--kill-after', type=int, default=2, help='clips (or scenes) finished before the kill')
+    parser.add_argument('--visibility-timeout', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=180.0)
+    parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/15')
+    parser.add_argument('--fakeredis', action='store_true')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        _run_worker(args)
+        return
+
+    fake = None
+    if args.fakeredis:
+        redis_port = _free_port()
+        fake = subprocess.Popen([sys.executable, '-c', _FAKEREDIS, str(redis_port)])
+        args.redis_url = f'redis://127.0.0.1:{redis_port}/0'
+        time.sleep(1)
+
+    workers: list[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            DATABASE_URL=f'sqlite:///{Path(tmp) / "bench.db"}',
+            REDIS_URL=args.redis_url,
+            OUTPUT_DIR=str(Path(tmp) / 'outputs'),
+            ARTIFACT_CACHE_ENABLED='false',
+            METRICS_ENABLED='false',
+            ADMISSION_MAX_ACTIVE_JOBS='0',
+            LOG_LEVEL='WARNING',
+        )
+        from app.core.celery_app import celery
+        from app.core.db import Base, SessionLocal, engine
+        from app.models import RenderJob
+
+        Base.metadata.create_all(bind=engine)
+        job_id = 'bench-resume'
+        db = SessionLocal()
+        db.add(RenderJob(celery_task_id=job_id, prompt='bench', status='queued'))
+        db.commit()
+        db.close()
+
+        log_path = Path(tmp) / 'calls.log'
+        stage = 'clip' if args.kill_during == 'clip' else 'scene'
+        try:
+            # The first worker keeps the default visibility timeout, so nothing is redelivered while it lives.
+            workers.append(_start_worker(args, log_path, os.environ.copy()))
+            started = time.perf_counter()
+            celery.send_task('render_video_task', args=('bench',), task_id=job_id)
+            while True:
+                starts = [fields for fields in _read_log(log_path) if fields[0] == stage and fields[2] == 'start']
+                if len(starts) > args.kill_after:
+                    break
+                if time.perf_counter() - started > args.timeout or workers[0].poll() is not None:
+                    raise RuntimeError(f'Worker never reached {stage} {args.kill_after + 1}')
+                time.sleep(0.02)
+            time.sleep(0.05)
+            workers[0].send_signal(signal.SIGKILL)
+            workers[0].wait()
+            killed_at = time.perf_counter()
+            _log(log_path, _KILLED, 0, 'now')
+            _, scenes = _job(job_id)
+            recorded = {(_STAGES[field], scene.scene_id) for scene in scenes for field in _STAGES if getattr(scene, field)}
+
+            # The replacement comes up once the lost task is past the visibility timeout, so its first restore
+            # pass requeues it (later passes only run every ~100 s).
+            time.sleep(args.visibility_timeout + 1)
+            workers.append(
+                _start_worker(
+                    args, log_path, {**os.environ, 'CELERY_VISIBILITY_TIMEOUT_SECONDS': str(args.visibility_timeout)}
+                )
+            )
+            while True:
+                job, scenes = _job(job_id)
+                if job.status in ('completed', 'failed'):
+                    break
+                if time.perf_counter() - started > args.timeout:
+                    break
+                time.sleep(0.2)
+            finished = time.perf_counter()
+        finally:
+            for worker in workers:
+                if worker.poll() is None:
+                    worker.terminate()
+                    worker.wait()
+            if fake is not None:
+                fake.terminate()
+
+        calls = _read_log(log_path)
+        kill_index = next(index for index, fields in enumerate(calls) if fields[0] == _KILLED)
+        done = [(fields[0], int(fields[1])) for fields in calls if fields[2] == 'done']
+        before = {(fields[0], int(fields[1])) for fields in calls[:kill_index] if fields[2] == 'start'}
+        after = [(fields[0], int(fields[1])) for fields in calls[kill_index + 1 :] if fields[2] == 'start']
+        artifacts = ('keyframe', 'audio', 'clip')
+        regenerated = sorted({call for call in after if call in recorded})
+        redone = sorted({call for call in after if call in before and call not in recorded and call[0] in artifacts})
+
+    result = {
+        'scenes': args.scenes,
+        'killed_during': f'{args.kill_during} {args.kill_after + 1}',
+        'job_status': job.status,
+        'scenes_completed': job.scenes_completed,
+        'resume_seconds': round(finished - killed_at, 2),
+        'generator_calls': dict(Counter(name for name, _ in done)),
+        'recorded_before_kill': len(recorded),
+        'interrupted_work_redone': [f'{name} {scene_id}' for name, scene_id in redone],
+        'recorded_artifacts_regenerated': [f'{name} {scene_id}' for name, scene_id in regenerated],
+    }
+    print(json.dumps(result, indent=2))
+    if job.status != 'completed' or regenerated:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Wall-clock and disk bytes written per stitching mode on synthetic clips.
+
+Generates `--clips` test-pattern clips (H.264, 24 fps) and matching sine-tone dialogue WAVs with
+ffmpeg, then times:
+
+- `single_pass`: crossfade, dialogue timeline and mux in one filter graph
+- `concat_copy`: hard cuts via the concat demuxer with the video stream copied
+
+    python -m benchmarks.bench_stitch --clips 8 --seconds 4 --size 1280x720
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import ffmpeg
+
+from app.services.stitcher import Stitcher
+
+
+def make_clips(work_dir: Path, clips: int, seconds: float, size: str) -> tuple[list[Path], list[Path]]:
+    videos, audios = [], []
+    for idx in range(clips):
+        video = work_dir / f'clip_{idx:03d}.mp4'
+        audio = work_dir / f'line_{idx:03d}.wav'
+        (
+            ffmpeg.input(f'testsrc2=size={size}:rate=24:duration={seconds}', format='lavfi')
+            .output(str(video), vcodec='libx264', pix_fmt='yuv420p', preset='veryfast')
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        (
+            ffmpeg.input(f'sine=frequency={220 + 40 * idx}:duration={seconds / 2}', format='lavfi')
+            .output(str(audio), ar=22050, ac=1)
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        videos.append(video)
+        audios.append(audio)
+    return videos, audios
+
+
+def _measure(run, outputs: list[Path]) -> dict[str, float]:
+    started = time.perf_counter()
+    run()
+    return {
+        'wall_seconds': round(time.perf_counter() - started, 2),
+        'bytes_written': sum(path.stat().st_size for path in outputs if path.exists()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clips', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=4.0)
+    parser.add_argument('--size', default='1280x720')
+    args = parser.parse_args()
+
+    stitcher = Stitcher()
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        videos, audios = make_clips(work_dir, args.clips, args.seconds, args.size)
+        results = {}
+
+        single = work_dir / 'single_pass.mp4'
+        results['single_pass'] = _measure(lambda: stitcher.render_film(videos, audios, single, transition=0.5), [single])
+        copied = work_dir / 'concat_copy.mp4'
+        results['concat_copy'] = _measure(lambda: stitcher.render_film(videos, audios, copied, transition=0), [copied])
+
+    print(json.dumps({'clips': args.clips, 'seconds_per_clip': args.seconds, 'size': args.size, **results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
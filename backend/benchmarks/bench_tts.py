@@ -0,0 +1,145 @@
+"""
+Dialogue throughput (seconds of audio per wall-second), one line at a time vs `synthesize_many`.
+
+A stub F5-TTS engine stands in for the model. Encoding the reference voice costs `--voice-ms`. A
+sampling run over K lines costs `32 * --step-ms * (1 + (K - 1) * --marginal)` scaled by the longest
+line (reference included) over 10 s, i.e. each extra line in a batch costs `marginal` of a single
+line. Vocoding costs `--vocode-ms` per second of audio. The previous path encoded the reference on
+every call (as `F5TTS.infer` does) and sampled one line per run. The silence fallback is measured
+the same way, against the previous per-line writer that allocated a fresh buffer for every line.
+The artifact cache is off.
+
+    python -m benchmarks.bench_tts --lines 24 --step-ms 15 --marginal 0.3 --batch 8
+"""
+
+from __future__ import annotations
+
+import os
+
+os.environ.setdefault('ARTIFACT_CACHE_ENABLED', 'false')
+
+import argparse
+import json
+import random
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from app.core.artifact_cache import artifact_cache
+from app.services.audio_gen import DialogueAudioGenerator, DialogueLine, Voice
+
+_CHARS_PER_SECOND = 15
+_REFERENCE_SECONDS = 6.0
+_HOP_LENGTH = 256
+
+
+class StubEngine:
+    sample_rate = 24000
+    max_frames = 4096
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+
+    def encode_voice(self, reference_audio: str, reference_text: str) -> Voice:
+        time.sleep(self.args.voice_ms / 1000)
+        frames = int(_REFERENCE_SECONDS * self.sample_rate / _HOP_LENGTH)
+        return Voice(cond=None, text=reference_text or 'reference', frames=frames, rms=0.1, reference_audio=reference_audio)
+
+    def frames_for(self, voice: Voice, text: str) -> int:
+        return voice.frames + int(len(text) / _CHARS_PER_SECOND * self.sample_rate / _HOP_LENGTH)
+
+    def generate(self, voice: Voice, texts: list[str]) -> list[np.ndarray]:
+        longest = max(self.frames_for(voice, text) for text in texts) * _HOP_LENGTH / self.sample_rate
+        time.sleep(32 * self.args.step_ms / 1000 * (1 + (len(texts) - 1) * self.args.marginal) * longest / 10)
+        waves = []
+        for text in texts:
+            seconds = len(text) / _CHARS_PER_SECOND
+            time.sleep(self.args.vocode_ms / 1000 * seconds)
+            waves.append(np.zeros(int(seconds * self.sample_rate), dtype=np.float32))
+        return waves
+
+    def generate_long(self, voice: Voice, text: str) -> np.ndarray:
+        return self.generate(voice, [text])[0]
+
+
+def _lines(count: int, work_dir: Path, prefix: str) -> list[DialogueLine]:
+    rng = random.Random(0)
+    words = ['the', 'city', 'never', 'sleeps', 'tonight', 'we', 'run', 'before', 'dawn', 'breaks', 'over', 'neon']
+    return [
+        DialogueLine(' '.join(rng.choice(words) for _ in range(rng.randint(8, 40))), work_dir / f'{prefix}_{index:03d}.wav')
+        for index in range(count)
+    ]
+
+
+def _audio_seconds(paths: list[Path]) -> float:
+    total = 0.0
+    for path in paths:
+        with wave.open(str(path)) as wav_file:
+            total += wav_file.getnframes() / wav_file.getframerate()
+    return total
+
+
+def _per_line_f5(engine: StubEngine, lines: list[DialogueLine]) -> list[Path]:
+    for line in lines:
+        voice = engine.encode_voice('reference.wav', 'reference')
+        samples = engine.generate(voice, [line.text])[0]
+        DialogueAudioGenerator._write_wav(line.output_path, (samples * 32767).astype(np.int16), engine.sample_rate)
+    return [line.output_path for line in lines]
+
+
+def _per_line_silence(lines: list[DialogueLine]) -> list[Path]:
+    for line in lines:
+        artifact_cache.key_for('dialogue', 'silence', {'text': line.text, 'sample_rate': 22050}, {})
+        duration = max(2, min(15, len(line.text) // 12))
+        DialogueAudioGenerator._write_wav(line.output_path, np.zeros(22050 * duration, dtype=np.int16), 22050)
+    return [line.output_path for line in lines]
+
+
+def _measure(run, lines: list[DialogueLine]) -> dict[str, float]:
+    started = time.perf_counter()
+    paths = run(lines)
+    elapsed = time.perf_counter() - started
+    seconds = _audio_seconds(paths)
+    return {
+        'audio_seconds': round(seconds, 1),
+        'wall_seconds': round(elapsed, 3),
+        'audio_seconds_per_wall_second': round(seconds / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=24)
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--voice-ms', type=float, default=150.0)
+    parser.add_argument('--step-ms', type=float, default=15.0)
+    parser.add_argument('--marginal', type=float, default=0.3)
+    parser.add_argument('--vocode-ms', type=float, default=5.0, help='per second of audio')
+    args = parser.parse_args()
+
+    engine = StubEngine(args)
+    results: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        batched = DialogueAudioGenerator(engine=engine, batch_size=args.batch)
+        silence = DialogueAudioGenerator(batch_size=args.batch)
+        silence._initialized = True
+        results['f5'] = {
+            'per_line': _measure(lambda lines: _per_line_f5(engine, lines), _lines(args.lines, work_dir, 'f5_single')),
+            'synthesize_many': _measure(
+                lambda lines: batched.synthesize_many(lines, 'reference.wav', 'reference'),
+                _lines(args.lines, work_dir, 'f5_batch'),
+            ),
+        }
+        results['silence'] = {
+            'per_line': _measure(_per_line_silence, _lines(args.lines, work_dir, 'silence_single')),
+            'synthesize_many': _measure(silence.synthesize_many, _lines(args.lines, work_dir, 'silence_batch')),
+        }
+    print(json.dumps({'lines': args.lines, 'batch': args.batch, **results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Time from "stitching starts" to "film is in S3", encoding then uploading vs streaming the upload.
+
+Renders synthetic clips with `bench_stitch.make_clips`, then compares:
+
+- `encode_then_upload`: write `final.mp4`, then `upload_file` it (the previous behaviour)
+- `streaming`: fragmented MP4 piped into `S3Uploader.stream` while ffmpeg encodes
+
+Uploads go to `--endpoint-url` (MinIO or any S3-compatible store) or, with `--moto`, to an in-process
+moto server (`pip install 'moto[server]'`). `--mbps` throttles request bodies to emulate a real uplink.
+
+    python -m benchmarks.bench_upload --moto --clips 8 --seconds 4 --size 1280x720 --mbps 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import boto3
+from botocore.config import Config
+
+from app.core.s3_uploader import S3Uploader
+from app.services.stitcher import Stitcher
+from benchmarks.bench_stitch import make_clips
+
+_MIB = 1024 * 1024
+
+
+def _client(endpoint_url: str, mbps: float):
+    client = boto3.client(
+        's3',
+        endpoint_url=endpoint_url,
+        region_name='us-east-1',
+        aws_access_key_id='bench',
+        aws_secret_access_key='bench',
+        config=Config(max_pool_connections=16),
+    )
+
+    def throttle(request, **_):
+        size = int(request.headers.get('Content-Length', 0))
+        if size and mbps:
+            time.sleep(size * 8 / (mbps * 1_000_000))
+
+    client.meta.events.register('before-send.s3.*', throttle)
+    return client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clips', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=4.0)
+    parser.add_argument('--size', default='1280x720')
+    parser.add_argument('--endpoint-url', default='http://127.0.0.1:9000')
+    parser.add_argument('--bucket', default='opencine-bench')
+    parser.add_argument('--moto', action='store_true')
+    parser.add_argument('--mbps', type=float, default=200.0)
+    parser.add_argument('--part-size-mb', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    server = None
+    if args.moto:
+        from moto.server import ThreadedMotoServer
+
+        server = ThreadedMotoServer(port=0)
+        server.start()
+        host, port = server.get_host_and_port()
+        args.endpoint_url = f'http://{host}:{port}'
+
+    client = _client(args.endpoint_url, args.mbps)
+    client.create_bucket(Bucket=args.bucket)
+    stitcher = Stitcher()
+    uploader = S3Uploader(part_size=args.part_size_mb * _MIB, max_concurrency=args.concurrency, client=client)
+    results: dict[str, dict] = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        videos, audios = make_clips(work_dir, args.clips, args.seconds, args.size)
+
+        started = time.perf_counter()
+        final = stitcher.render_film(videos, audios, work_dir / 'sequential.mp4', transition=0.5)
+        encoded = time.perf_counter()
+        client.upload_file(str(final), args.bucket, 'sequential.mp4')
+        done = time.perf_counter()
+        results['encode_then_upload'] = {
+            'total_seconds': round(done - started, 2),
+            'upload_tail_seconds': round(done - encoded, 2),
+            'bytes': final.stat().st_size,
+        }
+
+        started = time.perf_counter()
+        with uploader.stream(args.bucket, 'streaming.mp4') as upload:
+            final = stitcher.render_film(videos, audios, work_dir / 'streaming.mp4', transition=0.5, sink=upload.write)
+            encoded = time.perf_counter()
+        done = time.perf_counter()
+        results['streaming'] = {
+            'total_seconds': round(done - started, 2),
+            'upload_tail_seconds': round(done - encoded, 2),
+            'bytes': final.stat().st_size,
+        }
+
+    if server is not None:
+        server.stop()
+    print(json.dumps({'clips': args.clips, 'size': args.size, 'mbps': args.mbps, **results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Peak RSS and time-to-file for exporting a generated clip, materialised vs streamed into ffmpeg.
+
+A fake pipeline "decodes" synthetic frames window by window (sleeping `--decode-ms` per frame to stand
+in for the VAE). Modes, each run in a fresh subprocess so peak RSS is measured independently:
+
+- `materialized`: collect every frame as float32 (the pipeline's post-processed output), convert the
+  whole clip to uint8, then encode it (the previous `export_to_video` path)
+- `streaming`: hand each uint8 frame to `FrameWriter` as soon as its window is decoded
+
+    python -m benchmarks.bench_video_export --frames 129 --size 1280x720 --window 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+
+from app.services.frame_export import FrameWriter
+
+
+def fake_decode(frames: int, width: int, height: int, window: int, decode_ms: float) -> Iterator[np.ndarray]:
+    """Yield float32 HxWx3 frames in [0, 1], one decode window at a time."""
+    # Moving noise keeps the encoder honest; a flat gradient compresses to almost nothing.
+    texture = np.random.default_rng(0).random((height, width, 3), dtype=np.float32)
+    for start in range(0, frames, window):
+        count = min(window, frames - start)
+        time.sleep(count * decode_ms / 1000)
+        for idx in range(start, start + count):
+            yield np.roll(texture, idx * 8, axis=1)
+
+
+def _to_uint8(frame: np.ndarray) -> np.ndarray:
+    return (frame * 255).round().astype(np.uint8)
+
+
+def run_mode(mode: str, frames: int, width: int, height: int, window: int, decode_ms: float) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / f'{mode}.mp4'
+        started = time.perf_counter()
+        writer = FrameWriter(output, width=width, height=height, fps=24)
+        if mode == 'materialized':
+            decoded = list(fake_decode(frames, width, height, window, decode_ms))
+            for frame in [_to_uint8(frame) for frame in decoded]:
+                writer.write(frame)
+        else:
+            for frame in fake_decode(frames, width, height, window, decode_ms):
+                writer.write(_to_uint8(frame))
+        writer.close()
+        elapsed = time.perf_counter() - started
+        size = output.stat().st_size
+    return {
+        'time_to_file_seconds': round(elapsed, 2),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'bytes': size,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=129)
+    parser.add_argument('--size', default='1280x720')
+    parser.add_argument('--window', type=int, default=32, help='frames per simulated VAE decode window')
+    parser.add_argument('--decode-ms', type=float, default=10.0)
+    parser.add_argument('--mode', choices=['materialized', 'streaming'])
+    args = parser.parse_args()
+    width, height = (int(value) for value in args.size.split('x'))
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.frames, width, height, args.window, args.decode_ms)))
+        return
+
+    results = {}
+    for mode in ('materialized', 'streaming'):
+        child = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_video_export', '--mode', mode, *sys.argv[1:]],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results[mode] = json.loads(child.stdout)
+    print(json.dumps({'frames': args.frames, 'size': args.size, **results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
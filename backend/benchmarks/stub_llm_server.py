@@ -0,0 +1,135 @@
+"""
+Local stand-in for the external screenplay LLM endpoint.
+
+Speaks the same protocol as `LLM_API_URL`: `{"prompt": ...}` returns `{"text": ...}`, `"stream": true`
+returns the text as a chunked `text/plain` body one scene at a time, and `{"prompts": [...]}` returns
+`{"texts": [...]}`. Latency, per-scene streaming delay and an injected 429/503 rate are configurable.
+
+    python -m benchmarks.stub_llm_server --port 8089 --latency 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def screenplay_text(prompt: str, scenes: int) -> str:
+    shots = ['wide', 'medium', 'close-up']
+    body = [
+        {
+            'scene_id': idx,
+            'visual_prompt': f'Scene {idx} of: {prompt[-80:]}',
+            'dialogue': f'Line {idx}: the story continues.',
+            'shot_type': shots[idx % len(shots)],
+        }
+        for idx in range(1, scenes + 1)
+    ]
+    return json.dumps(body)
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server: 'StubLLMServer'
+
+    def log_message(self, format: str, *args) -> None:
+        return
+
+    def _send_json(self, status: int, payload: dict, headers: dict[str, str] | None = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self.server.record_request(payload)
+
+        if random.random() < self.server.fail_rate:
+            status = random.choice([429, 503])
+            self._send_json(status, {'error': 'injected failure'}, {'Retry-After': '0'})
+            return
+
+        time.sleep(self.server.latency)
+        if 'prompts' in payload:
+            texts = [screenplay_text(prompt, self.server.scenes) for prompt in payload['prompts']]
+            self._send_json(200, {'texts': texts})
+            return
+
+        text = screenplay_text(payload.get('prompt', ''), self.server.scenes)
+        if not payload.get('stream'):
+            self._send_json(200, {'text': text})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        scenes = json.loads(text)
+        pieces = ['['] + [json.dumps(scene) + (',' if idx < len(scenes) - 1 else '') for idx, scene in enumerate(scenes)] + [']']
+        for piece in pieces:
+            data = piece.encode()
+            self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+            self.wfile.flush()
+            time.sleep(self.server.scene_delay)
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.2,
+        scene_delay: float = 0.05,
+        scenes: int = 6,
+        fail_rate: float = 0.0,
+    ) -> None:
+        super().__init__(('127.0.0.1', port), StubLLMHandler)
+        self.latency = latency
+        self.scene_delay = scene_delay
+        self.scenes = scenes
+        self.fail_rate = fail_rate
+        self.requests_served = 0
+        self.prompts_served = 0
+        self._counter_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/generate'
+
+    def record_request(self, payload: dict) -> None:
+        with self._counter_lock:
+            self.requests_served += 1
+            self.prompts_served += len(payload.get('prompts', [None]))
+
+    def start_background(self) -> 'StubLLMServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds before the first byte')
+    parser.add_argument('--scene-delay', type=float, default=0.05, help='seconds between streamed scenes')
+    parser.add_argument('--scenes', type=int, default=6)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of requests answered with 429/503')
+    args = parser.parse_args()
+    server = StubLLMServer(args.port, args.latency, args.scene_delay, args.scenes, args.fail_rate)
+    print(f'Stub LLM endpoint listening on {server.url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
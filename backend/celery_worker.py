@@ -1,81 +1,822 @@
 from __future__ import annotations
 
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import logging
+import os
+import threading
 import uuid
+from collections.abc import Collection, Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
-import boto3
-from celery import Celery
+from botocore.exceptions import BotoCoreError, ClientError
+from celery import chord
+from celery.signals import task_failure, task_postrun, task_prerun, worker_init, worker_process_init
+from celery.worker.control import inspect_command
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
 
+from app.core.admission import admission_controller
+from app.core.artifact_cache import CacheStats, artifact_cache, inflight_requests
+from app.core.celery_app import celery
 from app.core.config import get_settings
 from app.core.db import SessionLocal
-from app.models import RenderJob
-from app.services.audio_gen import audio_generator
-from app.services.image_gen import keyframe_generator
+from app.core.job_status import ARTIFACT_FIELDS, CHECKSUM_FIELDS, artifact_ready, job_status_writer, missing_inputs
+from app.core.memory_manager import model_manager
+from app.core.metrics import persist_job_summary, span
+from app.core.phase_scheduler import GpuUsage, phase_scheduler
+from app.core.progress import TERMINAL_STATUSES, progress_publisher
+from app.core.presets import get_preset
+from app.core.s3_uploader import s3_uploader
+from app.models import RenderJob, RenderScene
+from app.schemas import Scene
+from app.services.audio_gen import DialogueLine, audio_generator
+from app.services.face_embeddings import face_embedding_cache
+from app.services.image_gen import KeyframeRequest, keyframe_generator
 from app.services.llm_script import director
 from app.services.stitcher import stitcher
+from app.services.timeline import probe_duration
 from app.services.video_gen import scene_video_generator
 
 settings = get_settings()
 logging.basicConfig(level=settings.log_level)
 logger = logging.getLogger(__name__)
 
-celery = Celery('opencine', broker=settings.redis_url, backend=settings.redis_url)
+_startup: dict[str, float | str | None] = {
+    'import_seconds': round(time.perf_counter() - _IMPORT_STARTED, 3),
+    'prewarm_seconds': None,
+    'first_task_wait_seconds': None,
+    'first_task_seconds': None,
+    'first_task_name': None,
+}
+_startup_lock = threading.Lock()
+_ready_at: float | None = None
+_first_task_started: dict[str, float] = {}
+logger.info('Worker modules imported in %.2fs', _startup['import_seconds'])
+
+_SCENE_MAX_RETRIES = 3
+_UPLOAD_MAX_RETRIES = 3
+_ARTIFACT_STAGES = {'keyframe_path': 'keyframe', 'audio_path': 'audio', 'clip_path': 'video'}
+# Tasks whose first argument is the job id; render_video_task runs under the job id itself.
+_JOB_TASKS = (
+    'upgrade_render_task',
+    'retry_render_task',
+    'dispatch_clips_task',
+    'render_keyframe_task',
+    'render_keyframes_task',
+    'render_clip_task',
+    'synthesize_audio_task',
+    'synthesize_audio_batch_task',
+    'stitch_render_task',
+)
+
+
+@inspect_command()
+def model_stats(state) -> dict:
+    """`celery -A worker.celery inspect model_stats`: GPU phase and model swap counters per worker."""
+    return phase_scheduler.stats()
+
+
+@inspect_command()
+def face_embedding_stats(state) -> dict:
+    """`celery -A worker.celery inspect face_embedding_stats`: face embedding cache hits and time saved."""
+    return face_embedding_cache.stats()
+
+
+@inspect_command()
+def coalesce_stats(state) -> dict:
+    """`celery -A worker.celery inspect coalesce_stats`: requests coalesced with identical in-flight ones."""
+    return inflight_requests.stats()
+
+
+@inspect_command()
+def startup_stats(state) -> dict:
+    """`celery -A worker.celery inspect startup_stats`: import, prewarm and first-task timings."""
+    return dict(_startup)
+
+
+def _prewarm() -> None:
+    """Load and pin the configured models so the first task does not pay for them."""
+    global _ready_at
+    started = time.perf_counter()
+    for name in settings.worker_prewarm_models:
+        model_started = time.perf_counter()
+        if name == 'tts':
+            audio_generator.warm()
+        elif name == 'llm':
+            director.warm()
+        else:
+            model_manager.load_model(name)
+        logger.info('Prewarmed %s in %.2fs', name, time.perf_counter() - model_started)
+    _startup['prewarm_seconds'] = round(time.perf_counter() - started, 3)
+    _ready_at = time.perf_counter()
+    logger.info('Worker prewarm complete in %.2fs', _startup['prewarm_seconds'])
+
+
+@worker_process_init.connect
+def _prewarm_prefork_child(**kwargs) -> None:
+    # CUDA state cannot cross fork(), so prefork children warm themselves before taking tasks.
+    _prewarm()
+
 
+@worker_init.connect
+def _prewarm_worker(sender=None, **kwargs) -> None:
+    if sender is not None and 'prefork' in str(getattr(sender, 'pool_cls', '')).lower():
+        return
+    _prewarm()
 
-def _update_status(task_id: str, status: str, output_url: str | None = None) -> None:
+
+@task_prerun.connect
+def _time_first_task_start(task_id=None, task=None, **kwargs) -> None:
+    with _startup_lock:
+        if _first_task_started or _startup['first_task_seconds'] is not None:
+            return
+        _first_task_started[task_id] = time.perf_counter()
+        if _ready_at is not None:
+            _startup['first_task_wait_seconds'] = round(_first_task_started[task_id] - _ready_at, 3)
+        _startup['first_task_name'] = task.name if task else None
+
+
+@task_postrun.connect
+def _time_first_task_end(task_id=None, **kwargs) -> None:
+    with _startup_lock:
+        started = _first_task_started.pop(task_id, None)
+        if started is None:
+            return
+        _startup['first_task_seconds'] = round(time.perf_counter() - started, 3)
+    logger.info('First task %s finished in %.2fs', _startup['first_task_name'], _startup['first_task_seconds'])
+
+
+def _update_status(
+    task_id: str,
+    status: str,
+    output_url: str | None = None,
+    only_from: tuple[str, ...] | None = None,
+) -> bool:
+    if not job_status_writer.set_status(task_id, status, output_url, only_from):
+        return False
+    if status in ('completed', 'failed'):
+        try:
+            persist_job_summary(task_id)
+        except Exception:
+            logger.exception('Could not store stage metrics for job=%s', task_id)
+    progress_publisher.publish(task_id)
+    if status in ('completed', 'failed'):
+        # The job's render slot is free; let the next fair-share pick in.
+        try:
+            for admitted_id in admission_controller.admit():
+                progress_publisher.publish(admitted_id)
+        except Exception:
+            logger.exception('Admission pass failed after job=%s finished', task_id)
+    return True
+
+
+@task_failure.connect
+def _fail_job_on_task_failure(sender=None, task_id=None, args=None, **kwargs) -> None:
+    # A task of a job that fails for good fails the job, so it cannot hold its admission slot forever.
+    name = getattr(sender, 'name', None)
+    if name == 'render_video_task':
+        job_id = task_id
+    elif name in _JOB_TASKS and args:
+        job_id = args[0]
+    else:
+        return
+    try:
+        if _get_job(job_id).status in TERMINAL_STATUSES:
+            return
+        logger.error('Task %s failed for job=%s; marking the job failed', name, job_id)
+        _update_status(job_id, 'failed')
+    except Exception:
+        logger.exception('Could not mark job=%s failed after %s failed', job_id, name)
+
+
+def _get_job(job_id: str) -> RenderJob:
     db = SessionLocal()
     try:
-        job = db.query(RenderJob).filter(RenderJob.celery_task_id == task_id).first()
+        job = db.query(RenderJob).filter(RenderJob.celery_task_id == job_id).first()
         if not job:
-            return
-        job.status = status
-        if output_url:
-            job.output_url = output_url
+            raise LookupError(f'Render job not found: {job_id}')
+        return job
+    finally:
+        db.close()
+
+
+def _get_scene(job_id: str, scene_id: int) -> RenderScene:
+    db = SessionLocal()
+    try:
+        scene = (
+            db.query(RenderScene)
+            .filter(RenderScene.job_id == job_id, RenderScene.scene_id == scene_id)
+            .first()
+        )
+        if not scene:
+            raise LookupError(f'Scene {scene_id} not found for render job {job_id}')
+        return scene
+    finally:
+        db.close()
+
+
+def _start_screenplay(job_id: str, work_dir: Path) -> None:
+    """
+    Mark the job's screenplay as streaming. Scenes left by an interrupted stream are kept until
+    `_finish_screenplay`, so the ones the new stream repeats keep their artifacts.
+    """
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(RenderJob)
+            .where(RenderJob.celery_task_id == job_id)
+            .values(work_dir=str(work_dir), scenes_total=0, screenplay_complete=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _save_scene(job_id: str, scene: Scene) -> RenderScene:
+    """
+    Store a streamed scene and return its row. A row left by an interrupted run is reused as is when
+    the scene's text is unchanged; otherwise it is overwritten and its artifacts are discarded.
+    """
+    text = {'visual_prompt': scene.visual_prompt, 'dialogue': scene.dialogue, 'shot_type': scene.shot_type}
+    db = SessionLocal()
+    try:
+        stored = (
+            db.query(RenderScene)
+            .filter(RenderScene.job_id == job_id, RenderScene.scene_id == scene.scene_id)
+            .first()
+        )
+        if stored is None:
+            stored = RenderScene(job_id=job_id, scene_id=scene.scene_id, **text)
+            db.add(stored)
+        elif any(getattr(stored, name) != value for name, value in text.items()):
+            logger.info('Scene %s of job=%s changed since the last run; re-rendering it', scene.scene_id, job_id)
+            for name, value in text.items():
+                setattr(stored, name, value)
+            for field in ARTIFACT_FIELDS:
+                setattr(stored, field, None)
+                setattr(stored, CHECKSUM_FIELDS[field], None)
+            stored.status, stored.attempts = 'pending', 0
+        db.execute(
+            update(RenderJob)
+            .where(RenderJob.celery_task_id == job_id)
+            .values(scenes_total=RenderJob.scenes_total + 1)
+        )
+        db.commit()
+        db.refresh(stored)
+    except IntegrityError:
+        # A duplicate delivery of the render task stored the scene first.
+        db.rollback()
+        stored = _get_scene(job_id, scene.scene_id)
+    finally:
+        db.close()
+    progress_publisher.publish(job_id, 'scene', scene.scene_id, stage='screenplay')
+    return stored
+
+
+def _finish_screenplay(job_id: str, scene_ids: Collection[int]) -> None:
+    """Drop scenes an interrupted run stored that the screenplay no longer has, and recount the job."""
+    db = SessionLocal()
+    try:
+        db.query(RenderScene).filter(RenderScene.job_id == job_id, RenderScene.scene_id.not_in(scene_ids)).delete(
+            synchronize_session=False
+        )
+        completed = (
+            select(func.count())
+            .select_from(RenderScene)
+            .where(RenderScene.job_id == job_id, RenderScene.status == 'completed')
+            .scalar_subquery()
+        )
+        db.execute(
+            update(RenderJob)
+            .where(RenderJob.celery_task_id == job_id)
+            .values(
+                screenplay_complete=True,
+                status='rendering',
+                scenes_total=len(scene_ids),
+                scenes_completed=completed,
+            )
+        )
         db.commit()
     finally:
         db.close()
+    progress_publisher.publish(job_id)
+
+
+def _record_scene_artifacts(
+    job_id: str,
+    field: str,
+    paths: dict[int, str],
+    cache_stats: CacheStats | None = None,
+    gpu_usage: GpuUsage | None = None,
+) -> None:
+    """
+    Store finished artifacts of one kind for scenes of a job with their checksums, along with the
+    task's cache and GPU usage.
+    """
+    job_status_writer.record_artifacts(
+        job_id,
+        field,
+        paths,
+        cache_stats=cache_stats,
+        gpu_seconds=gpu_usage.seconds if gpu_usage else 0.0,
+        checksums={scene_id: artifact_cache.hash_input(path) for scene_id, path in paths.items()},
+    )
+    progress_publisher.publish_scenes(job_id, paths, stage=_ARTIFACT_STAGES[field])
+
+
+def _mark_scene_attempt(job_id: str, scene_id: int, status: str) -> None:
+    job_status_writer.mark_scenes(job_id, [scene_id], status)
+    progress_publisher.publish(job_id, 'scene', scene_id)
+
+
+def _retry_or_fail(task, job_id: str, scene_id: int, exc: Exception):
+    logger.exception('Scene task failed job=%s scene_id=%s', job_id, scene_id)
+    _mark_scene_attempt(job_id, scene_id, 'failed')
+    if task.request.retries < _SCENE_MAX_RETRIES:
+        raise task.retry(exc=exc, countdown=30 * 2**task.request.retries)
+    _update_status(job_id, 'failed')
+    raise exc
+
+
+def _record_gpu_usage(job_id: str, usage: GpuUsage | None) -> None:
+    # None when the task failed before the scheduler started tracking its GPU time.
+    if usage is None:
+        return
+    job_status_writer.add_usage(job_id, gpu_seconds=usage.seconds)
+
+
+def _job_work_dir(job_id: str) -> Path:
+    """The job's artifact directory, named after the job so a re-delivered task finds earlier work."""
+    work_dir = Path(settings.output_dir) / job_id
+    work_dir.mkdir(parents=True, exist_ok=True)
+    return work_dir
+
+
+@contextmanager
+def _staged(paths: list[Path]) -> Iterator[list[Path]]:
+    """
+    Hidden sibling paths to render `paths` into, renamed over them only if the block succeeds.
+
+    A file under an artifact's real name is therefore always complete, even when the worker is
+    killed mid-write; an aborted block removes what it staged.
+    """
+    token = uuid.uuid4().hex[:8]
+    staged = [path.with_name(f'.{path.stem}.{token}{path.suffix}') for path in paths]
+    try:
+        yield staged
+    except BaseException:
+        for path in staged:
+            path.unlink(missing_ok=True)
+        raise
+    for staged_path, path in zip(staged, paths):
+        os.replace(staged_path, path)
+
+
+def _scene_seed(job: RenderJob, scene_id: int) -> int | None:
+    return None if job.seed is None else job.seed + scene_id
+
+
+def _load_scenes(job_id: str) -> list[RenderScene]:
+    db = SessionLocal()
+    try:
+        return db.query(RenderScene).filter(RenderScene.job_id == job_id).order_by(RenderScene.scene_id).all()
+    finally:
+        db.close()
+
+
+def _dispatch_scene_inputs(job_id: str, scene: RenderScene) -> int:
+    """Queue the phase-one (keyframe and audio) tasks a scene still needs."""
+    missing = missing_inputs(scene)
+    if 'keyframe_path' in missing:
+        render_keyframe_task.delay(job_id, scene.scene_id)
+    if 'audio_path' in missing:
+        synthesize_audio_task.delay(job_id, scene.scene_id)
+    return len(missing)
+
+
+def _advance_to_clips_if_ready(job_id: str) -> bool:
+    """
+    Start the clip phase once the screenplay is complete and every scene has its keyframe and audio.
+
+    Called by each keyframe/audio task on success and by the orchestrator; the claim is a single
+    conditional update, so exactly one caller dispatches the clip phase.
+    """
+    if not job_status_writer.claim_clip_phase(job_id):
+        return False
+    progress_publisher.publish(job_id)
+    dispatch_clips_task.delay(job_id)
+    return True
+
+
+def _dispatch_scenes(job_id: str) -> int:
+    """
+    Fan out the unfinished scenes of a stored screenplay, grouped into model phases.
+
+    Phase one renders every pending keyframe (Flux) on the GPU queue alongside dialogue synthesis of
+    all pending lines in one batched task on the audio queue; when the last of those finishes, phase two renders every pending clip (Hunyuan)
+    and its chord callback stitches and uploads. Ordering the work by model instead of by scene lets
+    a GPU worker keep one pipeline resident for a whole phase rather than swapping twice per scene.
+    Scenes whose recorded artifacts are still intact are left out, so retrying or resuming a job never
+    re-renders completed work.
+    """
+    # A duplicate or late delivery must not pull a failed, completed or clip-phase job back to `rendering`.
+    if not _update_status(job_id, 'rendering', only_from=('processing', 'queued')):
+        status = _get_job(job_id).status
+        if status != 'rendering':
+            logger.info('Not dispatching scenes for job=%s in status=%s', job_id, status)
+            return 0
+    dispatched = 0
+    keyframe_scene_ids: list[int] = []
+    audio_scene_ids: list[int] = []
+    for scene in _load_scenes(job_id):
+        missing = missing_inputs(scene)
+        if 'keyframe_path' in missing:
+            keyframe_scene_ids.append(scene.scene_id)
+        if 'audio_path' in missing:
+            audio_scene_ids.append(scene.scene_id)
+    if audio_scene_ids:
+        synthesize_audio_batch_task.delay(job_id, audio_scene_ids)
+        dispatched += 1
+    # Every scene is known here, so keyframes go out in batches the generator can render per Flux pass.
+    batch = settings.keyframe_max_batch
+    for start in range(0, len(keyframe_scene_ids), batch):
+        render_keyframes_task.delay(job_id, keyframe_scene_ids[start : start + batch])
+        dispatched += 1
+    logger.info('Dispatched %s keyframe batch/audio subtasks for job=%s', dispatched, job_id)
+    _advance_to_clips_if_ready(job_id)
+    return dispatched
 
 
 @celery.task(bind=True, name='render_video_task')
-def render_video_task(self, prompt: str, face_reference_image: str | None = None) -> dict[str, str]:
+def render_video_task(
+    self,
+    prompt: str,
+    face_reference_image: str | None = None,
+    bypass_screenplay_cache: bool = False,
+) -> dict[str, str]:
     task_id = self.request.id
+    if _get_job(task_id).screenplay_complete:
+        logger.info('Screenplay already stored for task=%s; resuming scene fan-out', task_id)
+        _dispatch_scenes(task_id)
+        return {'task_id': task_id, 'status': 'rendering'}
+
     _update_status(task_id, 'processing')
 
-    run_id = uuid.uuid4().hex[:10]
-    work_dir = Path(settings.output_dir) / run_id
-    work_dir.mkdir(parents=True, exist_ok=True)
+    work_dir = _job_work_dir(task_id)
     logger.info('Starting render task=%s work_dir=%s', task_id, work_dir)
+    _start_screenplay(task_id, work_dir)
 
-    scenes = director.generate_screenplay(prompt)
-    video_clips: list[Path] = []
-    audio_tracks: list[Path] = []
+    cached = None if bypass_screenplay_cache else director.cached_screenplay(prompt)
+    if cached:
+        # The whole screenplay is known up front; store it and fan out with batched keyframes.
+        logger.info('Using cached screenplay with %s scenes task=%s', len(cached), task_id)
+        with span('screenplay', task_id, detail='cached'):
+            scene_ids = {_save_scene(task_id, scene).scene_id for scene in cached}
+        _finish_screenplay(task_id, scene_ids)
+        _dispatch_scenes(task_id)
+        return {'task_id': task_id, 'status': 'rendering'}
 
-    for scene in scenes:
-        logger.info('Processing scene_id=%s', scene.scene_id)
-        keyframe_path = work_dir / f'scene_{scene.scene_id:03d}.png'
-        clip_path = work_dir / f'scene_{scene.scene_id:03d}.mp4'
-        audio_path = work_dir / f'scene_{scene.scene_id:03d}.wav'
+    # Dispatch each scene's keyframe and audio as soon as the LLM closes its JSON object, so GPU work
+    # starts while later scenes are still being written. A scene an interrupted run already rendered
+    # dispatches only what it is missing.
+    scene_ids: set[int] = set()
+    try:
+        with span('screenplay', task_id):
+            for scene in director.stream_screenplay(prompt, use_cache=not bypass_screenplay_cache):
+                if scene.scene_id in scene_ids:
+                    logger.warning('Skipping duplicate scene_id=%s in screenplay for job=%s', scene.scene_id, task_id)
+                    continue
+                scene_ids.add(scene.scene_id)
+                dispatched = _dispatch_scene_inputs(task_id, _save_scene(task_id, scene))
+                logger.info(
+                    'Dispatched %s subtasks for scene_id=%s while screenplay is streaming task=%s',
+                    dispatched,
+                    scene.scene_id,
+                    task_id,
+                )
+    except Exception:
+        # LLM errors, an open circuit or a failed local generation: the job can never stitch.
+        logger.exception('Screenplay generation failed task=%s', task_id)
+        _update_status(task_id, 'failed')
+        raise
+
+    if not scene_ids:
+        _update_status(task_id, 'failed')
+        raise ValueError(f'Screenplay for task {task_id} contained no valid scenes')
+
+    _finish_screenplay(task_id, scene_ids)
+    _advance_to_clips_if_ready(task_id)
+    return {'task_id': task_id, 'status': 'rendering'}
+
+
+@celery.task(name='upgrade_render_task')
+def upgrade_render_task(job_id: str) -> dict[str, str]:
+    """Render the scenes copied from a draft job (by `POST /v1/renders/<id>/upgrade`) at the job's preset."""
+    job = _get_job(job_id)
+    if not job.work_dir:
+        db = SessionLocal()
+        try:
+            db.execute(update(RenderJob).where(RenderJob.celery_task_id == job_id).values(work_dir=str(_job_work_dir(job_id))))
+            db.commit()
+        finally:
+            db.close()
+    logger.info('Upgrading %s scenes from job=%s to preset=%s task=%s', job.scenes_total, job.parent_job_id, job.preset, job_id)
+    dispatched = _dispatch_scenes(job_id)
+    return {'task_id': job_id, 'status': 'rendering', 'dispatched': str(dispatched)}
+
+
+@celery.task(name='retry_render_task')
+def retry_render_task(job_id: str) -> dict[str, str]:
+    logger.info('Retrying unfinished scenes for job=%s', job_id)
+    dispatched = _dispatch_scenes(job_id)
+    return {'task_id': job_id, 'status': 'rendering', 'dispatched': str(dispatched)}
 
-        keyframe_generator.generate_keyframe(
-            scene_prompt=scene.visual_prompt,
-            output_path=keyframe_path,
-            face_reference_image=face_reference_image,
-        )
-        scene_video_generator.generate_video(scene.visual_prompt, keyframe_path, clip_path)
-        audio_generator.synthesize(scene.dialogue, audio_path)
 
-        video_clips.append(clip_path)
-        audio_tracks.append(audio_path)
+@celery.task(name='dispatch_clips_task')
+def dispatch_clips_task(job_id: str) -> int:
+    header = [
+        render_clip_task.si(job_id, scene.scene_id)
+        for scene in _load_scenes(job_id)
+        if not artifact_ready(scene, 'clip_path')
+    ]
+    if header:
+        chord(header)(stitch_render_task.si(job_id))
+    else:
+        stitch_render_task.delay(job_id)
+    logger.info('Dispatched %s clip subtasks for job=%s', len(header), job_id)
+    return len(header)
+
+
+@celery.task(bind=True, name='render_keyframe_task', max_retries=_SCENE_MAX_RETRIES)
+def render_keyframe_task(self, job_id: str, scene_id: int) -> str:
+    job = _get_job(job_id)
+    scene = _get_scene(job_id, scene_id)
+    if artifact_ready(scene, 'keyframe_path'):
+        logger.info('Keyframe already rendered job=%s scene_id=%s', job_id, scene_id)
+        _advance_to_clips_if_ready(job_id)
+        return scene.keyframe_path
+
+    _mark_scene_attempt(job_id, scene_id, 'rendering')
+    keyframe_path = Path(job.work_dir) / f'scene_{scene_id:03d}.png'
+    cache_stats: CacheStats | None = None
+    gpu_usage: GpuUsage | None = None
+    try:
+        with (
+            span('keyframe', job_id, scene_id) as stage,
+            artifact_cache.track() as cache_stats,
+            phase_scheduler.track() as gpu_usage,
+            _staged([keyframe_path]) as (staged_path,),
+        ):
+            keyframe_generator.generate_keyframe(
+                scene_prompt=scene.visual_prompt,
+                output_path=staged_path,
+                face_reference_image=job.face_reference_image,
+                seed=_scene_seed(job, scene_id),
+                preset=get_preset(job.preset),
+                shot_type=scene.shot_type,
+            )
+            stage.add_bytes(staged_path)
+    except Exception as exc:
+        _record_gpu_usage(job_id, gpu_usage)
+        _retry_or_fail(self, job_id, scene_id, exc)
+    _record_scene_artifacts(job_id, 'keyframe_path', {scene_id: str(keyframe_path)}, cache_stats, gpu_usage)
+    _advance_to_clips_if_ready(job_id)
+    return str(keyframe_path)
+
+
+@celery.task(name='render_keyframes_task')
+def render_keyframes_task(job_id: str, scene_ids: list[int]) -> list[str]:
+    job = _get_job(job_id)
+    scenes = [
+        scene
+        for scene in _load_scenes(job_id)
+        if scene.scene_id in scene_ids
+        and not artifact_ready(scene, 'keyframe_path')
+        and not artifact_ready(scene, 'clip_path')
+    ]
+    if not scenes:
+        _advance_to_clips_if_ready(job_id)
+        return []
+
+    job_status_writer.mark_scenes(job_id, [scene.scene_id for scene in scenes], 'rendering')
+    progress_publisher.publish_scenes(job_id, [scene.scene_id for scene in scenes])
+    keyframe_paths = [Path(job.work_dir) / f'scene_{scene.scene_id:03d}.png' for scene in scenes]
+    cache_stats: CacheStats | None = None
+    gpu_usage: GpuUsage | None = None
+    try:
+        with (
+            span('keyframe', job_id, detail=f'batch of {len(scenes)}') as stage,
+            artifact_cache.track() as cache_stats,
+            phase_scheduler.track() as gpu_usage,
+            _staged(keyframe_paths) as staged_paths,
+        ):
+            keyframe_generator.generate_keyframes(
+                [
+                    KeyframeRequest(
+                        scene_prompt=scene.visual_prompt,
+                        output_path=staged_path,
+                        seed=_scene_seed(job, scene.scene_id),
+                        shot_type=scene.shot_type,
+                    )
+                    for scene, staged_path in zip(scenes, staged_paths)
+                ],
+                face_reference_image=job.face_reference_image,
+                preset=get_preset(job.preset),
+            )
+            stage.add_bytes(*staged_paths)
+    except Exception:
+        # Fall back to one task per scene, which carries the per-scene retry budget.
+        logger.exception('Batched keyframes failed job=%s scene_ids=%s; retrying per scene', job_id, scene_ids)
+        _record_gpu_usage(job_id, gpu_usage)
+        for scene in scenes:
+            render_keyframe_task.delay(job_id, scene.scene_id)
+        return []
+    _record_scene_artifacts(
+        job_id,
+        'keyframe_path',
+        {scene.scene_id: str(path) for scene, path in zip(scenes, keyframe_paths)},
+        cache_stats,
+        gpu_usage,
+    )
+    _advance_to_clips_if_ready(job_id)
+    return [str(path) for path in keyframe_paths]
 
-    stitched_video = stitcher.concat_with_crossfade(video_clips, work_dir / 'stitched.mp4')
-    final_video = stitcher.mix_audio(stitched_video, audio_tracks, work_dir / 'final.mp4')
 
-    s3_key = f'renders/{run_id}/final.mp4'
-    s3 = boto3.client('s3', region_name=settings.s3_region)
-    s3.upload_file(str(final_video), settings.s3_bucket, s3_key)
-    output_url = f's3://{settings.s3_bucket}/{s3_key}'
+@celery.task(bind=True, name='render_clip_task', max_retries=_SCENE_MAX_RETRIES)
+def render_clip_task(self, job_id: str, scene_id: int) -> str:
+    job = _get_job(job_id)
+    scene = _get_scene(job_id, scene_id)
+    if artifact_ready(scene, 'clip_path'):
+        logger.info('Clip already rendered job=%s scene_id=%s', job_id, scene_id)
+        return scene.clip_path
+
+    clip_path = Path(job.work_dir) / f'scene_{scene_id:03d}.mp4'
+    cache_stats: CacheStats | None = None
+    gpu_usage: GpuUsage | None = None
+    try:
+        with (
+            span('video', job_id, scene_id) as stage,
+            artifact_cache.track() as cache_stats,
+            phase_scheduler.track() as gpu_usage,
+            _staged([clip_path]) as (staged_path,),
+        ):
+            scene_video_generator.generate_video(
+                scene.visual_prompt,
+                Path(scene.keyframe_path),
+                staged_path,
+                seed=_scene_seed(job, scene_id),
+                duration_seconds=probe_duration(Path(scene.audio_path)) if artifact_ready(scene, 'audio_path') else None,
+                preset=get_preset(job.preset),
+                shot_type=scene.shot_type,
+            )
+            stage.add_bytes(staged_path)
+    except Exception as exc:
+        _record_gpu_usage(job_id, gpu_usage)
+        _retry_or_fail(self, job_id, scene_id, exc)
+    _record_scene_artifacts(job_id, 'clip_path', {scene_id: str(clip_path)}, cache_stats, gpu_usage)
+    return str(clip_path)
+
+
+@celery.task(bind=True, name='synthesize_audio_task', max_retries=_SCENE_MAX_RETRIES)
+def synthesize_audio_task(self, job_id: str, scene_id: int) -> str:
+    job = _get_job(job_id)
+    scene = _get_scene(job_id, scene_id)
+    if artifact_ready(scene, 'audio_path'):
+        logger.info('Audio already synthesized job=%s scene_id=%s', job_id, scene_id)
+        _advance_to_clips_if_ready(job_id)
+        return scene.audio_path
+
+    audio_path = Path(job.work_dir) / f'scene_{scene_id:03d}.wav'
+    try:
+        with (
+            span('audio', job_id, scene_id) as stage,
+            artifact_cache.track() as cache_stats,
+            _staged([audio_path]) as (staged_path,),
+        ):
+            audio_generator.synthesize(scene.dialogue, staged_path)
+            stage.add_bytes(staged_path)
+    except Exception as exc:
+        _retry_or_fail(self, job_id, scene_id, exc)
+    _record_scene_artifacts(job_id, 'audio_path', {scene_id: str(audio_path)}, cache_stats)
+    _advance_to_clips_if_ready(job_id)
+    return str(audio_path)
+
+
+@celery.task(name='synthesize_audio_batch_task')
+def synthesize_audio_batch_task(job_id: str, scene_ids: list[int]) -> list[str]:
+    """Synthesize the dialogue of several scenes of a job in one `synthesize_many` call."""
+    job = _get_job(job_id)
+    scenes = [
+        scene for scene in _load_scenes(job_id) if scene.scene_id in scene_ids and not artifact_ready(scene, 'audio_path')
+    ]
+    if not scenes:
+        _advance_to_clips_if_ready(job_id)
+        return []
+
+    audio_paths = [Path(job.work_dir) / f'scene_{scene.scene_id:03d}.wav' for scene in scenes]
+    try:
+        with (
+            span('audio', job_id, detail=f'batch of {len(scenes)}') as stage,
+            artifact_cache.track() as cache_stats,
+            _staged(audio_paths) as staged_paths,
+        ):
+            audio_generator.synthesize_many(
+                [DialogueLine(scene.dialogue, staged_path) for scene, staged_path in zip(scenes, staged_paths)]
+            )
+            stage.add_bytes(*staged_paths)
+    except Exception:
+        # Fall back to one task per scene, which carries the per-scene retry budget.
+        logger.exception('Batched dialogue failed job=%s scene_ids=%s; retrying per scene', job_id, scene_ids)
+        for scene in scenes:
+            synthesize_audio_task.delay(job_id, scene.scene_id)
+        return []
+    _record_scene_artifacts(
+        job_id,
+        'audio_path',
+        {scene.scene_id: str(path) for scene, path in zip(scenes, audio_paths)},
+        cache_stats,
+    )
+    _advance_to_clips_if_ready(job_id)
+    return [str(path) for path in audio_paths]
+
+
+@celery.task(bind=True, name='stitch_render_task')
+def stitch_render_task(self, job_id: str, waiting_since: float | None = None) -> dict[str, str]:
+    job = _get_job(job_id)
+    if job.status == 'completed':
+        # A re-delivered stitch of a job that already finished.
+        logger.info('Job already stitched task=%s output=%s', job_id, job.output_url)
+        return {'task_id': job_id, 'status': 'completed', 'output_url': job.output_url}
+    scenes = _load_scenes(job_id)
+
+    unfinished = [scene.scene_id for scene in scenes if scene.status != 'completed']
+    if unfinished:
+        # A clip task re-run after a lost worker can complete the chord while a sibling is still rendering;
+        # the sibling is only redelivered after the visibility timeout, so wait on a budget of its own
+        # (re-enqueued rather than retried, leaving the upload retry budget untouched).
+        now = time.time()
+        waiting_since = waiting_since or now
+        waited = now - waiting_since
+        if job.status != 'failed' and waited < settings.stitch_wait_timeout_seconds:
+            countdown = min(max(30.0, waited), 600.0)
+            logger.warning(
+                'Waiting %.0fs for unfinished scenes %s before stitching job=%s', countdown, unfinished, job_id
+            )
+            stitch_render_task.apply_async((job_id,), {'waiting_since': waiting_since}, countdown=countdown)
+            return {'task_id': job_id, 'status': 'waiting'}
+        _update_status(job_id, 'failed')
+        raise RuntimeError(f'Cannot stitch job {job_id}; unfinished scenes: {unfinished}')
+
+    _update_status(job_id, 'stitching')
+    work_dir = Path(job.work_dir)
+    video_clips = [Path(scene.clip_path) for scene in scenes]
+    audio_tracks = [Path(scene.audio_path) for scene in scenes]
+    s3_key = f'renders/{work_dir.name}/final.mp4'
+    upload = None
+    try:
+        # Parts go up while ffmpeg is still encoding; a retry resumes the same multipart upload, so the
+        # upload span covers the encode as well and its excess over the stitch span is the upload tail.
+        with span('upload', job_id) as upload_span:
+            with s3_uploader.stream(settings.s3_bucket, s3_key) as upload:
+                with span('stitch', job_id) as stitch_span:
+                    stitcher.render_film(
+                        video_clips,
+                        audio_tracks,
+                        work_dir / 'final.mp4',
+                        transition=settings.stitch_transition_seconds,
+                        sink=upload.write,
+                    )
+                    stitch_span.add_bytes(work_dir / 'final.mp4')
+            upload_span.bytes_written = upload.bytes_sent
+    except (BotoCoreError, ClientError) as exc:
+        logger.exception('Upload of final film failed task=%s', job_id)
+        if self.request.retries < _UPLOAD_MAX_RETRIES:
+            raise self.retry(exc=exc, countdown=30 * 2**self.request.retries)
+        _update_status(job_id, 'failed')
+        raise
+    except Exception as exc:
+        # The encode (or the local copy) failed: the parts sent so far belong to a film that was never
+        # finished, so drop them rather than leave them for a retry to match against.
+        logger.exception('Stitching the final film failed task=%s', job_id)
+        if upload is not None:
+            upload.abort()
+        if self.request.retries < _UPLOAD_MAX_RETRIES:
+            raise self.retry(exc=exc, countdown=30 * 2**self.request.retries)
+        _update_status(job_id, 'failed')
+        raise
+    output_url = upload.url
 
-    _update_status(task_id, 'completed', output_url=output_url)
-    logger.info('Render task complete task=%s output=%s', task_id, output_url)
-    return {'task_id': task_id, 'status': 'completed', 'output_url': output_url}
+    _update_status(job_id, 'completed', output_url=output_url)
+    logger.info(
+        'Render task complete task=%s output=%s cache_hits=%s cache_misses=%s cache_bytes_saved=%s',
+        job_id,
+        output_url,
+        job.cache_hits,
+        job.cache_misses,
+        job.cache_bytes_saved,
+    )
+    return {'task_id': job_id, 'status': 'completed', 'output_url': output_url}
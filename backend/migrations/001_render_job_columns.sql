@@ -0,0 +1,43 @@
+-- Columns added to tables that existed before the scene DAG, caching, presets, admission,
+-- metrics, crash recovery and coalescing changes. Base.metadata.create_all only creates
+-- missing tables (render_scenes, tenant_shares, render_spans, render_stage_rollups); it never
+-- alters an existing one, so run this once against a database created by an older build:
+--
+--   psql -h localhost -U postgres -d opencine -f migrations/001_render_job_columns.sql
+--
+-- Every statement is idempotent. Defaults match the ORM defaults in app/models.py so rows
+-- written before the upgrade read back the same as new ones.
+
+BEGIN;
+
+ALTER TABLE render_jobs
+    ADD COLUMN IF NOT EXISTS face_reference_image TEXT,
+    ADD COLUMN IF NOT EXISTS seed INTEGER,
+    ADD COLUMN IF NOT EXISTS tenant_id VARCHAR(64) NOT NULL DEFAULT 'default',
+    ADD COLUMN IF NOT EXISTS priority INTEGER NOT NULL DEFAULT 1,
+    ADD COLUMN IF NOT EXISTS admitted_at TIMESTAMP WITHOUT TIME ZONE,
+    ADD COLUMN IF NOT EXISTS bypass_screenplay_cache BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS preset VARCHAR(20) NOT NULL DEFAULT 'final',
+    ADD COLUMN IF NOT EXISTS parent_job_id VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS work_dir VARCHAR(1024),
+    ADD COLUMN IF NOT EXISTS screenplay_complete BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS scenes_total INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS scenes_completed INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS cache_hits INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS cache_misses INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS cache_bytes_saved BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS gpu_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS coalesced_requests INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS gpu_seconds_saved DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS stage_metrics JSON;
+
+CREATE INDEX IF NOT EXISTS ix_render_jobs_tenant_id ON render_jobs (tenant_id);
+CREATE INDEX IF NOT EXISTS ix_render_jobs_parent_job_id ON render_jobs (parent_job_id);
+
+-- render_scenes may already exist from a build that predates artifact checksums.
+ALTER TABLE IF EXISTS render_scenes
+    ADD COLUMN IF NOT EXISTS keyframe_sha256 VARCHAR(64),
+    ADD COLUMN IF NOT EXISTS clip_sha256 VARCHAR(64),
+    ADD COLUMN IF NOT EXISTS audio_sha256 VARCHAR(64);
+
+COMMIT;
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.core.admission import (  # noqa: E402
+    _IDLE,
+    PENDING,
+    AdmissionController,
+    Credit,
+    DeficitRoundRobin,
+    PendingJob,
+)
+from app.core.config import get_settings  # noqa: E402
+from app.core.db import Base  # noqa: E402
+from app.models import RenderJob, TenantShare  # noqa: E402
+
+settings = get_settings()
+
+
+def _backlog(tenant_id: str, count: int, priority: int = 1, cost: float = 10.0) -> list[PendingJob]:
+    return [PendingJob(f'{tenant_id}-{index}', tenant_id, priority, cost) for index in range(count)]
+
+
+def test_weighted_tenants_share_slots_by_weight():
+    policy = DeficitRoundRobin({'a': 2.0, 'b': 1.0})
+
+    admitted = policy.select(_backlog('a', 20) + _backlog('b', 20), slots=9, credits={})
+
+    assert Counter(job.tenant_id for job in admitted) == {'a': 6, 'b': 3}
+
+
+def test_jobs_of_a_tenant_are_admitted_oldest_first():
+    policy = DeficitRoundRobin({})
+
+    admitted = policy.select(_backlog('a', 3), slots=2, credits={})
+
+    assert [job.job_id for job in admitted] == ['a-0', 'a-1']
+
+
+def test_more_urgent_class_is_served_first():
+    policy = DeficitRoundRobin({'a': 10.0})
+    backlog = _backlog('a', 3, priority=1) + _backlog('b', 2, priority=0)
+
+    admitted = policy.select(backlog, slots=3, credits={})
+
+    assert [job.job_id for job in admitted] == ['b-0', 'b-1', 'a-0']
+
+
+def test_turn_order_carries_over_between_passes():
+    # `big` takes the only slot on the first pass; `small` gets the next turn even though `big` still waits.
+    policy = DeficitRoundRobin({})
+    credits: dict[str, Credit] = {}
+    backlog = [PendingJob('big-0', 'big', 1, 20.0), *_backlog('small', 4, cost=10.0)]
+
+    first = policy.select(backlog, slots=1, credits=credits)
+    assert [job.job_id for job in first] == ['big-0']
+    assert credits['big'].deficit == 0.0
+
+    backlog = [PendingJob('big-1', 'big', 1, 20.0), *_backlog('small', 4, cost=10.0)]
+    second = policy.select(backlog, slots=2, credits=credits)
+    # `small` was credited a full quantum (20s) on its turn and spends it on two jobs.
+    assert [job.job_id for job in second] == ['small-0', 'small-1']
+    assert credits['small'].deficit == 0.0
+    assert credits['big'].rounds == credits['small'].rounds == 1
+
+
+def test_leftover_credit_is_kept_for_the_next_pass():
+    policy = DeficitRoundRobin({})
+    credits: dict[str, Credit] = {}
+    backlog = _backlog('a', 1, cost=4.0) + [PendingJob('b-0', 'b', 1, 10.0)]
+
+    policy.select(backlog, slots=1, credits=credits)
+
+    # `a` was credited the 10s quantum and its first job cost 4s.
+    assert credits['a'] == Credit(deficit=6.0, rounds=1)
+    assert credits['b'] == Credit(deficit=0.0, rounds=0)
+
+
+def test_idle_tenant_loses_its_credit():
+    policy = DeficitRoundRobin({})
+    credits = {'a': Credit(deficit=50.0, rounds=7), 'b': Credit(deficit=0.0, rounds=3)}
+
+    admitted = policy.select(_backlog('b', 2), slots=2, credits=credits)
+
+    assert len(admitted) == 2
+    assert credits['a'] == Credit(deficit=0.0, rounds=_IDLE)
+
+
+def test_returning_tenant_rejoins_at_the_current_round():
+    policy = DeficitRoundRobin({})
+    credits = {'a': Credit(deficit=0.0, rounds=_IDLE), 'b': Credit(deficit=0.0, rounds=5)}
+
+    admitted = policy.select(_backlog('a', 3) + _backlog('b', 3), slots=2, credits=credits)
+
+    # Rejoining at round 5 instead of 0, `a` cannot claim five turns in a row.
+    assert Counter(job.tenant_id for job in admitted) == {'a': 1, 'b': 1}
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _add_job(db, job_id: str, tenant_id: str = 'a', status: str = PENDING, **values) -> None:
+    db.add(RenderJob(celery_task_id=job_id, prompt='p', tenant_id=tenant_id, status=status, **values))
+    db.commit()
+
+
+def _add_completed(db, seconds: float, preset: str = 'final') -> None:
+    finished = datetime.utcnow()
+    _add_job(
+        db,
+        f'done-{seconds}',
+        status='completed',
+        preset=preset,
+        admitted_at=finished - timedelta(seconds=seconds),
+        updated_at=finished,
+    )
+
+
+def _controller(max_active_jobs: int = 2, quota: int = 2, **kwargs) -> AdmissionController:
+    return AdmissionController(max_active_jobs, weights={}, quota=quota, quotas={'vip': 5}, **kwargs)
+
+
+def test_retry_after_is_none_below_quota(db):
+    _add_job(db, 'a-0')
+
+    assert _controller().retry_after(db, 'a') is None
+
+
+def test_retry_after_spreads_the_estimated_wait_over_the_backlog(db):
+    _add_completed(db, 100.0)
+    _add_job(db, 'a-0')
+    _add_job(db, 'a-1')
+
+    # 200s of backlog drains over two slots in 100s; one backlog slot frees every 50s.
+    assert _controller().retry_after(db, 'a') == 50
+
+
+def test_retry_after_uses_the_tenant_quota(db):
+    _add_job(db, 'vip-0', tenant_id='vip')
+    _add_job(db, 'vip-1', tenant_id='vip')
+
+    assert _controller().retry_after(db, 'vip') is None
+
+
+def test_retry_after_without_admission_limit(db):
+    _add_job(db, 'a-0')
+    _add_job(db, 'a-1')
+
+    assert _controller(max_active_jobs=0).retry_after(db, 'a') == 1
+
+
+def test_admission_fills_free_slots_and_stores_credit(db):
+    _add_job(db, 'running', status='rendering')
+    _add_job(db, 'a-0')
+    _add_job(db, 'a-1')
+
+    admitted = _controller()._admit(db)
+
+    assert [(job.celery_task_id, cost) for job, cost in admitted] == [('a-0', settings.admission_default_job_seconds)]
+    assert db.query(RenderJob.status).filter(RenderJob.celery_task_id == 'a-1').scalar() == PENDING
+    share = db.get(TenantShare, 'a')
+    assert (share.deficit, share.rounds) == (0.0, 1)
+
+
+def test_stale_job_is_failed_and_frees_its_slot(db):
+    _add_job(db, 'stuck', status='rendering', updated_at=datetime.utcnow() - timedelta(hours=7))
+    _add_job(db, 'busy', status='rendering')
+    _add_job(db, 'a-0')
+
+    admitted = _controller(stale_job_seconds=6 * 3600)._admit(db)
+
+    assert [job.celery_task_id for job, _ in admitted] == ['a-0']
+    statuses = dict(db.query(RenderJob.celery_task_id, RenderJob.status))
+    assert statuses == {'stuck': 'failed', 'busy': 'rendering', 'a-0': 'queued'}
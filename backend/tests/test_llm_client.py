@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip('requests')
+
+from app.services import llm_client  # noqa: E402
+from app.services.llm_client import CircuitBreaker, CircuitOpenError  # noqa: E402
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(llm_client, 'time', clock)
+    return clock
+
+
+def _open(breaker: CircuitBreaker, failures: int = 3) -> None:
+    for _ in range(failures):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_stays_closed_below_the_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30.0)
+
+    _open(breaker, failures=2)
+
+    assert breaker.state == 'closed'
+    assert breaker.before_call() is False
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30.0)
+
+    _open(breaker, failures=2)
+    breaker.record_success()
+    _open(breaker, failures=2)
+
+    assert breaker.state == 'closed'
+
+
+def test_opens_after_consecutive_failures_and_fails_fast(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30.0)
+
+    _open(breaker)
+
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_lets_a_single_trial_through_after_the_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30.0)
+    _open(breaker)
+
+    clock.now += 29.9
+    assert breaker.state == 'open'
+    clock.now += 0.1
+    assert breaker.state == 'half-open'
+
+    assert breaker.before_call() is True
+    # Concurrent callers keep failing fast while the trial is in flight.
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_trial_closes_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30.0)
+    _open(breaker)
+    clock.now += 30.0
+
+    assert breaker.before_call() is True
+    breaker.record_success()
+
+    assert breaker.state == 'closed'
+    assert breaker.before_call() is False
+
+
+def test_failed_trial_reopens_for_a_full_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30.0)
+    _open(breaker)
+    clock.now += 30.0
+
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == 'open'
+    clock.now += 29.9
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 0.1
+    assert breaker.before_call() is True
+
+
+def test_trial_ended_without_a_verdict_frees_the_next_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30.0)
+    _open(breaker)
+    clock.now += 30.0
+
+    assert breaker.before_call() is True
+    # e.g. the caller was interrupted before the endpoint answered.
+    breaker.end_trial()
+
+    assert breaker.state == 'half-open'
+    assert breaker.before_call() is True
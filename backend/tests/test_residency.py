@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from app.core.residency import CPU, DISK, GPU, ResidencyPolicy
+
+GB = 1024**3
+
+
+def _policy(gpu_gb: int = 0, host_gb: int = 0, **sizes_gb: int) -> ResidencyPolicy:
+    policy = ResidencyPolicy(gpu_budget_bytes=gpu_gb * GB, host_budget_bytes=host_gb * GB)
+    for model_type, size in sizes_gb.items():
+        policy.declare_size(model_type, size * GB)
+    return policy
+
+
+def _moves(evictions) -> list[tuple[str, str, str]]:
+    return [(eviction.model_type, eviction.source, eviction.target) for eviction in evictions]
+
+
+def test_models_within_budget_stay_resident_together():
+    policy = _policy(gpu_gb=30, flux=10, hunyuan=10, ip_adapter=5)
+
+    for model_type in ('flux', 'hunyuan', 'ip_adapter'):
+        assert policy.admit(model_type) == []
+
+    assert policy.resident_set() == {GPU: ['flux', 'hunyuan', 'ip_adapter'], CPU: []}
+    assert policy.gpu_used_bytes() == 25 * GB
+
+
+def test_over_budget_admit_evicts_least_recently_used_first():
+    policy = _policy(gpu_gb=30, a=10, b=10, c=10, d=15)
+    for model_type in ('a', 'b', 'c'):
+        policy.admit(model_type)
+    policy.touch('a')
+
+    evictions = policy.admit('d')
+
+    assert _moves(evictions) == [('b', GPU, CPU), ('c', GPU, CPU)]
+    assert [eviction.size_bytes for eviction in evictions] == [10 * GB, 10 * GB]
+    assert policy.resident_set() == {GPU: ['a', 'd'], CPU: ['b', 'c']}
+    assert policy.gpu_used_bytes() <= policy.gpu_budget_bytes
+
+
+def test_promotion_from_host_tier_leaves_the_host_lru():
+    policy = _policy(gpu_gb=20, a=10, b=10, c=10)
+    for model_type in ('a', 'b', 'c'):
+        policy.admit(model_type)
+    assert policy.tier_of('a') == CPU
+
+    evictions = policy.admit('a')
+
+    assert _moves(evictions) == [('b', GPU, CPU)]
+    assert policy.tier_of('a') == GPU
+    assert policy.resident_set() == {GPU: ['c', 'a'], CPU: ['b']}
+
+
+def test_host_budget_demotes_oldest_host_model_to_disk():
+    policy = _policy(gpu_gb=10, host_gb=15, a=10, b=10, c=10)
+    policy.admit('a')
+    policy.admit('b')
+
+    evictions = policy.admit('c')
+
+    assert _moves(evictions) == [('b', GPU, CPU), ('a', CPU, DISK)]
+    assert policy.tier_of('a') == DISK
+    assert policy.tier_of('b') == CPU
+    assert policy.tier_of('c') == GPU
+    assert policy.host_used_bytes() <= policy.host_budget_bytes
+
+
+def test_readmitting_a_resident_model_repins_it_without_evictions():
+    policy = _policy(gpu_gb=20, a=10, b=10, c=10)
+    policy.admit('a')
+    policy.admit('b')
+
+    assert policy.admit('a') == []
+    assert policy.resident_set()[GPU] == ['b', 'a']
+
+    # 'a' was re-pinned as most recently used, so 'b' makes room for the next model.
+    assert _moves(policy.admit('c')) == [('b', GPU, CPU)]
+    assert policy.resident_set()[GPU] == ['a', 'c']
+
+
+def test_zero_gpu_budget_keeps_a_single_model():
+    policy = _policy(a=1, b=1)
+    policy.admit('a')
+
+    assert _moves(policy.admit('b')) == [('a', GPU, CPU)]
+    assert policy.resident_set()[GPU] == ['b']
+
+
+def test_unknown_footprint_fills_the_gpu_until_measured():
+    policy = _policy(gpu_gb=30, a=10)
+    policy.admit('a')
+
+    assert _moves(policy.admit('unmeasured')) == [('a', GPU, CPU)]
+
+    policy.record_size('unmeasured', 10 * GB)
+    assert policy.admit('a') == []
+    assert policy.resident_set()[GPU] == ['unmeasured', 'a']
+
+
+def test_enforce_evicts_after_a_measured_footprint_exceeds_budget():
+    policy = _policy(gpu_gb=20, a=10)
+    policy.admit('a')
+    policy.record_size('b', 5 * GB)
+    policy.admit('b')
+    # The first measurement sticks; only a declared size replaces it.
+    policy.record_size('b', 50 * GB)
+    assert policy.size_of('b') == 5 * GB
+
+    policy.declare_size('b', 15 * GB)
+    evictions = policy.enforce()
+
+    assert _moves(evictions) == [('a', GPU, CPU)]
+    assert policy.resident_set()[GPU] == ['b']
+
+
+def test_model_larger_than_budget_is_loaded_alone():
+    policy = _policy(gpu_gb=10, a=5, huge=40)
+    policy.admit('a')
+
+    assert _moves(policy.admit('huge')) == [('a', GPU, CPU)]
+    assert policy.resident_set()[GPU] == ['huge']
+
+
+def test_eviction_log_records_every_move():
+    policy = _policy(gpu_gb=10, host_gb=10, a=10, b=10, c=10)
+    for model_type in ('a', 'b', 'c'):
+        policy.admit(model_type)
+
+    log = policy.eviction_log()
+    assert [(entry['model_type'], entry['source'], entry['target']) for entry in log] == [
+        ('a', GPU, CPU),
+        ('b', GPU, CPU),
+        ('a', CPU, DISK),
+    ]
+    assert all(entry['reason'] for entry in log)
+
+
+def test_forgetting_a_failed_load_frees_its_gpu_slot():
+    policy = _policy(gpu_gb=20, a=10, b=10, c=10)
+    policy.admit('a')
+    policy.admit('b')
+
+    # 'c' was admitted but its factory (or the move to CUDA) raised.
+    policy.admit('c')
+    policy.forget('c')
+
+    assert policy.tier_of('c') == DISK
+    assert policy.resident_set() == {GPU: ['b'], CPU: ['a']}
+    # The retry is admitted like a fresh load rather than served as already resident.
+    assert policy.admit('c') == []
+    assert policy.resident_set()[GPU] == ['b', 'c']
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('boto3')
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.core import job_status  # noqa: E402
+from app.core.artifact_cache import ArtifactCache, artifact_cache  # noqa: E402
+from app.core.db import Base  # noqa: E402
+from app.core.job_status import JobStatusWriter, artifact_ready, missing_inputs  # noqa: E402
+from app.models import RenderJob  # noqa: E402
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    monkeypatch.setattr(job_status, 'SessionLocal', factory)
+    yield factory
+    engine.dispose()
+
+
+def _job_status(factory, job_id: str) -> str:
+    with factory() as db:
+        return db.query(RenderJob).filter(RenderJob.celery_task_id == job_id).one().status
+
+
+def _artifact(path: Path, content: bytes) -> tuple[str, str]:
+    path.write_bytes(content)
+    return str(path), artifact_cache.hash_input(path)
+
+
+def _scene(**artifacts: tuple[str, str] | None) -> SimpleNamespace:
+    fields = {}
+    for name in ('keyframe', 'clip', 'audio'):
+        path, sha256 = artifacts.get(name) or (None, None)
+        fields[f'{name}_path'], fields[f'{name}_sha256'] = path, sha256
+    return SimpleNamespace(**fields)
+
+
+def test_fresh_scene_needs_keyframe_and_audio():
+    assert missing_inputs(_scene()) == ['keyframe_path', 'audio_path']
+
+
+def test_worker_killed_mid_clip_resumes_without_phase_one(tmp_path):
+    # Keyframe and audio were recorded before the crash; the half-written clip was never recorded.
+    (tmp_path / '.scene_001.mp4.partial').write_bytes(b'\x00' * 10)
+    scene = _scene(
+        keyframe=_artifact(tmp_path / 'scene_001.png', b'keyframe'),
+        audio=_artifact(tmp_path / 'scene_001.wav', b'audio'),
+    )
+
+    assert missing_inputs(scene) == []
+    assert not artifact_ready(scene, 'clip_path')
+
+
+def test_intact_clip_needs_no_keyframe(tmp_path):
+    scene = _scene(
+        clip=_artifact(tmp_path / 'scene_001.mp4', b'clip'),
+        audio=_artifact(tmp_path / 'scene_001.wav', b'audio'),
+    )
+
+    assert missing_inputs(scene) == []
+
+
+def test_artifact_changed_since_it_was_recorded_is_rendered_again(tmp_path):
+    keyframe = _artifact(tmp_path / 'scene_001.png', b'keyframe')
+    audio = _artifact(tmp_path / 'scene_001.wav', b'audio')
+    # Truncated by the crash after the checksum was stored.
+    Path(audio[0]).write_bytes(b'aud')
+
+    assert missing_inputs(_scene(keyframe=keyframe, audio=audio)) == ['audio_path']
+
+
+def test_recorded_artifact_that_vanished_is_rendered_again(tmp_path):
+    keyframe = _artifact(tmp_path / 'scene_001.png', b'keyframe')
+    audio = _artifact(tmp_path / 'scene_001.wav', b'audio')
+    Path(keyframe[0]).unlink()
+
+    assert missing_inputs(_scene(keyframe=keyframe, audio=audio)) == ['keyframe_path']
+
+
+def test_artifact_recorded_without_checksum_is_trusted_if_present(tmp_path):
+    path, _ = _artifact(tmp_path / 'scene_001.wav', b'audio')
+
+    assert artifact_ready(_scene(audio=(path, None)), 'audio_path')
+
+
+@pytest.mark.parametrize('status', ['queued', 'processing'])
+def test_dispatch_moves_an_admitted_job_to_rendering(session_factory, status):
+    with session_factory() as db:
+        db.add(RenderJob(celery_task_id='job-1', prompt='p', status=status))
+        db.commit()
+
+    assert JobStatusWriter().set_status('job-1', 'rendering', only_from=('processing', 'queued'))
+    assert _job_status(session_factory, 'job-1') == 'rendering'
+
+
+@pytest.mark.parametrize('status', ['rendering_clips', 'failed', 'completed'])
+def test_late_redelivery_does_not_pull_a_job_back_to_rendering(session_factory, status):
+    with session_factory() as db:
+        db.add(RenderJob(celery_task_id='job-1', prompt='p', status=status))
+        db.commit()
+
+    assert not JobStatusWriter().set_status('job-1', 'rendering', only_from=('processing', 'queued'))
+    assert _job_status(session_factory, 'job-1') == status
+
+
+def test_input_hash_memo_is_bounded(tmp_path):
+    cache = ArtifactCache(root=tmp_path / 'cache', max_bytes=1024, enabled=False, max_input_hashes=2)
+    paths = []
+    for index in range(3):
+        path = tmp_path / f'scene_{index:03}.png'
+        path.write_bytes(b'keyframe %d' % index)
+        paths.append(path)
+    first = cache.hash_input(paths[0])
+    cache.hash_input(paths[1])
+    cache.hash_input(paths[0])
+    cache.hash_input(paths[2])
+
+    assert len(cache._input_hashes) == 2
+    # scene_001 was the least recently used, so it was evicted; scene_000 was kept.
+    assert [key[0] for key in cache._input_hashes] == [str(paths[0].resolve()), str(paths[2].resolve())]
+    assert cache.hash_input(paths[0]) == first
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.services.screenplay_stream import SceneStreamParser, iter_scenes
+
+
+def _scene(scene_id: int) -> dict:
+    return {'scene_id': scene_id, 'visual_prompt': f'shot {scene_id}', 'dialogue': 'Hello.', 'shot_type': 'wide'}
+
+
+def _chunks(text: str, size: int = 7) -> list[str]:
+    return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+def test_closed_array_is_complete():
+    stream = iter_scenes(_chunks(json.dumps([_scene(1), _scene(2)])))
+
+    assert [scene.scene_id for scene in stream] == [1, 2]
+    assert stream.complete
+
+
+def test_truncated_stream_keeps_scenes_but_is_incomplete():
+    text = json.dumps([_scene(1), _scene(2)])
+    stream = iter_scenes(_chunks(text[: text.index('{"scene_id": 2') + 10]))
+
+    assert [scene.scene_id for scene in stream] == [1]
+    assert not stream.complete
+
+
+def test_skipped_object_makes_stream_incomplete():
+    text = '[' + json.dumps(_scene(1)) + ', {"scene_id": "x"}, ' + json.dumps(_scene(3)) + ']'
+    stream = iter_scenes(_chunks(text))
+
+    assert [scene.scene_id for scene in stream] == [1, 3]
+    assert not stream.complete
+
+
+def _feed_all(parser: SceneStreamParser, chunks: list[str]) -> list[int]:
+    return [scene.scene_id for chunk in chunks for scene in parser.feed(chunk)]
+
+
+def test_parser_yields_each_scene_when_its_object_closes():
+    parser = SceneStreamParser()
+    first = json.dumps(_scene(1))
+
+    assert parser.feed('[' + first[:-1]) == []
+    assert [scene.scene_id for scene in parser.feed(first[-1] + ', ')] == [1]
+    assert not parser.finished
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 11, 64])
+def test_parser_is_independent_of_chunk_boundaries(size):
+    scenes = [_scene(1), {**_scene(2), 'dialogue': 'She said "{not a brace}" \\ and left.'}, _scene(3)]
+    parser = SceneStreamParser()
+
+    assert _feed_all(parser, _chunks(json.dumps(scenes), size)) == [1, 2, 3]
+    assert parser.finished
+    assert parser.skipped == 0
+
+
+def test_parser_handles_nested_objects_and_brackets_in_strings():
+    scene = {**_scene(1), 'camera': {'lens': {'mm': 35}}, 'visual_prompt': 'a ] bracket, a [ bracket and a } brace'}
+    parser = SceneStreamParser()
+
+    scenes = parser.feed(json.dumps([scene]))
+
+    assert [(item.scene_id, item.visual_prompt) for item in scenes] == [(1, scene['visual_prompt'])]
+    assert parser.finished
+
+
+def test_parser_ignores_text_around_the_array():
+    text = 'Here is your screenplay:\n```json\n' + json.dumps([_scene(1)]) + '\n```\n[' + json.dumps(_scene(2)) + ']'
+    parser = SceneStreamParser()
+
+    assert _feed_all(parser, _chunks(text)) == [1]
+    assert parser.finished
+
+
+def test_parser_skips_invalid_objects_and_counts_them():
+    text = '[' + json.dumps(_scene(1)) + ', {"scene_id": 2, "visual_prompt": }, {"scene_id": 3}, ' + json.dumps(_scene(4)) + ']'
+    parser = SceneStreamParser()
+
+    assert _feed_all(parser, _chunks(text)) == [1, 4]
+    assert parser.skipped == 2
+    assert parser.finished
+
+
+def _cache():
+    fakeredis = pytest.importorskip('fakeredis')
+    from app.services.screenplay_cache import ScreenplayCache
+
+    cache = ScreenplayCache('redis://localhost:6379/0', ttl_seconds=60, max_entries=10)
+    cache._redis = fakeredis.FakeRedis()
+    return cache
+
+
+def test_cache_stores_only_complete_screenplays():
+    cache = _cache()
+    text = json.dumps([_scene(1), _scene(2)])
+
+    truncated = list(cache.stream_through('key', lambda: iter_scenes(_chunks(text[:-30]))))
+    assert [scene.scene_id for scene in truncated] == [1]
+    assert cache.get('key') is None
+
+    full = list(cache.stream_through('key', lambda: iter_scenes(_chunks(text))))
+    assert [scene.scene_id for scene in full] == [1, 2]
+    assert [scene.scene_id for scene in cache.get('key')] == [1, 2]